@@ -61,6 +61,13 @@ except PackageError as e:
     logger.error("could not install package. Reason: %s", e.message)
 ```
 
+To find details of several packages at once, with a constant number of subprocess calls:
+
+```python
+packages = apt.DebianPackage.from_system_bulk(["vim", "htop", "wget"])
+missing = {"vim", "htop", "wget"} - packages.keys()
+```
+
 
 `RepositoryMapping` will return a dict-like object containing enabled system repositories
 and their properties (available groups, baseuri. gpg key). This class can add, disable, or
@@ -101,15 +108,17 @@ if "deb-us.archive.ubuntu.com-xenial" not in repositories:
 """
 
 import fileinput
+import functools
 import glob
 import logging
 import os
 import re
 import subprocess
+import time
 from collections.abc import Mapping
 from enum import Enum
 from subprocess import PIPE, CalledProcessError, check_output
-from typing import Iterable, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
@@ -122,10 +131,14 @@ LIBAPI = 0
 
 # Increment this PATCH version before using `charmcraft publish-lib` or reset
 # to 0 if you are raising the major API version
+# This copy carries local changes (bulk and memoized lookups, throttled updates) on top of
+# upstream LIBPATCH 13. Revert it in the pull requests of
+# .github/workflows/auto_update_libs.yaml until the changes are published upstream.
 LIBPATCH = 13
 
 
 VALID_SOURCE_TYPES = ("deb", "deb-src")
+APT_LISTS_PATH = "/var/lib/apt/lists"
 OPTIONS_MATCHER = re.compile(r"\[.*?\]")
 
 
@@ -164,6 +177,109 @@ class PackageState(Enum):
     Available = "available"
 
 
+# A memoized package lookup, or the miss of a package that was not found.
+_Lookup = Union["DebianPackage", PackageNotFoundError]
+
+
+class _LookupCache:
+    """Process-wide memo of the system architecture and parsed package lookups.
+
+    Package entries are invalidated whenever the apt cache is updated or a package is installed
+    or removed. The architecture is kept for the life of the process, as it cannot change.
+    """
+
+    def __init__(self) -> None:
+        self._arch = None  # type: Optional[str]
+        self.packages = {}  # type: Dict[Tuple[str, str, str, str], _Lookup]
+
+    def system_arch(self) -> str:
+        """Return the memoized output of `dpkg --print-architecture`."""
+        if self._arch is None:
+            self._arch = check_output(
+                ["dpkg", "--print-architecture"], universal_newlines=True
+            ).strip()
+        return self._arch
+
+    def get_many(
+        self, kind: str, names: List[str], arch: str
+    ) -> Tuple[Dict[str, "DebianPackage"], List[str]]:
+        """Split a bulk lookup into the memoized hits and the names still to be queried.
+
+        Args:
+            kind: the kind of lookup
+            names: the package names to look up
+            arch: the architecture the lookup is for
+
+        Returns:
+            A tuple of the memoized packages by name and the names without a memoized entry.
+        """
+        found = {}
+        uncached = []
+        for name in names:
+            cached = self.packages.get((kind, name, "", arch))
+            if cached is None:
+                uncached.append(name)
+            elif not isinstance(cached, PackageNotFoundError):
+                found[name] = cached
+        return found, uncached
+
+    def set_many(
+        self, kind: str, names: List[str], arch: str, found: Dict[str, "DebianPackage"]
+    ) -> None:
+        """Memoize the outcome of a bulk lookup, including the packages which were not found.
+
+        Args:
+            kind: the kind of lookup
+            names: the package names which were queried
+            arch: the architecture the lookup was for
+            found: the packages which were found, by name
+        """
+        for name in names:
+            self.packages[(kind, name, "", arch)] = found.get(
+                name, PackageNotFoundError("Package {}.{} was not found".format(name, arch))
+            )
+
+    def invalidate(self) -> None:
+        """Drop all memoized package lookups."""
+        self.packages.clear()
+
+
+_lookup_cache = _LookupCache()
+
+
+def _memoize_lookup(kind: str) -> Callable:
+    """Memoize a single package lookup classmethod of `DebianPackage`, including misses.
+
+    Only `PackageNotFoundError` is memoized, other errors such as a failed `dpkg` or `apt-cache`
+    call may be transient and are raised again on the next lookup. A memoized miss raises a new
+    exception on each hit, so that tracebacks do not pile up on a shared instance.
+
+    Args:
+        kind: the kind of lookup, distinguishing installed state from apt cache lookups
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(cls, package: str, version: Optional[str] = "", arch: Optional[str] = ""):
+            key = (kind, package, version or "", arch or _lookup_cache.system_arch())
+            cached = _lookup_cache.packages.get(key)
+            if isinstance(cached, PackageNotFoundError):
+                raise PackageNotFoundError(*cached.args)
+            if cached is not None:
+                return cached
+            try:
+                pkg = func(cls, package, version, arch)
+            except PackageNotFoundError as e:
+                _lookup_cache.packages[key] = PackageNotFoundError(*e.args)
+                raise
+            _lookup_cache.packages[key] = pkg
+            return pkg
+
+        return wrapper
+
+    return decorator
+
+
 class DebianPackage:
     """Represents a traditional Debian package and its utility functions.
 
@@ -247,6 +363,7 @@ class DebianPackage:
         if isinstance(package_names, str):
             package_names = [package_names]
         _cmd = ["apt-get", "-y", *optargs, command, *package_names]
+        _lookup_cache.invalidate()
         try:
             env = os.environ.copy()
             env["DEBIAN_FRONTEND"] = "noninteractive"
@@ -381,6 +498,7 @@ class DebianPackage:
             ) from None
 
     @classmethod
+    @_memoize_lookup("installed")
     def from_installed_package(
         cls, package: str, version: Optional[str] = "", arch: Optional[str] = ""
     ) -> "DebianPackage":
@@ -392,10 +510,7 @@ class DebianPackage:
             arch: an optional architecture, defaulting to `dpkg --print-architecture`.
                 If an architecture is not specified, this will be used for selection.
         """
-        system_arch = check_output(
-            ["dpkg", "--print-architecture"], universal_newlines=True
-        ).strip()
-        arch = arch if arch else system_arch
+        arch = arch if arch else _lookup_cache.system_arch()
 
         # Regexps are a really terrible way to do this. Thanks dpkg
         output = ""
@@ -451,6 +566,7 @@ class DebianPackage:
         raise PackageNotFoundError("Package {}.{} is not installed!".format(package, arch))
 
     @classmethod
+    @_memoize_lookup("apt-cache")
     def from_apt_cache(
         cls, package: str, version: Optional[str] = "", arch: Optional[str] = ""
     ) -> "DebianPackage":
@@ -462,10 +578,7 @@ class DebianPackage:
             arch: an optional architecture, defaulting to `dpkg --print-architecture`.
                 If an architecture is not specified, this will be used for selection.
         """
-        system_arch = check_output(
-            ["dpkg", "--print-architecture"], universal_newlines=True
-        ).strip()
-        arch = arch if arch else system_arch
+        arch = arch if arch else _lookup_cache.system_arch()
 
         # Regexps are a really terrible way to do this. Thanks dpkg
         keys = ("Package", "Architecture", "Version")
@@ -509,6 +622,167 @@ class DebianPackage:
         # If we didn't find it, fail through
         raise PackageNotFoundError("Package {}.{} is not in the apt cache!".format(package, arch))
 
+    @classmethod
+    def from_system_bulk(
+        cls, packages: List[str], arch: Optional[str] = ""
+    ) -> Dict[str, "DebianPackage"]:
+        """Locate several packages, either on the system or known to apt, in bulk.
+
+        Installed packages are looked up with a single `dpkg-query` call, and the remaining ones
+        with a single `apt-cache policy` call.
+
+        Args:
+            packages: a list of package names
+            arch: an optional architecture, defaulting to `dpkg --print-architecture`. If an
+                architecture is not specified, this will be used for selection.
+
+        Returns:
+            A dictionary of package name to `DebianPackage`. Packages which could not be found
+            on the system or in the apt cache are omitted.
+        """
+        found = DebianPackage.from_installed_packages(packages, arch)
+        remaining = [package for package in packages if package not in found]
+        if remaining:
+            found.update(DebianPackage.from_apt_cache_policy(remaining, arch))
+        return found
+
+    @classmethod
+    def from_installed_packages(
+        cls, packages: List[str], arch: Optional[str] = ""
+    ) -> Dict[str, "DebianPackage"]:
+        """Check which of the given packages are installed with a single `dpkg-query` call.
+
+        Args:
+            packages: a list of package names
+            arch: an optional architecture, defaulting to `dpkg --print-architecture`.
+                If an architecture is not specified, this will be used for selection.
+
+        Returns:
+            A dictionary of package name to `DebianPackage` for the installed packages.
+
+        Raises:
+            PackageError if `dpkg-query` fails for a reason other than unknown packages
+        """
+        arch = arch if arch else _lookup_cache.system_arch()
+        installed, uncached = _lookup_cache.get_many("installed", packages, arch)
+        if not uncached:
+            return installed
+
+        # dpkg-query exits with 1 if some of the packages are unknown but still lists the others
+        proc = subprocess.run(
+            [
+                "dpkg-query",
+                "--show",
+                "--showformat=${Package}\\t${Architecture}\\t${Version}\\t${db:Status-Abbrev}\\n",
+                *uncached,
+            ],
+            stdout=PIPE,
+            stderr=PIPE,
+            universal_newlines=True,
+            check=False,
+        )
+        if proc.returncode not in (0, 1):
+            raise PackageError("Could not query installed packages: {}".format(proc.stderr))
+
+        queried = {}
+        for line in proc.stdout.splitlines():
+            try:
+                name, pkg_arch, full_version, status = line.split("\t")
+            except ValueError:
+                logger.warning("dpkg-query output could not be parsed: %s", line)
+                continue
+            # The second letter of the abbreviated status is the current package state
+            if status[1:2] != "i":
+                logger.debug(
+                    "package '%s' in dpkg output but not installed, status: '%s'", name, status
+                )
+                continue
+            epoch, split_version = DebianPackage._get_epoch_from_version(full_version)
+            for requested in _requested_names(uncached, name, pkg_arch, arch):
+                queried[requested] = DebianPackage(
+                    requested, split_version, epoch, pkg_arch, PackageState.Present
+                )
+        _lookup_cache.set_many("installed", uncached, arch, queried)
+        installed.update(queried)
+        return installed
+
+    @classmethod
+    def from_apt_cache_policy(
+        cls, packages: List[str], arch: Optional[str] = ""
+    ) -> Dict[str, "DebianPackage"]:
+        """Look up the candidate versions of packages with a single `apt-cache policy` call.
+
+        Args:
+            packages: a list of package names
+            arch: an optional architecture, defaulting to `dpkg --print-architecture`.
+                If an architecture is not specified, this will be used for selection.
+
+        Returns:
+            A dictionary of package name to `DebianPackage` for the packages with an installation
+            candidate.
+
+        Raises:
+            PackageError if `apt-cache policy` fails
+        """
+        arch = arch if arch else _lookup_cache.system_arch()
+        available, uncached = _lookup_cache.get_many("candidate", packages, arch)
+        if not uncached:
+            return available
+
+        try:
+            output = check_output(
+                ["apt-cache", "policy", *uncached], stderr=PIPE, universal_newlines=True
+            )
+        except CalledProcessError as e:
+            raise PackageError(
+                "Could not list packages in apt-cache: {}".format(e.stderr)
+            ) from None
+
+        queried = {}
+        name = ""
+        pkg_arch = arch
+        for line in output.splitlines():
+            # Each package stanza starts with an unindented `<name>:` line, the name is only
+            # qualified with the architecture of packages of a foreign architecture
+            if not line.startswith(" ") and line.endswith(":"):
+                name, _, pkg_arch = line[:-1].partition(":")
+                pkg_arch = pkg_arch or arch
+                continue
+            key, _, value = line.strip().partition(": ")
+            if key != "Candidate" or not name or value == "(none)":
+                continue
+            epoch, split_version = DebianPackage._get_epoch_from_version(value)
+            for requested in _requested_names(uncached, name, pkg_arch, arch):
+                queried[requested] = DebianPackage(
+                    requested, split_version, epoch, pkg_arch, PackageState.Available
+                )
+        _lookup_cache.set_many("candidate", uncached, arch, queried)
+        available.update(queried)
+        return available
+
+
+def _requested_names(names: List[str], name: str, pkg_arch: str, arch: str) -> List[str]:
+    """Return the requested package names matching a package listed by dpkg or apt.
+
+    dpkg and apt list packages without the architecture qualifier they were requested with.
+    Names qualified with an architecture, e.g. `libc6:i386`, match the package of that
+    architecture, and unqualified names the package of the selected architecture or `all`.
+
+    Args:
+        names: the requested package names
+        name: the name of the listed package
+        pkg_arch: the architecture of the listed package
+        arch: the selected architecture
+
+    Returns: the requested names of the listed package
+    """
+    requested = []
+    if name in names and pkg_arch in ("all", arch):
+        requested.append(name)
+    if "{}:{}".format(name, pkg_arch) in names:
+        requested.append("{}:{}".format(name, pkg_arch))
+    return requested
+
 
 class Version:
     """An abstraction around package versions.
@@ -726,6 +1000,7 @@ def add_package(
     version: Optional[str] = "",
     arch: Optional[str] = "",
     update_cache: Optional[bool] = False,
+    cache_max_age: Optional[float] = None,
 ) -> Union[DebianPackage, List[DebianPackage]]:
     """Add a package or list of packages to the system.
 
@@ -735,6 +1010,9 @@ def add_package(
         version: an (Optional) version as a string. Defaults to the latest known
         arch: an optional architecture for the package
         update_cache: whether or not to run `apt-get update` prior to operating
+        cache_max_age: an (Optional) number of seconds within which a previous refresh of the
+            package lists is considered fresh, skipping the update requested by `update_cache`.
+            Packages which cannot be located in fresh lists still trigger a forced update.
 
     Raises:
         TypeError if no package name is given, or explicit version is set for multiple packages
@@ -743,8 +1021,7 @@ def add_package(
     """
     cache_refreshed = False
     if update_cache:
-        update()
-        cache_refreshed = True
+        cache_refreshed = update(max_age=cache_max_age)
 
     packages = {"success": [], "retry": [], "failed": []}
 
@@ -757,40 +1034,42 @@ def add_package(
             "Explicit version should not be set if more than one package is being added!"
         )
 
+    located = _locate_all(package_names, version, arch)
     for p in package_names:
-        pkg, success = _add(p, version, arch)
-        if success:
-            packages["success"].append(pkg)
+        if p in located:
+            packages["success"].append(located[p])
         else:
-            logger.warning("failed to locate and install/update '%s'", pkg)
+            logger.warning("failed to locate and install/update '%s'", p)
             packages["retry"].append(p)
 
     if packages["retry"] and not cache_refreshed:
         logger.info("updating the apt-cache and retrying installation of failed packages.")
-        update()
+        update(force=True)
 
+        located = _locate_all(packages["retry"], version, arch)
         for p in packages["retry"]:
-            pkg, success = _add(p, version, arch)
-            if success:
-                packages["success"].append(pkg)
+            if p in located:
+                packages["success"].append(located[p])
             else:
                 packages["failed"].append(p)
 
     if packages["failed"]:
         raise PackageError("Failed to install packages: {}".format(", ".join(packages["failed"])))
 
+    _install(packages["success"])
+
     return packages["success"] if len(packages["success"]) > 1 else packages["success"][0]
 
 
-def _add(
+def _locate(
     name: str,
     version: Optional[str] = "",
     arch: Optional[str] = "",
 ) -> Tuple[Union[DebianPackage, str], bool]:
-    """Add a package to the system.
+    """Locate a package on the system or in the apt cache without installing it.
 
     Args:
-        name: the name(s) of the package(s)
+        name: the name of the package
         version: an (Optional) version as a string. Defaults to the latest known
         arch: an optional architecture for the package
 
@@ -798,13 +1077,58 @@ def _add(
         a boolean indicating success
     """
     try:
-        pkg = DebianPackage.from_system(name, version, arch)
-        pkg.ensure(state=PackageState.Present)
-        return pkg, True
+        return DebianPackage.from_system(name, version, arch), True
     except PackageNotFoundError:
         return name, False
 
 
+def _locate_all(
+    names: List[str],
+    version: Optional[str] = "",
+    arch: Optional[str] = "",
+) -> Dict[str, DebianPackage]:
+    """Locate packages on the system or in the apt cache without installing them.
+
+    Without an explicit version, the whole set is resolved with one `dpkg-query` and at most one
+    `apt-cache policy` call, regardless of the number of packages.
+
+    Args:
+        names: the names of the packages
+        version: an (Optional) version as a string. Defaults to the latest known
+        arch: an optional architecture for the packages
+
+    Returns: a dictionary of package name to `DebianPackage` for each package that was found
+    """
+    if not version:
+        return DebianPackage.from_system_bulk(names, arch)
+    located = {}
+    for name in names:
+        pkg, success = _locate(name, version, arch)
+        if success:
+            located[name] = pkg
+    return located
+
+
+def _install(packages: List[DebianPackage]) -> None:
+    """Install all packages which are not yet present in a single `apt-get install` transaction.
+
+    Args:
+        packages: the located packages to reconcile to `PackageState.Present`
+
+    Raises:
+        PackageError if the packages fail to install
+    """
+    missing = [pkg for pkg in packages if not pkg.present]
+    if missing:
+        DebianPackage._apt(
+            "install",
+            ["{}={}".format(pkg.name, pkg.version) for pkg in missing],
+            optargs=["--option=Dpkg::Options::=--force-confold"],
+        )
+    for pkg in packages:
+        pkg._state = PackageState.Present
+
+
 def remove_package(
     package_names: Union[str, List[str]]
 ) -> Union[DebianPackage, List[DebianPackage]]:
@@ -835,9 +1159,38 @@ def remove_package(
     return packages[0] if len(packages) == 1 else packages
 
 
-def update() -> None:
-    """Update the apt cache via `apt-get update`."""
+def _lists_age() -> Optional[float]:
+    """Return the number of seconds since the apt package lists were last refreshed, if known."""
+    try:
+        return time.time() - os.stat(APT_LISTS_PATH).st_mtime
+    except OSError:
+        return None
+
+
+def update(max_age: Optional[float] = None, force: bool = False) -> bool:
+    """Update the apt cache via `apt-get update`.
+
+    Args:
+        max_age: an (Optional) number of seconds. The update is skipped if the package lists were
+            refreshed more recently than this. By default the cache is always updated.
+        force: update the cache regardless of `max_age`
+
+    Returns:
+        True if the cache was updated, False if it was fresh enough to skip the update.
+    """
+    if not force and max_age is not None:
+        age = _lists_age()
+        if age is not None and age < max_age:
+            logger.debug("apt package lists refreshed %d seconds ago, skipping update.", age)
+            return False
+    _lookup_cache.invalidate()
     subprocess.run(["apt-get", "update"], capture_output=True, check=True)
+    # apt-get update leaves the lists untouched when nothing changed upstream, record the refresh
+    try:
+        os.utime(APT_LISTS_PATH)
+    except OSError:
+        logger.debug("could not record apt package lists refresh time.")
+    return True
 
 
 def import_key(key: str) -> str:
@@ -3,10 +3,13 @@
 
 """tmate-ssh-server charm actions."""
 
+import json
 import logging
 
 import ops
 
+import server_config
+import timing
 import tmate
 from state import State
 
@@ -16,18 +19,29 @@ logger = logging.getLogger(__name__)
 class Observer(ops.Object):
     """Tmate-ssh-server charm actions observer."""
 
-    def __init__(self, charm: ops.CharmBase, state: State):
+    def __init__(
+        self,
+        charm: ops.CharmBase,
+        state: State,
+        timings: timing.History,
+        server_config_cache: server_config.Cache,
+    ):
         """Initialize the observer and register actions handlers.
 
         Args:
             charm: The parent charm to attach the observer to.
             state: The charm state.
+            timings: The install and restart timeline history.
+            server_config_cache: The cached server connection details.
         """
         super().__init__(charm, "actions-observer")
         self.charm = charm
         self.state = state
+        self.timings = timings
+        self.server_config_cache = server_config_cache
 
         charm.framework.observe(charm.on.get_server_config_action, self.on_get_server_config)
+        charm.framework.observe(charm.on.get_timings_action, self.on_get_timings)
 
     def on_get_server_config(self, event: ops.ActionEvent) -> None:
         """Get server configuration values for .tmate.conf.
@@ -39,9 +53,17 @@ class Observer(ops.Object):
             event.fail("Host address not ready yet.")
             return
         try:
-            conf = tmate.generate_tmate_conf(str(self.state.ip_addr))
+            conf = self.server_config_cache.tmate_conf(str(self.state.ip_addr))
         except tmate.FingerprintError as exc:
             logger.error("Failed to generate .tmate.conf, %s.", exc)
             event.fail("Failed to generate .tmate.conf. See juju debug-log output.")
             return
         event.set_results({"tmate-config": conf})
+
+    def on_get_timings(self, event: ops.ActionEvent) -> None:
+        """Get the per-stage timings of the most recent install and restart runs.
+
+        Args:
+            event: The get-timings action event.
+        """
+        event.set_results({"timelines": json.dumps(self.timings.timelines())})
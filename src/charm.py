@@ -5,22 +5,42 @@
 
 """Charm tmate-ssh-server."""
 
+import dataclasses
 import logging
 import typing
+from functools import partial
+from pathlib import Path
 
 import ops
 
 import actions
+import daemon_status
+import host_keys
+import key_rotation
+import pipeline
+import prerequisites
+import server_config
+import shared_keys
 import ssh_debug
+import timing
 import tmate
-from state import State
+from state import (
+    DEPENDENCY_BUNDLE_RESOURCE_NAME,
+    IMAGE_RESOURCE_NAME,
+    PEER_INTEGRATION_NAME,
+    CharmConfigInvalidError,
+    State,
+)
 
 logger = logging.getLogger(__name__)
 
 
-class TmateSSHServerOperatorCharm(ops.CharmBase):
+# The charm holds one attribute per observer and state component.
+class TmateSSHServerOperatorCharm(ops.CharmBase):  # pylint: disable=too-many-instance-attributes
     """Charm tmate-ssh-server."""
 
+    _stored = ops.StoredState()
+
     def __init__(self, *args: typing.Any):
         """Initialize the charm and register event handlers.
 
@@ -28,90 +48,582 @@ class TmateSSHServerOperatorCharm(ops.CharmBase):
             args: Arguments to initialize the charm base.
         """
         super().__init__(*args)
-        self.state = State.from_charm(self)
-        self.actions = actions.Observer(self, self.state)
-        self.sshdebug = ssh_debug.Observer(self, self.state)
+        self._stored.set_default(image=prerequisites.IMAGE, checkpoints={})
+        # The image reference shared between the concurrent install stages.
+        self._image: str = self._stored.image
+        self._config_error: typing.Optional[str] = None
+        try:
+            self.state = State.from_charm(self)
+        except CharmConfigInvalidError as exc:
+            logger.error("Invalid charm configuration, %s", exc.msg)
+            self._config_error = exc.msg
+            self.unit.status = ops.BlockedStatus(exc.msg)
+            # The install hook is not emitted again, it is deferred until the configuration is
+            # fixed. The other hooks are emitted again on the next configuration change.
+            self.framework.observe(self.on.install, self._on_install)
+            return
+        self.timings = timing.History(self)
+        self.server_config_cache = server_config.Cache(self)
+        self.shared_keys = shared_keys.SharedKeys(self)
+        self.actions = actions.Observer(self, self.state, self.timings, self.server_config_cache)
+        self.sshdebug = ssh_debug.Observer(self, self.state, self.server_config_cache)
+        self.key_rotation = key_rotation.Observer(
+            self, self.state, self.sshdebug, self.server_config_cache, self.shared_keys
+        )
 
         self.framework.observe(self.on.install, self._on_install)
+        self.framework.observe(self.on.config_changed, self._on_keys_changed)
+        self.framework.observe(self.on.config_changed, self._on_config_changed)
+        self.framework.observe(self.on.leader_elected, self._on_keys_changed)
+        self.framework.observe(self.on.secret_changed, self._on_keys_changed)
+        self.framework.observe(
+            self.on[PEER_INTEGRATION_NAME].relation_changed, self._on_keys_changed
+        )
+        self.framework.observe(self.on.upgrade_charm, self._on_upgrade_charm)
         self.framework.observe(self.on.update_status, self._on_update_status)
 
+    def _fetch_resource(self, name: str) -> typing.Optional[Path]:
+        """Fetch an optional charm resource.
+
+        Args:
+            name: The name of the resource.
+
+        Returns:
+            The path to the resource file, or None if the resource is not attached.
+        """
+        try:
+            path = self.model.resources.fetch(name)
+        except (ops.ModelError, NameError):
+            logger.debug("Resource %s not attached.", name)
+            return None
+        # An empty file is uploaded as a placeholder when no resource is attached.
+        if not path.stat().st_size:
+            logger.debug("Resource %s is empty.", name)
+            return None
+        return path
+
+    @staticmethod
+    def _file_identity(path: typing.Optional[Path]) -> typing.Optional[list]:
+        """Identify the content of a file without reading it.
+
+        Args:
+            path: The path to the file.
+
+        Returns:
+            The path, size and modification time of the file, or None if there is no file.
+        """
+        if not path:
+            return None
+        stat = path.stat()
+        return [str(path), stat.st_size, stat.st_mtime_ns]
+
+    def _install_dependencies(self, bundle_path: typing.Optional[Path]) -> None:
+        """Install the apt dependencies, from the offline bundle if attached.
+
+        Args:
+            bundle_path: The path to the dependency bundle resource, if attached.
+
+        Raises:
+            DependencySetupError: if the dependencies failed to install.
+        """
+        try:
+            prerequisites.install_dependencies(self.state.proxy_config, bundle_path=bundle_path)
+        except prerequisites.DependencySetupError as exc:
+            logger.error("Failed to install docker package, %s.", exc)
+            raise
+
+    def _install_keys(
+        self, keys: typing.Optional[typing.Mapping[str, str]]
+    ) -> host_keys.Fingerprints:
+        """Install the host keys shared by the leader unit, or generate them if not shared.
+
+        Args:
+            keys: The host keys shared by the leader unit, if any.
+
+        Returns:
+            The public key fingerprints of the host keys.
+
+        Raises:
+            KeyInstallError: if the keys failed to install.
+        """
+        try:
+            if keys:
+                return host_keys.write_keys(keys)
+            return host_keys.install_keys(host_key_config=self.state.host_key_config)
+        except host_keys.KeyInstallError as exc:
+            logger.error("Failed to install/generate keys, %s.", exc)
+            raise
+
+    def _prepare_image(self, image_path: typing.Optional[Path]) -> str:
+        """Load the tmate-ssh-server image from the image resource if attached, or pull it.
+
+        The image reference is stored before the stage is checkpointed, so that a retried install
+        skipping this stage starts the daemon with the same image.
+
+        Args:
+            image_path: The path to the image resource, if attached.
+
+        Returns:
+            The reference of the image to run.
+
+        Raises:
+            DockerError: if the image failed to load or pull.
+        """
+        try:
+            self._image = (
+                prerequisites.load_image(image_path) if image_path else prerequisites.pull_image()
+            )
+        except prerequisites.DockerError as exc:
+            logger.error("Failed to prepare tmate-ssh-server image, %s.", exc)
+            raise
+        self._stored.image = self._image
+        return self._image
+
+    @property
+    def _ports(self) -> list[int]:
+        """The ports of the configured tmate-ssh-server workers.
+
+        Returns:
+            The consecutive ports of the workers.
+        """
+        return tmate.worker_ports(self.state.workers)
+
+    def _start_daemon(self, timeline: timing.Timeline) -> None:
+        """Start the tmate-ssh-server workers.
+
+        Args:
+            timeline: The timeline to record the start steps in.
+
+        Raises:
+            DaemonError: if the daemon failed to start.
+        """
+        try:
+            tmate.start_daemon(
+                address=str(self.state.ip_addr),
+                name=tmate.container_name(self.unit.name),
+                image=self._image,
+                restart_policy=self.state.restart_policy,
+                ports=self._ports,
+                timeline=timeline,
+            )
+        except tmate.DaemonError as exc:
+            logger.error("Failed to start tmate-ssh-server daemon, %s.", exc)
+            raise
+
     def _on_install(self, event: ops.InstallEvent) -> None:
         """Install and start tmate-ssh-server.
 
+        The install stages run as a dependency graph: key generation runs concurrently with the
+        package installation and image preparation, and the daemon starts once all are done.
+        Stages already satisfied on the machine, e.g. on a pre-built machine image, and stages
+        completed by a previous attempt with the same inputs are skipped.
+
         Args:
             event: The event emitted on install hook.
 
         Raises:
-            DependencyInstallError: if the dependencies required to start charm has failed.
+            DependencySetupError: if the dependencies required to start charm has failed.
             KeyInstallError: if the ssh-key installation and fingerprint generation failed.
+            DockerError: if the tmate-ssh-server image failed to load or pull.
             DaemonError: if the workload daemon was unable to start.
+            IncompleteInitError: if the generated keys could not be read back.
         """
+        if self._config_error:
+            logger.warning("Invalid charm configuration, deferring the install.")
+            event.defer()
+            return
         if not self.state.ip_addr:
             logger.warning("Unit address not assigned.")
             # Try again until unit is assigned an IP address.
             event.defer()
             return
 
+        self.unit.status = ops.MaintenanceStatus("Installing tmate-ssh-server.")
+        timeline = timing.Timeline(name="install")
         try:
-            self.unit.status = ops.MaintenanceStatus("Installing packages.")
-            tmate.install_dependencies(self.state.proxy_config)
-        except tmate.DependencySetupError as exc:
-            logger.error("Failed to install docker package, %s.", exc)
-            raise
+            self._install(timeline)
+        finally:
+            self.timings.record(timeline)
+        self.unit.status = ops.ActiveStatus()
+
+    def _install_stages(
+        self,
+        timeline: timing.Timeline,
+        bundle_path: typing.Optional[Path],
+        image_path: typing.Optional[Path],
+        satisfied: prerequisites.Preflight,
+        keys: typing.Optional[typing.Mapping[str, str]],
+    ) -> list[pipeline.Stage]:
+        """Get the install stages, fingerprinted by their inputs.
+
+        The stages are checkpointed so that a retried install hook resumes at the first stage
+        that did not complete or whose inputs changed.
+
+        Args:
+            timeline: The timeline to record the daemon start steps in.
+            bundle_path: The path to the dependency bundle resource, if attached.
+            image_path: The path to the image resource, if attached.
+            satisfied: The install prerequisites already satisfied on the machine.
+            keys: The host keys shared by the leader unit, if any.
+
+        Returns:
+            The install stages.
+        """
+        image = self._file_identity(image_path) or prerequisites.IMAGE
+        return [
+            pipeline.Stage(
+                name="dependencies",
+                func=partial(self._install_dependencies, bundle_path),
+                satisfied=satisfied.dependencies,
+                fingerprint=pipeline.fingerprint(
+                    prerequisites.APT_DEPENDENCIES,
+                    prerequisites.DOCKER_PACKAGE,
+                    self.state.proxy_config,
+                    self._file_identity(bundle_path),
+                ),
+            ),
+            pipeline.Stage(
+                name="keys",
+                func=partial(self._install_keys, keys),
+                fingerprint=pipeline.fingerprint(
+                    str(host_keys.KEYS_DIR), dataclasses.asdict(self.state.host_key_config), keys
+                ),
+            ),
+            pipeline.Stage(
+                name="image",
+                func=partial(self._prepare_image, image_path),
+                requires=("dependencies",),
+                fingerprint=pipeline.fingerprint(image),
+                # An attached image resource takes precedence over a pre-loaded image.
+                satisfied=not image_path and bool(satisfied.image),
+            ),
+            pipeline.Stage(
+                name="daemon",
+                func=partial(self._start_daemon, timeline),
+                requires=("keys", "image"),
+                fingerprint=pipeline.fingerprint(
+                    str(self.state.ip_addr),
+                    image,
+                    dataclasses.asdict(self.state.restart_policy),
+                    self.state.workers,
+                    tmate.template_digest("tmate-ssh-server.service.j2"),
+                ),
+            ),
+        ]
+
+    def _install(self, timeline: timing.Timeline) -> None:
+        """Run the install stages and publish the server connection details.
+
+        Args:
+            timeline: The timeline to record the install stages in.
+
+        Raises:
+            DependencySetupError: if the dependencies required to start charm has failed.
+            KeyInstallError: if the ssh-key installation and fingerprint generation failed.
+            DockerError: if the tmate-ssh-server image failed to load or pull.
+            DaemonError: if the workload daemon was unable to start.
+            IncompleteInitError: if the generated keys could not be read back.
+        """
+        with timeline.stage("fetch-resources"):
+            bundle_path = self._fetch_resource(DEPENDENCY_BUNDLE_RESOURCE_NAME)
+            image_path = self._fetch_resource(IMAGE_RESOURCE_NAME)
+        with timeline.stage("preflight"):
+            satisfied = prerequisites.preflight(self.state.proxy_config)
+            keys = self.shared_keys.get()
+        if not image_path and satisfied.image:
+            logger.info("Using pre-loaded image %s.", satisfied.image)
+            self._image = satisfied.image
+            self._stored.image = satisfied.image
+        pipeline.run(
+            self._install_stages(
+                timeline,
+                bundle_path=bundle_path,
+                image_path=image_path,
+                satisfied=satisfied,
+                keys=keys,
+            ),
+            timeline=timeline,
+            checkpoints=self._stored.checkpoints,
+            on_checkpoint=self.framework.commit,
+        )
+
+        with timeline.stage("publish"):
+            try:
+                fingerprints = self.server_config_cache.fingerprints()
+            except host_keys.IncompleteInitError as exc:
+                logger.error("Something went wrong initializing keys, %s.", exc)
+                raise
+
+            self.shared_keys.publish(self.key_rotation.switch_at)
+            self.unit.set_ports(*self._ports)
+            self.sshdebug.update_relation_data(
+                host=str(self.state.ip_addr), fingerprints=fingerprints
+            )
 
+    def _restart(self, timeline: timing.Timeline, ports: typing.Sequence[int]) -> None:
+        """Restart tmate-ssh-server workers.
+
+        Args:
+            timeline: The timeline to record the restart steps in.
+            ports: The ports of the workers to restart.
+
+        Raises:
+            DaemonError: if the daemon failed to start.
+        """
+        logger.info("Will restart tmate-ssh-server workers %s.", list(ports))
         try:
-            self.unit.status = ops.MaintenanceStatus("Generating keys.")
-            tmate.install_keys(host_ip=self.state.ip_addr)
-        except tmate.KeyInstallError as exc:
-            logger.error("Failed to install/generate keys, %s.", exc)
+            with timeline.stage("start-daemon"):
+                tmate.start_daemon(
+                    address=str(self.state.ip_addr),
+                    name=tmate.container_name(self.unit.name),
+                    image=self._stored.image,
+                    restart_policy=self.state.restart_policy,
+                    ports=ports,
+                    timeline=timeline,
+                )
+        except tmate.DaemonError:
+            logger.exception("tmate-ssh-server daemon not active.")
             raise
 
+    def _reload_keys(self, timeline: timing.Timeline) -> None:
+        """Restart the tmate-ssh-server workers to load changed host keys and publish them.
+
+        The workers restart one at a time, each once the previous one accepts SSH connections
+        again, so that the other workers keep serving clients.
+
+        Args:
+            timeline: The timeline to record the reload steps in.
+
+        Raises:
+            DaemonError: if a worker failed to restart.
+        """
+        for port in self._ports:
+            with timeline.stage("stop-daemon"):
+                tmate.stop_daemon([port])
+            self._restart(timeline, [port])
+        with timeline.stage("publish"):
+            self.sshdebug.update_relation_data(
+                host=str(self.state.ip_addr),
+                fingerprints=self.server_config_cache.fingerprints(),
+                next_fingerprints=host_keys.staged_fingerprints(),
+            )
+
+    def _switch_keys(self, timeline: timing.Timeline) -> None:
+        """Restart the tmate-ssh-server daemon with the keys staged by a key rotation.
+
+        Args:
+            timeline: The timeline to record the switch steps in.
+
+        Raises:
+            KeyInstallError: if the staged keys could not be activated.
+            DaemonError: if the daemon failed to restart.
+        """
+        logger.info("Switching tmate-ssh-server to the rotated host keys.")
+        with timeline.stage("activate-keys"):
+            host_keys.activate_staged_keys()
+            self.shared_keys.publish()
+        self._reload_keys(timeline)
+        self.key_rotation.complete()
+
+    def _on_keys_changed(self, _: ops.EventBase) -> None:
+        """Apply the host key configuration or the shared host keys to the installed host keys.
+
+        The leader unit generates the host keys for the configuration and shares them, the other
+        units install the host keys shared by the leader and follow its key rotations.
+
+        Raises:
+            KeyInstallError: if the host keys failed to install.
+            DaemonError: if the daemon failed to restart.
+        """
+        if not self.state.ip_addr:
+            logger.warning("Unit address not assigned. Stop further execution of the hook.")
+            return
         try:
-            self.unit.status = ops.MaintenanceStatus("Starting tmate-ssh-server daemon.")
-            tmate.start_daemon(address=str(self.state.ip_addr))
-        except tmate.DaemonError as exc:
-            logger.error("Failed to start tmate-ssh-server daemon, %s.", exc)
-            raise
+            fingerprints = self.server_config_cache.fingerprints()
+        except host_keys.IncompleteInitError:
+            logger.debug("Host keys not installed yet, they are installed on install.")
+            return
 
+        keys = self.shared_keys.get()
+        new_fingerprints = self._install_keys(keys)
+        if keys:
+            self.key_rotation.follow(self.shared_keys.rotation())
+        self.shared_keys.publish(self.key_rotation.switch_at)
+        if new_fingerprints == fingerprints:
+            return
+        logger.info("Host keys changed, restarting tmate-ssh-server.")
+        timeline = timing.Timeline(name="reload-keys")
         try:
-            fingerprints = tmate.get_fingerprints()
-        except tmate.IncompleteInitError as exc:
-            logger.error("Something went wrong initializing keys, %s.", exc)
-            raise
+            self._reload_keys(timeline)
+        finally:
+            self.timings.record(timeline)
 
-        self.unit.open_port("tcp", tmate.PORT)
-        self.sshdebug.update_relation_data(host=str(self.state.ip_addr), fingerprints=fingerprints)
-        self.unit.status = ops.ActiveStatus()
+    def _publish_workers(self) -> None:
+        """Open the ports of the workers and publish them with the host key fingerprints."""
+        self.unit.set_ports(*self._ports)
+        self.sshdebug.update_relation_data(
+            host=str(self.state.ip_addr),
+            fingerprints=self.server_config_cache.fingerprints(),
+            next_fingerprints=host_keys.staged_fingerprints(),
+        )
 
-    def _on_update_status(self, _: ops.UpdateStatusEvent) -> None:
-        """Check the health of the workload and restart if necessary.
+    def _scale_workers(self) -> None:
+        """Start the added tmate-ssh-server workers and remove the dropped ones.
+
+        The workers are only scaled once installed, i.e. once the install hook opened their ports.
 
         Raises:
-            DaemonError: if there is an issue with the tmate-ssh-server daemon.
+            DaemonError: if the workers could not be started or removed.
+        """
+        opened = {port.port for port in self.unit.opened_ports() if port.port}
+        if not opened:
+            return
+        added = [port for port in self._ports if port not in opened]
+        removed = sorted(opened - set(self._ports))
+        if not added and not removed:
+            return
+        logger.info("Scaling tmate-ssh-server workers, adding %s, removing %s.", added, removed)
+        timeline = timing.Timeline(name="scale-workers")
+        try:
+            if removed:
+                with timeline.stage("remove-workers"):
+                    tmate.remove_workers(removed)
+            if added:
+                self._restart(timeline, added)
+            with timeline.stage("publish"):
+                self._publish_workers()
+        finally:
+            self.timings.record(timeline)
+
+    def _on_config_changed(self, _: ops.ConfigChangedEvent) -> None:
+        """Apply the restart policy and workers configuration to the tmate-ssh-server services.
+
+        The blocked status of a previously invalid configuration is cleared once installed.
+
+        Raises:
+            DaemonError: if the restart policy could not be applied or the workers scaled.
         """
         if not self.state.ip_addr:
             logger.warning("Unit address not assigned. Stop further execution of the hook.")
             return
+        if tmate.apply_restart_policy(
+            address=str(self.state.ip_addr),
+            name=tmate.container_name(self.unit.name),
+            image=self._stored.image,
+            restart_policy=self.state.restart_policy,
+        ):
+            logger.info("Applied restart policy %s.", self.state.restart_policy)
+        self._scale_workers()
+        if isinstance(self.unit.status, ops.BlockedStatus) and self.unit.opened_ports():
+            self.unit.status = ops.ActiveStatus()
 
-        if not (tmate_status := tmate.status()).running:
-            logger.error("tmate-ssh-server is not running:\n %s", tmate_status.status)
+    def _on_upgrade_charm(self, _: ops.UpgradeCharmEvent) -> None:
+        """Replace the single tmate-ssh-server service of previous charm revisions with workers.
 
-            logger.info("Will restart tmate-ssh-server daemon.")
-            try:
-                tmate.start_daemon(address=str(self.state.ip_addr))
-            except tmate.DaemonError:
-                logger.exception("tmate-ssh-server daemon not active.")
-                raise
+        Raises:
+            DaemonError: if the workers failed to start.
+        """
+        if not self.state.ip_addr:
+            logger.warning("Unit address not assigned. Stop further execution of the hook.")
+            return
+        if not tmate.legacy_service_installed():
+            return
+        timeline = timing.Timeline(name="upgrade")
+        try:
+            self._restart(timeline, self._ports)
+            with timeline.stage("publish"):
+                self._publish_workers()
+        finally:
+            self.timings.record(timeline)
+
+    def _recover(self, unhealthy: typing.Mapping[int, daemon_status.DaemonStatus]) -> None:
+        """Restart the tmate-ssh-server workers which systemd did not recover.
+
+        Args:
+            unhealthy: The status of the workers to restart, by port.
+
+        Raises:
+            DaemonError: if the workers failed to restart.
+        """
+        timeline = timing.Timeline(name="restart")
+        try:
+            if running := [port for port, worker in unhealthy.items() if worker.running]:
+                with timeline.stage("stop-daemon"):
+                    tmate.stop_daemon(running)
+            # systemd refuses to start a service again until its start limit is reset.
+            if failed := [port for port, worker in unhealthy.items() if worker.failed]:
+                with timeline.stage("reset-failed"):
+                    tmate.reset_failed(failed)
+            self._restart(timeline, list(unhealthy))
+        finally:
+            self.timings.record(timeline)
 
-            logger.info("Removing stopped containers.")
+    def _unhealthy_workers(
+        self, statuses: typing.Mapping[int, daemon_status.DaemonStatus]
+    ) -> dict[int, daemon_status.DaemonStatus]:
+        """Get the workers not accepting SSH connections, leaving those systemd restarts.
+
+        Args:
+            statuses: The status of the workers, by port.
+
+        Returns:
+            The status of the unhealthy workers, by port.
+
+        Raises:
+            DaemonError: if the docker daemon could not be queried.
+        """
+        unhealthy = {}
+        name = tmate.container_name(self.unit.name)
+        for port, worker in statuses.items():
+            if worker.restarting:
+                continue
+            if not worker.running:
+                logger.error("tmate-ssh-server worker %s is not running: %s", port, worker)
+            elif not tmate.check_docker_container(tmate.worker_container_name(name, port)):
+                logger.error("tmate-ssh-server worker %s is running without its container.", port)
+            elif not tmate.probe_ssh_banner(str(self.state.ip_addr), port):
+                logger.error(
+                    "tmate-ssh-server worker %s is running but not accepting SSH connections.",
+                    port,
+                )
+            else:
+                logger.debug("tmate-ssh-server worker %s is running: %s", port, worker)
+                continue
+            unhealthy[port] = worker
+        return unhealthy
+
+    def _on_update_status(self, _: ops.UpdateStatusEvent) -> None:
+        """Verify that the workers accept SSH connections.
+
+        systemd restarts a worker when it exits, a worker is only restarted here if it stopped
+        accepting SSH connections or systemd gave up restarting it. The other workers keep serving
+        while the unhealthy ones restart.
+
+        Raises:
+            DaemonError: if there is an issue with the tmate-ssh-server daemon.
+        """
+        if not self.state.ip_addr:
+            logger.warning("Unit address not assigned. Stop further execution of the hook.")
+            return
+
+        if self.key_rotation.switch_due():
+            timeline = timing.Timeline(name="rotate-keys")
             try:
-                tmate.remove_stopped_containers()
-            except tmate.DockerError:
-                logger.exception("Failed to remove stopped containers.")
-                raise
-        else:
-            logger.debug("tmate-ssh-server is running:\n %s", tmate_status.status)
+                self._switch_keys(timeline)
+            finally:
+                self.timings.record(timeline)
+            self.unit.status = ops.ActiveStatus()
+            return
 
+        statuses = tmate.status(self._ports)
+        if unhealthy := self._unhealthy_workers(statuses):
+            self._recover(unhealthy)
+        if restarting := [port for port, worker in statuses.items() if worker.restarting]:
+            logger.warning(
+                "tmate-ssh-server workers %s exited, systemd is restarting them.", restarting
+            )
+            self.unit.status = ops.MaintenanceStatus("Waiting for tmate-ssh-server to restart.")
+            return
         self.unit.status = ops.ActiveStatus()
 
 
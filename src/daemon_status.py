@@ -0,0 +1,108 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Status of the tmate-ssh-server workers, built from the unit properties of their services."""
+
+import dataclasses
+import typing
+from datetime import datetime, timezone
+
+# The unit properties of a tmate-ssh-server worker service making up its status.
+STATUS_PROPERTIES = (
+    "ActiveState",
+    "SubState",
+    "MainPID",
+    "NRestarts",
+    "ActiveEnterTimestamp",
+    "MemoryCurrent",
+    "TasksCurrent",
+)
+
+
+@dataclasses.dataclass
+class DaemonStatus:
+    """The status of a tmate-ssh-server worker.
+
+    Attributes:
+        running: True if the daemon is running, False otherwise.
+        status: The active state and sub-state of the service, e.g. active (running).
+        main_pid: The PID of the main process of the service, None if it is not running.
+        restarts: The number of times systemd restarted the service.
+        active_since: When the service last became active.
+        memory: The memory used by the service in bytes, None if it is not accounted.
+        tasks: The number of tasks of the service, None if it is not accounted.
+    """
+
+    running: bool
+    status: str
+    main_pid: typing.Optional[int] = None
+    restarts: typing.Optional[int] = None
+    active_since: typing.Optional[datetime] = None
+    memory: typing.Optional[int] = None
+    tasks: typing.Optional[int] = None
+
+    @property
+    def restarting(self) -> bool:
+        """Whether systemd is about to restart the exited daemon.
+
+        Returns:
+            True if systemd is waiting for the restart delay to pass.
+        """
+        return self.status.startswith("activating (auto-restart")
+
+    @property
+    def failed(self) -> bool:
+        """Whether the daemon failed, e.g. once it hit the start limit.
+
+        Returns:
+            True if the service is in the failed state.
+        """
+        return self.status.startswith("failed ")
+
+
+def _int_property(value: typing.Optional[str]) -> typing.Optional[int]:
+    """Parse an integer unit property.
+
+    Args:
+        value: The value of the property, as shown by systemctl.
+
+    Returns:
+        The integer value, None if the property is not set.
+    """
+    return int(value) if value and value.isdigit() else None
+
+
+def _timestamp_property(value: typing.Optional[str]) -> typing.Optional[datetime]:
+    """Parse a timestamp unit property.
+
+    Args:
+        value: The value of the property, as shown by systemctl show --timestamp=unix.
+
+    Returns:
+        The timestamp, None if the property is not set.
+    """
+    if not value or not value.startswith("@") or not value[1:].isdigit():
+        return None
+    return datetime.fromtimestamp(int(value[1:]), tz=timezone.utc)
+
+
+def from_properties(properties: typing.Mapping[str, str]) -> DaemonStatus:
+    """Build the status of a tmate-ssh-server worker from the unit properties of its service.
+
+    Args:
+        properties: The unit properties of the service, as shown by systemctl.
+
+    Returns:
+        The status of the worker.
+    """
+    active_state = properties.get("ActiveState", "unknown")
+    return DaemonStatus(
+        running=active_state == "active",
+        status=f"{active_state} ({properties.get('SubState', 'unknown')})",
+        # systemd reports a PID of 0 when the service has no main process.
+        main_pid=_int_property(properties.get("MainPID")) or None,
+        restarts=_int_property(properties.get("NRestarts")),
+        active_since=_timestamp_property(properties.get("ActiveEnterTimestamp")),
+        memory=_int_property(properties.get("MemoryCurrent")),
+        tasks=_int_property(properties.get("TasksCurrent")),
+    )
@@ -0,0 +1,197 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Minimal Docker Engine API client over the docker daemon unix socket."""
+
+import dataclasses
+import http.client
+import json
+import logging
+import re
+import socket
+import typing
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+DOCKER_SOCKET_PATH = Path("/var/run/docker.sock")
+# The timestamp docker reports for containers that never started.
+_ZERO_TIMESTAMP_PREFIX = "0001-01-01"
+
+
+class DockerAPIError(Exception):
+    """Represents an error querying the Docker Engine API."""
+
+
+@dataclasses.dataclass(frozen=True)
+class ContainerState:
+    """The state of a docker container.
+
+    Attributes:
+        name: The name of the container.
+        running: Whether the container is running.
+        health: The health check status of the container, None if it has no health check.
+        started_at: When the container last started, None if it never started.
+        restart_count: The number of times docker restarted the container.
+    """
+
+    name: str
+    running: bool
+    health: typing.Optional[str]
+    started_at: typing.Optional[datetime]
+    restart_count: int
+
+
+def _parse_timestamp(value: str) -> typing.Optional[datetime]:
+    """Parse a docker RFC 3339 timestamp with up to nanosecond precision.
+
+    Args:
+        value: The timestamp reported by docker.
+
+    Returns:
+        The timezone aware timestamp, None for the zero timestamp of docker.
+    """
+    if not value or value.startswith(_ZERO_TIMESTAMP_PREFIX):
+        return None
+    # datetime only supports microseconds, and only 3 or 6 fractional digits before Python 3.11.
+    value = re.sub(r"\.(\d+)", lambda match: "." + f"{match.group(1):0<6}"[:6], value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _container_state(inspect: dict[str, typing.Any]) -> ContainerState:
+    """Get the container state from a container inspect response.
+
+    Args:
+        inspect: The container inspect response.
+
+    Returns:
+        The container state.
+    """
+    state = inspect["State"]
+    health = state.get("Health")
+    return ContainerState(
+        name=inspect["Name"].lstrip("/"),
+        running=state["Running"],
+        health=health["Status"] if health else None,
+        started_at=_parse_timestamp(state.get("StartedAt", "")),
+        restart_count=inspect.get("RestartCount", 0),
+    )
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix socket."""
+
+    def __init__(self, socket_path: Path, timeout: float):
+        """Initialize the connection.
+
+        Args:
+            socket_path: The path of the unix socket.
+            timeout: The timeout in seconds of the socket operations.
+        """
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        """Connect to the unix socket."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.socket_path))
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class DockerClient:
+    """Docker Engine API client, reusing one connection to the docker daemon for all requests."""
+
+    def __init__(self, socket_path: Path = DOCKER_SOCKET_PATH, timeout: float = 10):
+        """Initialize the client, the connection is opened on the first request.
+
+        Args:
+            socket_path: The path of the docker daemon unix socket.
+            timeout: The timeout in seconds of the socket operations.
+        """
+        self._connection = _UnixHTTPConnection(socket_path, timeout=timeout)
+
+    def __enter__(self) -> "DockerClient":
+        """Use the client as a context manager closing the connection on exit.
+
+        Returns:
+            The client.
+        """
+        return self
+
+    def __exit__(self, *_: typing.Any) -> None:
+        """Close the connection."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the connection to the docker daemon."""
+        self._connection.close()
+
+    def _request(self, url: str) -> tuple[int, bytes]:
+        """Send a GET request, reconnecting once if the daemon closed the idle connection.
+
+        Args:
+            url: The URL path and query of the request.
+
+        Returns:
+            The response status and body.
+        """
+        reused = self._connection.sock is not None
+        try:
+            self._connection.request("GET", url)
+            response = self._connection.getresponse()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            self._connection.close()
+            if not reused:
+                raise
+            logger.debug("Docker daemon closed the connection, reconnecting.")
+            self._connection.request("GET", url)
+            response = self._connection.getresponse()
+        return response.status, response.read()
+
+    def _get(self, url: str) -> typing.Optional[typing.Any]:
+        """Query an API endpoint.
+
+        Args:
+            url: The URL path of the endpoint.
+
+        Returns:
+            The decoded JSON response, None if the queried object does not exist.
+
+        Raises:
+            DockerAPIError: if the docker daemon could not be queried.
+        """
+        try:
+            status, body = self._request(url)
+        except (OSError, http.client.HTTPException) as exc:
+            self._connection.close()
+            raise DockerAPIError(f"Failed to query docker daemon {url}, {exc!r}.") from exc
+        if status == http.HTTPStatus.NOT_FOUND:
+            return None
+        if status != http.HTTPStatus.OK:
+            raise DockerAPIError(f"Docker daemon query {url} failed with {status}: {body!r}.")
+        try:
+            return json.loads(body)
+        except json.JSONDecodeError as exc:
+            raise DockerAPIError(f"Invalid docker daemon response to {url}.") from exc
+
+    def container(self, name: str) -> typing.Optional[ContainerState]:
+        """Get the state of a container by its exact name.
+
+        Args:
+            name: The name of the container.
+
+        Returns:
+            The container state, None if there is no container of that name.
+        """
+        inspect = self._get(f"/containers/{quote(name, safe='')}/json")
+        # The inspect endpoint also looks up containers by ID prefix.
+        if not inspect or inspect["Name"].lstrip("/") != name:
+            return None
+        return _container_state(inspect)
@@ -0,0 +1,449 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Generate, share and fingerprint the tmate-ssh-server host keys."""
+
+import base64
+import dataclasses
+import hashlib
+import logging
+import os
+import shutil
+import typing
+from pathlib import Path
+
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+import state
+
+# The location of the optional host-keys storage in metadata.yaml.
+KEYS_DIR = Path("/home/ubuntu/keys")
+# New host keys are staged here by a key rotation until they replace the keys in KEYS_DIR.
+STAGED_KEYS_DIR = Path("/home/ubuntu/staged-keys")
+
+# The owner of the key files, the tmate-ssh-server service user.
+USER = "ubuntu"
+GROUP = "ubuntu"
+
+# The private key types of the supported host key algorithms.
+PrivateKey = typing.Union[rsa.RSAPrivateKey, ed25519.Ed25519PrivateKey]
+
+logger = logging.getLogger(__name__)
+
+
+class KeyInstallError(Exception):
+    """Represents an error while installing/generating key files."""
+
+
+class IncompleteInitError(Exception):
+    """The tmate-ssh-server has not been fully initialized."""
+
+
+@dataclasses.dataclass
+class Fingerprints:
+    """The public key fingerprints.
+
+    Attributes:
+        ed25519: The ed25519 public key fingerprint.
+        rsa: The RSA public key fingerprint, if an RSA host key is configured.
+    """
+
+    ed25519: str
+    rsa: typing.Optional[str] = None
+
+
+def _key_path(keys_dir: Path, algorithm: str) -> Path:
+    """Get the path to the private host key of an algorithm.
+
+    Args:
+        keys_dir: The directory of the keys.
+        algorithm: The host key algorithm.
+
+    Returns:
+        The path to the private key.
+    """
+    return keys_dir / f"ssh_host_{algorithm}_key"
+
+
+def _pub_key_path(key_path: Path) -> Path:
+    """Get the path to the public key of a private key.
+
+    Args:
+        key_path: The path to the private key.
+
+    Returns:
+        The path to the public key.
+    """
+    return key_path.with_name(f"{key_path.name}.pub")
+
+
+def _write_key_file(path: Path, content: bytes, mode: int) -> None:
+    """Atomically write a key file owned by the tmate-ssh-server user.
+
+    Args:
+        path: The path to the key file.
+        content: The key file content.
+        mode: The permission bits of the key file.
+    """
+    temporary_path = path.with_name(f".{path.name}.tmp")
+    temporary_path.unlink(missing_ok=True)
+    # The file is created with its final mode so the private key is never readable by others.
+    file_descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+    with os.fdopen(file_descriptor, "wb") as key_file:
+        key_file.write(content)
+    shutil.chown(temporary_path, USER, GROUP)
+    temporary_path.replace(path)
+
+
+def _new_private_key(algorithm: str, rsa_key_size: int) -> PrivateKey:
+    """Generate a private key with the defaults of ssh-keygen.
+
+    Args:
+        algorithm: The host key algorithm.
+        rsa_key_size: The size of an RSA key in bits.
+
+    Returns:
+        The generated private key.
+    """
+    if algorithm == "rsa":
+        return rsa.generate_private_key(public_exponent=65537, key_size=rsa_key_size)
+    return ed25519.Ed25519PrivateKey.generate()
+
+
+def _load_private_key(
+    key: str,
+) -> PrivateKey:
+    """Load an OpenSSH private host key.
+
+    Args:
+        key: The OpenSSH private key.
+
+    Raises:
+        ValueError: if the key is not a valid host key.
+
+    Returns:
+        The private key.
+    """
+    private_key = serialization.load_ssh_private_key(key.encode("utf-8"), password=None)
+    if not isinstance(private_key, (rsa.RSAPrivateKey, ed25519.Ed25519PrivateKey)):
+        raise ValueError(f"Unsupported host key type {type(private_key).__name__}")
+    return private_key
+
+
+def _is_key_pair(
+    key_path: Path,
+    private_key: PrivateKey,
+) -> bool:
+    """Check whether a host key pair exists for a private key.
+
+    Args:
+        key_path: The path to the private key.
+        private_key: The private key.
+
+    Returns:
+        Whether the host key pair is the key pair of the private key.
+    """
+    if not key_path.exists() or not _pub_key_path(key_path).exists():
+        return False
+    try:
+        public_key = serialization.load_ssh_public_key(_pub_key_path(key_path).read_bytes())
+    except (ValueError, UnsupportedAlgorithm):
+        return False
+    return public_key == private_key.public_key()
+
+
+def _current_private_key(
+    key_path: Path, algorithm: str, rsa_key_size: int
+) -> typing.Optional[PrivateKey]:
+    """Load an existing private host key if it is valid and matches the configured key size.
+
+    Args:
+        key_path: The path to the private key.
+        algorithm: The host key algorithm.
+        rsa_key_size: The configured size of an RSA key in bits.
+
+    Returns:
+        The private key to keep, None if a new private key is required.
+    """
+    if not key_path.exists():
+        return None
+    try:
+        private_key = _load_private_key(key_path.read_text(encoding="utf-8"))
+    except (ValueError, UnsupportedAlgorithm):
+        logger.warning("Invalid %s host key, generating a new one.", algorithm)
+        return None
+    if algorithm == "rsa" and (
+        not isinstance(private_key, rsa.RSAPrivateKey) or private_key.key_size != rsa_key_size
+    ):
+        return None
+    return private_key
+
+
+def _write_key_pair(
+    key_path: Path,
+    private_key: PrivateKey,
+) -> None:
+    """Write a private host key and its public key in OpenSSH format.
+
+    Args:
+        key_path: The path to the private key file.
+        private_key: The private key.
+    """
+    _write_key_file(
+        _pub_key_path(key_path),
+        private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.OpenSSH, format=serialization.PublicFormat.OpenSSH
+        )
+        + b"\n",
+        0o644,
+    )
+    # The private key is written last as it marks the key pair as complete.
+    _write_key_file(
+        key_path,
+        private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.OpenSSH,
+            encryption_algorithm=serialization.NoEncryption(),
+        ),
+        0o600,
+    )
+
+
+def install_keys(
+    keys_dir: typing.Optional[Path] = None,
+    host_key_config: typing.Optional[state.HostKeyConfig] = None,
+) -> Fingerprints:
+    """Generate the configured OpenSSH host keys unless valid keys are already present.
+
+    Existing valid host keys, e.g. on storage reattached from a replaced unit, are kept so that
+    their fingerprints stay the same. Host keys of algorithms that are no longer configured are
+    removed, so that tmate-ssh-server only offers the configured algorithms. Only the keys
+    directory and the key files are owned by the tmate-ssh-server user.
+
+    Args:
+        keys_dir: The directory to generate the keys in, KEYS_DIR by default.
+        host_key_config: The host key configuration, the default configuration if not given.
+
+    Raises:
+        KeyInstallError: if there was an error creating ssh keys.
+
+    Returns:
+        The public key fingerprints of the host keys.
+    """
+    keys_dir = keys_dir if keys_dir else KEYS_DIR
+    host_key_config = host_key_config if host_key_config else state.HostKeyConfig()
+    try:
+        keys_dir.mkdir(parents=True, exist_ok=True)
+        shutil.chown(keys_dir, USER, GROUP)
+        for algorithm in state.HOST_KEY_ALGORITHMS:
+            key_path = _key_path(keys_dir, algorithm)
+            if algorithm not in host_key_config.algorithms:
+                key_path.unlink(missing_ok=True)
+                _pub_key_path(key_path).unlink(missing_ok=True)
+                continue
+            private_key = _current_private_key(key_path, algorithm, host_key_config.rsa_key_size)
+            if not private_key:
+                _write_key_pair(
+                    key_path, _new_private_key(algorithm, host_key_config.rsa_key_size)
+                )
+            elif not _is_key_pair(key_path, private_key):
+                _write_key_pair(key_path, private_key)
+    except (OSError, LookupError, ValueError) as exc:
+        raise KeyInstallError(f"Failed to generate host keys, {exc}.") from exc
+    return get_fingerprints(keys_dir)
+
+
+def read_keys(keys_dir: typing.Optional[Path] = None) -> dict[str, str]:
+    """Read the private host keys, e.g. to share them with other units.
+
+    Args:
+        keys_dir: The directory of the keys, KEYS_DIR by default.
+
+    Raises:
+        KeyInstallError: if the keys could not be read.
+
+    Returns:
+        The OpenSSH private keys by host key algorithm.
+    """
+    keys_dir = keys_dir if keys_dir else KEYS_DIR
+    try:
+        return {
+            algorithm: key_path.read_text(encoding="utf-8")
+            for algorithm in state.HOST_KEY_ALGORITHMS
+            if (key_path := _key_path(keys_dir, algorithm)).exists()
+        }
+    except OSError as exc:
+        raise KeyInstallError(f"Failed to read host keys, {exc}.") from exc
+
+
+def write_keys(
+    keys: typing.Mapping[str, str], keys_dir: typing.Optional[Path] = None
+) -> Fingerprints:
+    """Replace the host keys with the given private keys, e.g. keys shared by another unit.
+
+    Key pairs of the given keys that are already installed are left untouched and host keys of
+    algorithms missing from the given keys are removed.
+
+    Args:
+        keys: The OpenSSH private keys by host key algorithm.
+        keys_dir: The directory to write the keys in, KEYS_DIR by default.
+
+    Raises:
+        KeyInstallError: if the keys are invalid or could not be written.
+
+    Returns:
+        The public key fingerprints of the host keys.
+    """
+    keys_dir = keys_dir if keys_dir else KEYS_DIR
+    if state.REQUIRED_HOST_KEY_ALGORITHM not in keys:
+        raise KeyInstallError(f"Missing {state.REQUIRED_HOST_KEY_ALGORITHM} host key.")
+    try:
+        keys_dir.mkdir(parents=True, exist_ok=True)
+        shutil.chown(keys_dir, USER, GROUP)
+        for algorithm in state.HOST_KEY_ALGORITHMS:
+            key_path = _key_path(keys_dir, algorithm)
+            if algorithm not in keys:
+                key_path.unlink(missing_ok=True)
+                _pub_key_path(key_path).unlink(missing_ok=True)
+                continue
+            private_key = _load_private_key(keys[algorithm])
+            if not _is_key_pair(key_path, private_key):
+                _write_key_pair(key_path, private_key)
+    except (OSError, LookupError, ValueError, UnsupportedAlgorithm) as exc:
+        raise KeyInstallError(f"Failed to write host keys, {exc}.") from exc
+    return get_fingerprints(keys_dir)
+
+
+def staged_fingerprints() -> typing.Optional[Fingerprints]:
+    """Get the fingerprints of the host keys staged by a key rotation.
+
+    Returns:
+        The staged public key fingerprints, None if no keys are staged.
+    """
+    try:
+        return get_fingerprints(STAGED_KEYS_DIR)
+    except IncompleteInitError:
+        return None
+
+
+def activate_staged_keys() -> None:
+    """Replace the host keys with the staged keys, if any.
+
+    Each key file is replaced atomically, public keys first, so an interrupted activation is
+    completed by calling this again. The keys are copied rather than renamed as the keys directory
+    may be on a separate storage filesystem.
+
+    Raises:
+        KeyInstallError: if the staged keys could not be moved.
+    """
+    if not STAGED_KEYS_DIR.exists():
+        return
+    try:
+        for staged_path in sorted(
+            STAGED_KEYS_DIR.iterdir(), key=lambda path: path.suffix != ".pub"
+        ):
+            _write_key_file(
+                KEYS_DIR / staged_path.name,
+                staged_path.read_bytes(),
+                staged_path.stat().st_mode & 0o777,
+            )
+            staged_path.unlink()
+        STAGED_KEYS_DIR.rmdir()
+    except (OSError, LookupError) as exc:
+        raise KeyInstallError(f"Failed to activate staged host keys, {exc}.") from exc
+
+
+def discard_staged_keys() -> None:
+    """Remove the staged keys, if any, e.g. once another unit completed the rotation.
+
+    Raises:
+        KeyInstallError: if the staged keys could not be removed.
+    """
+    if not STAGED_KEYS_DIR.exists():
+        return
+    try:
+        shutil.rmtree(STAGED_KEYS_DIR)
+    except OSError as exc:
+        raise KeyInstallError(f"Failed to discard staged host keys, {exc}.") from exc
+
+
+def _calculate_fingerprint(key: str) -> str:
+    """Calculate the SHA256 fingerprint of a key.
+
+    Args:
+        key: Base64 encoded key value.
+
+    Returns:
+        Fingerprint of a key.
+    """
+    decoded_bytes = base64.b64decode(key)
+    key_hash = hashlib.sha256(decoded_bytes).digest()
+    return base64.b64encode(key_hash).decode("utf-8").removesuffix("=")
+
+
+def key_files_id() -> str:
+    """Identify the current public key files by their inode, size and modification time.
+
+    Replacing, adding, removing or rewriting a key file changes the identity without reading it.
+
+    Raises:
+        IncompleteInitError: if the keys have not been generated.
+
+    Returns:
+        The identity of the public key files.
+    """
+    identities = []
+    for algorithm in state.HOST_KEY_ALGORITHMS:
+        try:
+            stat = _pub_key_path(_key_path(KEYS_DIR, algorithm)).stat()
+        except FileNotFoundError as exc:
+            if algorithm == state.REQUIRED_HOST_KEY_ALGORITHM:
+                raise IncompleteInitError("Missing keys path(s).") from exc
+            identities.append(f"{algorithm}:-")
+            continue
+        identities.append(f"{algorithm}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}")
+    return ",".join(identities)
+
+
+def _read_fingerprint(key_path: Path) -> typing.Optional[str]:
+    """Get the fingerprint of the public key of a host key.
+
+    Args:
+        key_path: The path to the private key.
+
+    Returns:
+        The SHA256 fingerprint of the public key, None if there is no public key.
+    """
+    pub_key_path = _pub_key_path(key_path)
+    if not pub_key_path.exists():
+        return None
+    # format of a public key is: ssh-rsa <b64-encoded-key> <user>
+    key_b64 = pub_key_path.read_text(encoding="utf-8").split()[1]
+    return f"SHA256:{_calculate_fingerprint(key_b64)}"
+
+
+def get_fingerprints(keys_dir: typing.Optional[Path] = None) -> Fingerprints:
+    """Get fingerprint from generated keys.
+
+    Args:
+        keys_dir: The directory of the keys, KEYS_DIR by default.
+
+    Raises:
+        IncompleteInitError: if the keys have not been generated.
+
+    Returns:
+        The generated public key fingerprints.
+    """
+    keys_dir = keys_dir if keys_dir else KEYS_DIR
+    if not keys_dir.exists():
+        raise IncompleteInitError("Missing keys path(s).")
+    fingerprints = {
+        algorithm: _read_fingerprint(_key_path(keys_dir, algorithm))
+        for algorithm in state.HOST_KEY_ALGORITHMS
+    }
+    ed25519_fingerprint = fingerprints.pop(state.REQUIRED_HOST_KEY_ALGORITHM)
+    if not ed25519_fingerprint:
+        raise IncompleteInitError("Missing keys path(s).")
+    return Fingerprints(ed25519=ed25519_fingerprint, **fingerprints)
@@ -0,0 +1,157 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Observer module for the host key rotation."""
+
+import dataclasses
+import logging
+import time
+import typing
+from datetime import datetime, timezone
+
+import ops
+
+import host_keys
+import server_config
+import shared_keys
+import ssh_debug
+from state import State
+
+logger = logging.getLogger(__name__)
+
+
+class Observer(ops.Object):
+    """The host key rotation observer.
+
+    New keys are staged next to the current ones and both fingerprint sets are published over the
+    debug-ssh integration for an overlap window, so clients learn the new keys before the daemon
+    switches to them on the first update-status hook after the window. The leader unit shares the
+    staged keys and the end of the window with the other units, which follow the same rotation.
+    """
+
+    _stored = ops.StoredState()
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        charm: ops.CharmBase,
+        state: State,
+        sshdebug: ssh_debug.Observer,
+        server_config_cache: server_config.Cache,
+        keys: shared_keys.SharedKeys,
+    ):
+        """Initialize the observer and register actions handlers.
+
+        Args:
+            charm: The parent charm to attach the observer to.
+            state: The charm state.
+            sshdebug: The ssh-debug integration observer publishing the fingerprints.
+            server_config_cache: The cached server connection details.
+            keys: The host keys shared with the other units.
+        """
+        super().__init__(charm, "key-rotation-observer")
+        self.charm = charm
+        self.state = state
+        self.sshdebug = sshdebug
+        self.server_config_cache = server_config_cache
+        self.shared_keys = keys
+        # The UNIX time to switch to the staged keys at, 0 if no rotation is in progress.
+        self._stored.set_default(switch_at=0.0)
+        # The switch time of the last rotation of the leader unit followed, so that a unit which
+        # switched before the leader does not stage the same keys again.
+        self._stored.set_default(followed_switch_at=0.0)
+
+        charm.framework.observe(charm.on.rotate_keys_action, self.on_rotate_keys)
+
+    @property
+    def switch_at(self) -> float:
+        """The UNIX time to switch to the staged keys at, 0 if no rotation is in progress."""
+        return self._stored.switch_at
+
+    def switch_due(self) -> bool:
+        """Check whether the overlap window of a key rotation has ended.
+
+        Returns:
+            Whether the daemon should switch to the staged keys.
+        """
+        return bool(self._stored.switch_at) and time.time() >= self._stored.switch_at
+
+    def complete(self) -> None:
+        """Mark the key rotation as completed."""
+        self._stored.switch_at = 0.0
+
+    def follow(self, rotation: typing.Optional[shared_keys.Rotation]) -> None:
+        """Follow the key rotation of the leader unit on the other units.
+
+        The keys staged by the leader are staged and their fingerprints published until the same
+        switch time. A rotation no longer shared has been completed by the leader, whose keys are
+        then installed as the current keys.
+
+        Args:
+            rotation: The rotation shared by the leader unit, None if no rotation is in progress.
+
+        Raises:
+            KeyInstallError: if the staged keys could not be written or discarded.
+        """
+        if self.charm.unit.is_leader():
+            return
+        if not rotation:
+            if self._stored.switch_at:
+                logger.info("Key rotation completed by the leader unit.")
+                host_keys.discard_staged_keys()
+                self.complete()
+            return
+        if rotation.switch_at == self._stored.followed_switch_at:
+            return
+        logger.info("Staging the host keys rotated by the leader unit.")
+        next_fingerprints = host_keys.write_keys(rotation.keys, host_keys.STAGED_KEYS_DIR)
+        self._stored.switch_at = rotation.switch_at
+        self._stored.followed_switch_at = rotation.switch_at
+        self.sshdebug.update_relation_data(
+            host=str(self.state.ip_addr),
+            fingerprints=self.server_config_cache.fingerprints(),
+            next_fingerprints=next_fingerprints,
+        )
+
+    def on_rotate_keys(self, event: ops.ActionEvent) -> None:
+        """Stage new host keys and publish their fingerprints next to the current ones.
+
+        Args:
+            event: The rotate-keys action event.
+        """
+        if not self.state.ip_addr:
+            event.fail("Host address not ready yet.")
+            return
+        if not self.charm.unit.is_leader():
+            event.fail("The host keys are shared by the leader unit, run the action on it.")
+            return
+        try:
+            fingerprints = self.server_config_cache.fingerprints()
+        except host_keys.IncompleteInitError:
+            event.fail("Host keys not installed yet.")
+            return
+        try:
+            next_fingerprints = host_keys.install_keys(
+                host_keys.STAGED_KEYS_DIR, host_key_config=self.state.host_key_config
+            )
+            switch_at = time.time() + int(event.params["overlap"])
+            self.shared_keys.publish(switch_at)
+        except host_keys.KeyInstallError as exc:
+            logger.error("Failed to stage host keys, %s.", exc)
+            event.fail("Failed to stage host keys. See juju debug-log output.")
+            return
+
+        self._stored.switch_at = switch_at
+        self.sshdebug.update_relation_data(
+            host=str(self.state.ip_addr),
+            fingerprints=fingerprints,
+            next_fingerprints=next_fingerprints,
+        )
+        results = {
+            f"next-{algorithm}-fingerprint": fingerprint
+            for algorithm, fingerprint in dataclasses.asdict(next_fingerprints).items()
+            if fingerprint
+        }
+        results["switch-at"] = datetime.fromtimestamp(
+            self._stored.switch_at, tz=timezone.utc
+        ).isoformat()
+        event.set_results(results)
@@ -0,0 +1,172 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Run a dependency graph of stages concurrently."""
+
+import dataclasses
+import hashlib
+import json
+import logging
+import typing
+from concurrent import futures
+
+import timing
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineError(Exception):
+    """Represents an invalid pipeline definition."""
+
+
+@dataclasses.dataclass(frozen=True)
+class Stage:
+    """A unit of work in a pipeline.
+
+    Attributes:
+        name: The unique name of the stage.
+        func: The callable performing the work of the stage.
+        requires: The names of the stages that must complete before this stage starts.
+        fingerprint: The fingerprint of the inputs of the stage. A stage without a fingerprint is
+            never checkpointed.
+        satisfied: Whether the work of the stage is already done, in which case it is skipped.
+    """
+
+    name: str
+    func: typing.Callable[[], typing.Any]
+    requires: tuple[str, ...] = ()
+    fingerprint: str = ""
+    satisfied: bool = False
+
+
+def fingerprint(*inputs: typing.Any) -> str:
+    """Compute the fingerprint of the inputs of a stage.
+
+    Args:
+        inputs: The JSON serializable inputs of the stage. Other values are converted to strings.
+
+    Returns:
+        The SHA256 hex digest of the inputs.
+    """
+    serialized = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def _validate(stages: typing.Sequence[Stage]) -> None:
+    """Validate the stage names and requirements.
+
+    Args:
+        stages: The stages of the pipeline.
+
+    Raises:
+        PipelineError: if a stage name is duplicated or a requirement is unknown.
+    """
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise PipelineError(f"Duplicate stage names in {names}.")
+    for stage in stages:
+        if unknown := set(stage.requires) - set(names):
+            raise PipelineError(f"Stage {stage.name} requires unknown stages {unknown}.")
+
+
+def _timed(stage: Stage, timeline: timing.Timeline) -> typing.Any:
+    """Run a stage within a timeline.
+
+    Args:
+        stage: The stage to run.
+        timeline: The timeline to record the stage timing in.
+
+    Returns:
+        The return value of the stage.
+    """
+    with timeline.stage(stage.name):
+        return stage.func()
+
+
+def _is_checkpointed(
+    stage: Stage, checkpoints: typing.Mapping[str, str], ran: typing.AbstractSet[str]
+) -> bool:
+    """Check whether a stage completed with the same inputs and can be skipped.
+
+    Args:
+        stage: The stage to check.
+        checkpoints: The input fingerprints of the completed stages by stage name.
+        ran: The names of the stages that ran in this pipeline.
+
+    Returns:
+        Whether the stage can be skipped.
+    """
+    return (
+        bool(stage.fingerprint)
+        and checkpoints.get(stage.name) == stage.fingerprint
+        and not ran & set(stage.requires)
+    )
+
+
+def run(
+    stages: typing.Sequence[Stage],
+    timeline: typing.Optional[timing.Timeline] = None,
+    checkpoints: typing.Optional[typing.MutableMapping[str, str]] = None,
+    on_checkpoint: typing.Optional[typing.Callable[[], None]] = None,
+) -> dict[str, typing.Any]:
+    """Run the stages, starting each one as soon as all the stages it requires have completed.
+
+    Independent stages run concurrently on a thread pool, so the pipeline takes as long as its
+    critical path. Once a stage fails, no further stages are started and the exception of the
+    failed stage is re-raised after the running stages have finished.
+
+    A stage is skipped if it is already satisfied, or if it was checkpointed with the same input
+    fingerprint and none of the stages it requires ran again, so a retried pipeline resumes at
+    the first incomplete or changed stage.
+
+    Args:
+        stages: The stages of the pipeline.
+        timeline: The timeline to record the stage timings in.
+        checkpoints: The input fingerprints of the completed stages by stage name, updated as
+            stages start and complete.
+        on_checkpoint: Called from the calling thread whenever the checkpoints are updated, e.g.
+            to persist them.
+
+    Returns:
+        The return values of the stages that ran, by stage name.
+
+    Raises:
+        PipelineError: if the stages do not form a valid dependency graph.
+    """
+    _validate(stages)
+    timeline = timeline if timeline else timing.Timeline(name="pipeline")
+    checkpoints = checkpoints if checkpoints is not None else {}
+    on_checkpoint = on_checkpoint if on_checkpoint else lambda: None
+    pending = {stage.name: stage for stage in stages}
+    completed: set[str] = set()
+    ran: set[str] = set()
+    results: dict[str, typing.Any] = {}
+    with futures.ThreadPoolExecutor(max_workers=max(len(stages), 1)) as executor:
+        running: dict[futures.Future, Stage] = {}
+        while pending or running:
+            ready = [stage for stage in pending.values() if set(stage.requires) <= completed]
+            for stage in ready:
+                del pending[stage.name]
+                if stage.satisfied or _is_checkpointed(stage, checkpoints, ran):
+                    logger.info("Skipping stage %s, already completed.", stage.name)
+                    completed.add(stage.name)
+                    continue
+                logger.debug("Starting stage %s.", stage.name)
+                if checkpoints.pop(stage.name, None) is not None:
+                    on_checkpoint()
+                ran.add(stage.name)
+                running[executor.submit(_timed, stage, timeline)] = stage
+            if not running:
+                if not ready:
+                    raise PipelineError(f"Stages {list(pending)} have circular requirements.")
+                continue
+            done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                results[stage.name] = future.result()
+                completed.add(stage.name)
+                logger.debug("Completed stage %s.", stage.name)
+                if stage.fingerprint:
+                    checkpoints[stage.name] = stage.fingerprint
+                    on_checkpoint()
+    return results
@@ -0,0 +1,387 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Install the prerequisites of tmate-ssh-server, its apt dependencies and its docker image."""
+
+import dataclasses
+import grp
+import hashlib
+import logging
+import os
+
+# subprocess module is required to install the dependencies and prepare the docker image, the
+# security implications have been considered.
+import subprocess  # nosec
+import tarfile
+import typing
+from pathlib import Path
+
+import jinja2
+from charms.operator_libs_linux.v0 import apt, passwd
+
+import state
+
+APT_DEPENDENCIES = ["openssh-client"]
+DOCKER_PACKAGE = "docker.io"
+DOCKER_GROUP = "docker"
+# Package lists refreshed within this many seconds are not refreshed again on install.
+APT_CACHE_MAX_AGE = 60 * 60
+
+DOCKER_DAEMON_CONFIG_PATH = Path("/etc/docker/daemon.json")
+DEPENDENCY_BUNDLE_DIR = Path("/var/cache/tmate-ssh-server/dependency-bundle")
+DEPENDENCY_BUNDLE_INDEX = "Packages"
+# The size in bytes of the chunks the bundled packages are read in to verify their checksum.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+IMAGE = "ghcr.io/canonical/tmate-ssh-server:0.1.1"
+
+USER = "ubuntu"
+
+logger = logging.getLogger(__name__)
+
+
+class DependencySetupError(Exception):
+    """Represents an error while installing and setting up dependencies."""
+
+
+class DockerError(Exception):
+    """Represents an error using a docker command."""
+
+
+def _render_docker_daemon_config(proxy_config: state.ProxyConfig) -> str:
+    """Render the dockerd proxy settings.
+
+    Args:
+        proxy_config: The proxy configuration to enable for dockerd.
+
+    Returns:
+        The dockerd daemon.json configuration.
+    """
+    environment = jinja2.Environment(loader=jinja2.FileSystemLoader("templates"), autoescape=True)
+    docker_template = environment.get_template("docker_daemon.json.j2")
+    return docker_template.render(
+        HTTP_PROXY=proxy_config.http_proxy,
+        HTTPS_PROXY=proxy_config.https_proxy,
+        NO_PROXY=proxy_config.no_proxy,
+    )
+
+
+def _configure_docker_proxy(proxy_config: typing.Optional[state.ProxyConfig] = None) -> None:
+    """Write the dockerd proxy settings so they are in place before docker is first started.
+
+    Args:
+        proxy_config: The proxy configuration to enable for dockerd.
+    """
+    if not proxy_config:
+        return
+    daemon_config = _render_docker_daemon_config(proxy_config)
+    DOCKER_DAEMON_CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    DOCKER_DAEMON_CONFIG_PATH.touch(exist_ok=True)
+    DOCKER_DAEMON_CONFIG_PATH.write_text(daemon_config, encoding="utf-8")
+
+
+@dataclasses.dataclass(frozen=True)
+class BundledPackage:
+    """A package listed in the index of an offline dependency bundle.
+
+    Attributes:
+        name: The package name.
+        version: The package version.
+        path: The path to the extracted .deb file.
+        sha256: The expected SHA256 checksum of the .deb file.
+    """
+
+    name: str
+    version: str
+    path: Path
+    sha256: str
+
+
+def _parse_bundle_index(bundle_dir: Path) -> list[BundledPackage]:
+    """Parse the Packages index of an extracted dependency bundle.
+
+    The index is the output of dpkg-scanpackages, one stanza per .deb file.
+
+    Args:
+        bundle_dir: The directory the bundle was extracted to.
+
+    Returns:
+        The packages listed in the index.
+
+    Raises:
+        DependencySetupError: if the index is missing or a stanza lacks a required field.
+    """
+    index_path = bundle_dir / DEPENDENCY_BUNDLE_INDEX
+    if not index_path.is_file():
+        raise DependencySetupError(f"Dependency bundle has no {DEPENDENCY_BUNDLE_INDEX} index.")
+    packages = []
+    for stanza in index_path.read_text(encoding="utf-8").strip().split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in stanza.splitlines() if not line.startswith(" ")
+        )
+        try:
+            packages.append(
+                BundledPackage(
+                    name=fields["Package"],
+                    version=fields["Version"],
+                    path=bundle_dir / fields["Filename"],
+                    sha256=fields["SHA256"],
+                )
+            )
+        except KeyError as exc:
+            raise DependencySetupError(f"Dependency bundle index is missing {exc}.") from exc
+    return packages
+
+
+def _file_sha256(path: Path) -> str:
+    """Get the SHA256 checksum of a file, reading it in chunks to bound the memory used.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        The SHA256 hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        # hashlib.file_digest is not available on the Python 3.10 of Ubuntu 22.04.
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _install_dependency_bundle(bundle_path: Path) -> None:
+    """Install the apt dependencies from an offline bundle, without any network access.
+
+    Args:
+        bundle_path: The path to the dependency bundle tarball.
+
+    Raises:
+        DependencySetupError: if the bundle is invalid, incomplete or failed to install.
+    """
+    DEPENDENCY_BUNDLE_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        with tarfile.open(bundle_path) as bundle:
+            # The data filter rejects absolute paths, links and members outside the target.
+            bundle.extractall(DEPENDENCY_BUNDLE_DIR, filter="data")  # nosec B202
+    except (tarfile.TarError, OSError) as exc:
+        raise DependencySetupError("Failed to extract dependency bundle.") from exc
+
+    packages = _parse_bundle_index(DEPENDENCY_BUNDLE_DIR)
+    for package in packages:
+        if not package.path.is_file() or _file_sha256(package.path) != package.sha256:
+            raise DependencySetupError(f"Bundled package {package.name} failed verification.")
+    if missing := {*APT_DEPENDENCIES, DOCKER_PACKAGE} - {package.name for package in packages}:
+        raise DependencySetupError(f"Dependency bundle is missing {', '.join(sorted(missing))}.")
+
+    env = {**os.environ, "DEBIAN_FRONTEND": "noninteractive"}
+    cmd = [
+        "apt-get",
+        "-y",
+        "--no-download",
+        "--option=Dpkg::Options::=--force-confold",
+        "install",
+        *(str(package.path) for package in packages),
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, check=True, text=True, env=env)  # nosec B603
+    except subprocess.CalledProcessError as exc:
+        logger.error("Failed to install dependency bundle, %s.", exc.stderr)
+        raise DependencySetupError("Failed to install dependency bundle.") from exc
+
+
+def _install_apt_dependencies() -> None:
+    """Install the dependencies from the apt mirrors.
+
+    Raises:
+        DependencySetupError: if there was something wrong installing the apt packages.
+    """
+    try:
+        apt.add_package(
+            [*APT_DEPENDENCIES, DOCKER_PACKAGE],
+            update_cache=True,
+            cache_max_age=APT_CACHE_MAX_AGE,
+        )
+    except (apt.PackageNotFoundError, apt.PackageError) as exc:
+        logger.error("Failed to add apt packages, %s.", exc)
+        raise DependencySetupError("Failed to install apt packages.") from exc
+
+
+def install_dependencies(
+    proxy_config: typing.Optional[state.ProxyConfig] = None,
+    bundle_path: typing.Optional[Path] = None,
+) -> None:
+    """Install dependenciese required to start tmate-ssh-server container.
+
+    All packages are resolved against a single apt cache refresh and installed in one apt
+    transaction. The refresh is skipped if the package lists are younger than APT_CACHE_MAX_AGE.
+    If an offline dependency bundle is given, the packages are installed from it instead.
+
+    Args:
+        proxy_config: The proxy configuration to enable for dockerd.
+        bundle_path: The path to an offline dependency bundle tarball, if attached.
+
+    Raises:
+        DependencySetupError: if there was something wrong installing the apt package
+            dependencies.
+    """
+    _configure_docker_proxy(proxy_config=proxy_config)
+    if bundle_path:
+        _install_dependency_bundle(bundle_path)
+    else:
+        _install_apt_dependencies()
+    passwd.add_group(DOCKER_GROUP)
+    passwd.add_user_to_group(USER, DOCKER_GROUP)
+
+
+@dataclasses.dataclass(frozen=True)
+class Preflight:
+    """The install prerequisites already satisfied on the machine, e.g. on a pre-built image.
+
+    Attributes:
+        dependencies: Whether the apt dependencies are installed, the user is in the docker group
+            and the dockerd proxy settings are up to date.
+        image: The ID of the tmate-ssh-server image if already present, None otherwise.
+    """
+
+    dependencies: bool
+    image: typing.Optional[str]
+
+
+def _dependencies_satisfied(proxy_config: typing.Optional[state.ProxyConfig]) -> bool:
+    """Check whether the dependencies installed by install_dependencies are in place.
+
+    Args:
+        proxy_config: The proxy configuration to enable for dockerd.
+
+    Returns:
+        Whether the dependencies are satisfied.
+    """
+    packages = [*APT_DEPENDENCIES, DOCKER_PACKAGE]
+    try:
+        installed = apt.DebianPackage.from_installed_packages(packages)
+    except (apt.PackageError, subprocess.CalledProcessError) as exc:
+        logger.debug("Failed to query installed packages, %s.", exc)
+        return False
+    if missing := set(packages) - set(installed):
+        logger.debug("Packages %s not installed.", missing)
+        return False
+    try:
+        if USER not in grp.getgrnam(DOCKER_GROUP).gr_mem:
+            logger.debug("User %s not in group %s.", USER, DOCKER_GROUP)
+            return False
+    except KeyError:
+        logger.debug("Group %s does not exist.", DOCKER_GROUP)
+        return False
+    if proxy_config and (
+        not DOCKER_DAEMON_CONFIG_PATH.exists()
+        or DOCKER_DAEMON_CONFIG_PATH.read_text(encoding="utf-8")
+        != _render_docker_daemon_config(proxy_config)
+    ):
+        logger.debug("Docker proxy configuration outdated.")
+        return False
+    return True
+
+
+def _find_image(image: str) -> typing.Optional[str]:
+    """Find an image in the local docker image store.
+
+    Args:
+        image: The image reference.
+
+    Returns:
+        The ID of the image if present, None otherwise.
+    """
+    try:
+        inspect = subprocess.run(  # nosec B603
+            ["docker", "image", "inspect", "--format", "{{.Id}}", image],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        logger.debug("Image %s not present.", image)
+        return None
+    return inspect.stdout.strip()
+
+
+def preflight(
+    proxy_config: typing.Optional[state.ProxyConfig] = None, image: str = IMAGE
+) -> Preflight:
+    """Probe which install prerequisites are already satisfied.
+
+    The probe only reads the machine state: a single dpkg-query for all packages, the group
+    database and a docker image inspect.
+
+    Args:
+        proxy_config: The proxy configuration to enable for dockerd.
+        image: The tmate-ssh-server image reference to look for.
+
+    Returns:
+        The satisfied prerequisites.
+    """
+    dependencies = _dependencies_satisfied(proxy_config)
+    return Preflight(dependencies=dependencies, image=_find_image(image) if dependencies else None)
+
+
+def load_image(image_path: Path) -> str:
+    """Load the tmate-ssh-server image from an OCI or docker archive.
+
+    Args:
+        image_path: The path to the image archive.
+
+    Returns:
+        The ID of the loaded image, which is the digest of its configuration.
+
+    Raises:
+        DockerError: if the image could not be loaded.
+    """
+    try:
+        result = subprocess.run(  # nosec B603
+            ["docker", "load", "--input", str(image_path)],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except subprocess.CalledProcessError as exc:
+        raise DockerError(f"Failed to load image, {exc.stderr}.") from exc
+
+    # The output is either "Loaded image: <repository:tag>" or "Loaded image ID: <id>".
+    loaded = [
+        line.split(":", 1)[1].strip()
+        for line in result.stdout.splitlines()
+        if line.startswith("Loaded image")
+    ]
+    if not loaded:
+        raise DockerError(f"No image found in archive {image_path}.")
+    try:
+        inspect = subprocess.run(  # nosec B603
+            ["docker", "image", "inspect", "--format", "{{.Id}}", loaded[-1]],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except subprocess.CalledProcessError as exc:
+        raise DockerError(f"Failed to inspect loaded image {loaded[-1]}.") from exc
+    return inspect.stdout.strip()
+
+
+def pull_image(image: str = IMAGE) -> str:
+    """Pull the tmate-ssh-server image from the registry.
+
+    Args:
+        image: The tmate-ssh-server image reference to pull.
+
+    Returns:
+        The pulled image reference.
+
+    Raises:
+        DockerError: if the image could not be pulled.
+    """
+    try:
+        subprocess.run(  # nosec B603
+            ["docker", "pull", "--quiet", image], capture_output=True, check=True, text=True
+        )
+    except subprocess.CalledProcessError as exc:
+        raise DockerError(f"Failed to pull image {image}, {exc.stderr}.") from exc
+    return image
@@ -0,0 +1,76 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Cache of the server connection details derived from the host keys."""
+
+import dataclasses
+import json
+import logging
+
+import ops
+
+import host_keys
+import tmate
+
+logger = logging.getLogger(__name__)
+
+
+class Cache(ops.Object):
+    """The public key fingerprints and tmate.conf, persisted in charm state until the keys change.
+
+    The cache is keyed by the inode, size and modification time of the public key files, so a
+    cache hit costs one stat call per host key algorithm instead of reading and hashing the keys.
+    """
+
+    _stored = ops.StoredState()
+
+    def __init__(self, charm: ops.CharmBase):
+        """Initialize the cache.
+
+        Args:
+            charm: The parent charm to attach the cache to.
+        """
+        super().__init__(charm, "server-config-cache")
+        self._stored.set_default(key_files="", fingerprints="", host="", conf="")
+
+    def fingerprints(self) -> host_keys.Fingerprints:
+        """Get the public key fingerprints, recomputed only if the keys changed.
+
+        Raises:
+            IncompleteInitError: if the keys have not been generated.
+
+        Returns:
+            The public key fingerprints.
+        """
+        key_files = host_keys.key_files_id()
+        if key_files == self._stored.key_files:
+            return host_keys.Fingerprints(**json.loads(self._stored.fingerprints))
+
+        logger.info("Host keys changed, computing fingerprints.")
+        fingerprints = host_keys.get_fingerprints()
+        self._stored.key_files = key_files
+        self._stored.fingerprints = json.dumps(dataclasses.asdict(fingerprints))
+        self._stored.conf = ""
+        return fingerprints
+
+    def tmate_conf(self, host: str) -> str:
+        """Get the .tmate.conf values, regenerated only if the host or the keys changed.
+
+        Args:
+            host: The host IP address.
+
+        Raises:
+            FingerprintError: if there was an error generating fingerprints from public keys.
+
+        Returns:
+            The tmate config file contents.
+        """
+        try:
+            fingerprints = self.fingerprints()
+        except (host_keys.IncompleteInitError, host_keys.KeyInstallError) as exc:
+            raise tmate.FingerprintError("Error generating fingerprints.") from exc
+
+        if not self._stored.conf or self._stored.host != host:
+            self._stored.conf = tmate.generate_tmate_conf(host, fingerprints=fingerprints)
+            self._stored.host = host
+        return self._stored.conf
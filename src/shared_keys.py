@@ -0,0 +1,175 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Host keys shared between the units through a Juju secret."""
+
+import dataclasses
+import hashlib
+import json
+import logging
+import typing
+
+import ops
+
+import host_keys
+from state import HOST_KEY_ALGORITHMS, PEER_INTEGRATION_NAME
+
+logger = logging.getLogger(__name__)
+
+SECRET_LABEL = "host-keys"
+# The peer application data key of the ID of the host keys secret.
+SECRET_ID_KEY = "host-keys-secret-id"
+# The peer application data key of the digest of the host keys secret content.
+REVISION_KEY = "host-keys-revision"
+# The secret content key of the UNIX time the units switch to the keys staged by a rotation.
+SWITCH_AT_KEY = "switch-at"
+# The prefix of the secret content keys of the host keys staged by a rotation.
+NEXT_KEY_PREFIX = "next-"
+
+
+@dataclasses.dataclass(frozen=True)
+class Rotation:
+    """A host key rotation started by the leader unit.
+
+    Attributes:
+        keys: The OpenSSH private keys staged by the rotation, by host key algorithm.
+        switch_at: The UNIX time to switch to the staged keys at.
+    """
+
+    keys: dict[str, str]
+    switch_at: float
+
+
+def _keys(content: typing.Mapping[str, str], prefix: str = "") -> dict[str, str]:
+    """Get the host keys from the secret content.
+
+    Args:
+        content: The content of the host keys secret.
+        prefix: The prefix of the content keys of the host keys.
+
+    Returns:
+        The OpenSSH private keys by host key algorithm.
+    """
+    return {
+        algorithm: content[f"{prefix}{algorithm}-key"]
+        for algorithm in HOST_KEY_ALGORITHMS
+        if f"{prefix}{algorithm}-key" in content
+    }
+
+
+def _revision(content: typing.Mapping[str, str]) -> str:
+    """Get the revision marker of the secret content.
+
+    Args:
+        content: The content of the host keys secret.
+
+    Returns:
+        The SHA256 hex digest of the content.
+    """
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SharedKeys(ops.Object):
+    """The host keys generated by the leader unit and shared with the other units.
+
+    The leader stores the private host keys in an application owned secret and publishes the ID
+    of the secret in the peer integration, so that all units serve the same fingerprints. The
+    keys staged by a rotation are shared in the same secret until the leader switches to them.
+    The secret ID does not change with its content and the units of the application owning the
+    secret are not reliably notified of its changes, so the leader also publishes a revision
+    marker of the content for the other units to get a peer relation-changed event.
+    """
+
+    def __init__(self, charm: ops.CharmBase):
+        """Initialize the shared keys.
+
+        Args:
+            charm: The parent charm to attach the shared keys to.
+        """
+        super().__init__(charm, "shared-keys")
+        self.charm = charm
+
+    def _secret_id(self) -> typing.Optional[str]:
+        """Get the ID of the host keys secret.
+
+        Returns:
+            The secret ID, None if the leader has not shared the host keys yet.
+        """
+        relation = self.model.get_relation(PEER_INTEGRATION_NAME)
+        if not relation:
+            return None
+        return relation.data[self.model.app].get(SECRET_ID_KEY)
+
+    def _content(self) -> typing.Optional[dict[str, str]]:
+        """Get the content of the host keys secret shared by the leader unit.
+
+        Returns:
+            The secret content, None if this unit is the leader or the host keys are not shared
+            yet.
+        """
+        if self.charm.unit.is_leader() or not (secret_id := self._secret_id()):
+            return None
+        try:
+            return self.model.get_secret(id=secret_id).get_content(refresh=True)
+        except (ops.SecretNotFoundError, ops.ModelError) as exc:
+            logger.warning("Failed to get the shared host keys, %s.", exc)
+            return None
+
+    def get(self) -> typing.Optional[dict[str, str]]:
+        """Get the host keys shared by the leader unit.
+
+        Returns:
+            The OpenSSH private keys by host key algorithm, None if this unit is the leader or the
+            host keys are not shared yet.
+        """
+        content = self._content()
+        return _keys(content) if content is not None else None
+
+    def rotation(self) -> typing.Optional[Rotation]:
+        """Get the host key rotation in progress shared by the leader unit.
+
+        Returns:
+            The rotation, None if this unit is the leader, the host keys are not shared yet or no
+            rotation is in progress.
+        """
+        content = self._content()
+        if not content or SWITCH_AT_KEY not in content:
+            return None
+        return Rotation(
+            keys=_keys(content, prefix=NEXT_KEY_PREFIX), switch_at=float(content[SWITCH_AT_KEY])
+        )
+
+    def publish(self, switch_at: float = 0.0) -> None:
+        """Share the installed host keys with the other units, if this unit is the leader.
+
+        The keys staged by a rotation in progress are shared with the time to switch to them, so
+        that the other units publish their fingerprints and switch at the same time.
+
+        Args:
+            switch_at: The UNIX time to switch to the staged keys at, 0 if no rotation is in
+                progress.
+
+        Raises:
+            KeyInstallError: if the host keys could not be read.
+        """
+        relation = self.model.get_relation(PEER_INTEGRATION_NAME)
+        if not self.charm.unit.is_leader() or not relation:
+            return
+        content = {f"{algorithm}-key": key for algorithm, key in host_keys.read_keys().items()}
+        if switch_at and (next_keys := host_keys.read_keys(host_keys.STAGED_KEYS_DIR)):
+            content.update(
+                {f"{NEXT_KEY_PREFIX}{algorithm}-key": key for algorithm, key in next_keys.items()}
+            )
+            content[SWITCH_AT_KEY] = str(switch_at)
+        data = relation.data[self.model.app]
+        if secret_id := data.get(SECRET_ID_KEY):
+            secret = self.model.get_secret(id=secret_id)
+            if secret.get_content(refresh=True) != content:
+                logger.info("Sharing the changed host keys.")
+                secret.set_content(content)
+        else:
+            logger.info("Sharing the host keys.")
+            secret = self.model.app.add_secret(content, label=SECRET_LABEL)
+            data[SECRET_ID_KEY] = typing.cast(str, secret.id)
+        if data.get(REVISION_KEY) != (revision := _revision(content)):
+            data[REVISION_KEY] = revision
@@ -8,37 +8,70 @@ import typing
 
 import ops
 
+import host_keys
+import server_config
 import tmate
-from state import DEBUG_SSH_INTEGRATION_NAME, State
+from state import DEBUG_SSH_INTEGRATION_NAME, HOST_KEY_ALGORITHMS, State
 
 logger = logging.getLogger(__name__)
 
 
+def _update_fingerprints(
+    relation_data: ops.RelationDataContent,
+    prefix: str,
+    fingerprints: typing.Optional[host_keys.Fingerprints],
+) -> None:
+    """Set the fingerprints of the configured host keys and remove the others.
+
+    Args:
+        relation_data: The unit relation data to update.
+        prefix: The prefix of the fingerprint keys.
+        fingerprints: The fingerprints to publish, None to remove all of them.
+    """
+    for algorithm in HOST_KEY_ALGORITHMS:
+        key = f"{prefix}{algorithm}_fingerprint"
+        if fingerprint := getattr(fingerprints, algorithm, None):
+            relation_data[key] = fingerprint
+        else:
+            relation_data.pop(key, None)
+
+
 class Observer(ops.Object):
     """The ssh-debug integration observer."""
 
-    def __init__(self, charm: ops.CharmBase, state: State):
+    def __init__(
+        self, charm: ops.CharmBase, state: State, server_config_cache: server_config.Cache
+    ):
         """Initialize the observer and register event handlers.
 
         Args:
             charm: The parent charm to attach the observer to.
             state: The charm state.
+            server_config_cache: The cached server connection details.
         """
         super().__init__(charm, "ssh-debug-observer")
         self.charm = charm
         self.state = state
+        self.server_config_cache = server_config_cache
 
         charm.framework.observe(
             charm.on[DEBUG_SSH_INTEGRATION_NAME].relation_joined,
             self._on_ssh_debug_relation_joined,
         )
 
-    def update_relation_data(self, host: str, fingerprints: tmate.Fingerprints) -> None:
+    def update_relation_data(
+        self,
+        host: str,
+        fingerprints: host_keys.Fingerprints,
+        next_fingerprints: typing.Optional[host_keys.Fingerprints] = None,
+    ) -> None:
         """Update ssh_debug relation data if relation is available.
 
         Args:
             host: The unit's bound IP address.
-            fingerprints: The tmate-ssh-server generated fingerprint for RSA and ED25519 keys.
+            fingerprints: The tmate-ssh-server generated fingerprints of the host keys.
+            next_fingerprints: The fingerprints of the keys staged by a key rotation, published
+                next to the current fingerprints until the keys are switched.
         """
         relations: typing.List[ops.Relation] | None = self.charm.model.relations.get(
             DEBUG_SSH_INTEGRATION_NAME
@@ -49,16 +82,14 @@ class Observer(ops.Object):
                 DEBUG_SSH_INTEGRATION_NAME,
             )
             return
+        ports = ",".join(str(port) for port in tmate.worker_ports(self.state.workers))
         for relation in relations:
             relation_data: ops.RelationDataContent = relation.data[self.charm.unit]
-            relation_data.update(
-                {
-                    "host": host,
-                    "port": str(tmate.PORT),
-                    "rsa_fingerprint": fingerprints.rsa,
-                    "ed25519_fingerprint": fingerprints.ed25519,
-                }
-            )
+            # ports is the source of truth, port is the first worker port for the clients not
+            # spreading across the workers.
+            relation_data.update({"host": host, "port": str(tmate.PORT), "ports": ports})
+            _update_fingerprints(relation_data, prefix="", fingerprints=fingerprints)
+            _update_fingerprints(relation_data, prefix="next_", fingerprints=next_fingerprints)
 
     def _on_ssh_debug_relation_joined(self, _: ops.RelationJoinedEvent) -> None:
         """Handle ssh-debug relation joined event.
@@ -67,9 +98,13 @@ class Observer(ops.Object):
             KeyInstallError: if there was an error getting keys fingerprints.
         """
         try:
-            fingerprints = tmate.get_fingerprints()
-        except tmate.IncompleteInitError as exc:
+            fingerprints = self.server_config_cache.fingerprints()
+        except host_keys.IncompleteInitError as exc:
             logger.error("Error getting fingerprint data, %s.", exc)
             raise
 
-        self.update_relation_data(host=str(self.state.ip_addr), fingerprints=fingerprints)
+        self.update_relation_data(
+            host=str(self.state.ip_addr),
+            fingerprints=fingerprints,
+            next_fingerprints=host_keys.staged_fingerprints(),
+        )
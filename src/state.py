@@ -15,6 +15,22 @@ from pydantic import BaseModel, HttpUrl, ValidationError
 logger = logging.getLogger(__name__)
 
 DEBUG_SSH_INTEGRATION_NAME = "debug-ssh"
+PEER_INTEGRATION_NAME = "tmate-peers"
+DEPENDENCY_BUNDLE_RESOURCE_NAME = "dependency-bundle"
+IMAGE_RESOURCE_NAME = "tmate-ssh-server-image"
+HOST_KEY_ALGORITHMS_CONFIG_NAME = "host-key-algorithms"
+RSA_KEY_SIZE_CONFIG_NAME = "rsa-key-size"
+RESTART_DELAY_CONFIG_NAME = "restart-delay"
+START_LIMIT_BURST_CONFIG_NAME = "start-limit-burst"
+START_LIMIT_INTERVAL_CONFIG_NAME = "start-limit-interval"
+WORKERS_CONFIG_NAME = "workers"
+
+# The host key algorithms loaded by tmate-ssh-server, ed25519 is supported by all clients.
+HOST_KEY_ALGORITHMS = ("rsa", "ed25519")
+REQUIRED_HOST_KEY_ALGORITHM = "ed25519"
+# The default RSA key size of ssh-keygen.
+DEFAULT_RSA_KEY_SIZE = 3072
+RSA_KEY_SIZES = (2048, 3072, 4096)
 
 
 class CharmStateBaseError(Exception):
@@ -80,6 +96,122 @@ class ProxyConfig(BaseModel):
         )
 
 
+@dataclasses.dataclass(frozen=True)
+class HostKeyConfig:
+    """The host key configuration.
+
+    Attributes:
+        algorithms: The algorithms to generate host keys for.
+        rsa_key_size: The size of the RSA host key in bits.
+    """
+
+    algorithms: tuple[str, ...] = ("rsa", "ed25519")
+    rsa_key_size: int = DEFAULT_RSA_KEY_SIZE
+
+    @classmethod
+    def from_charm(cls, charm: ops.CharmBase) -> "HostKeyConfig":
+        """Initialize the host key configuration from the charm configuration.
+
+        Args:
+            charm: The charm root TmateSSHServer charm.
+
+        Returns:
+            The host key configuration.
+
+        Raises:
+            CharmConfigInvalidError: if the host key configuration is invalid.
+        """
+        algorithms_config = str(
+            charm.config.get(HOST_KEY_ALGORITHMS_CONFIG_NAME, ",".join(cls.algorithms))
+        )
+        algorithms = tuple(
+            sorted({algorithm.strip() for algorithm in algorithms_config.split(",")})
+        )
+        if unknown := set(algorithms) - set(HOST_KEY_ALGORITHMS):
+            raise CharmConfigInvalidError(
+                f"Unsupported {HOST_KEY_ALGORITHMS_CONFIG_NAME} {sorted(unknown)}, "
+                f"supported are {list(HOST_KEY_ALGORITHMS)}."
+            )
+        if REQUIRED_HOST_KEY_ALGORITHM not in algorithms:
+            raise CharmConfigInvalidError(
+                f"{HOST_KEY_ALGORITHMS_CONFIG_NAME} must include {REQUIRED_HOST_KEY_ALGORITHM}."
+            )
+        rsa_key_size = int(charm.config.get(RSA_KEY_SIZE_CONFIG_NAME, DEFAULT_RSA_KEY_SIZE))
+        if rsa_key_size not in RSA_KEY_SIZES:
+            raise CharmConfigInvalidError(
+                f"Unsupported {RSA_KEY_SIZE_CONFIG_NAME} {rsa_key_size}, "
+                f"supported are {list(RSA_KEY_SIZES)}."
+            )
+        return cls(algorithms=algorithms, rsa_key_size=rsa_key_size)
+
+
+@dataclasses.dataclass(frozen=True)
+class RestartPolicy:
+    """The systemd restart policy of the tmate-ssh-server service.
+
+    Attributes:
+        restart_delay: The time in seconds systemd waits before restarting the exited service.
+        start_limit_burst: The number of starts allowed within the start limit interval, after
+            which systemd stops restarting the service.
+        start_limit_interval: The start limit interval in seconds.
+    """
+
+    restart_delay: int = 2
+    start_limit_burst: int = 5
+    start_limit_interval: int = 300
+
+    @classmethod
+    def from_charm(cls, charm: ops.CharmBase) -> "RestartPolicy":
+        """Initialize the restart policy from the charm configuration.
+
+        Args:
+            charm: The charm root TmateSSHServer charm.
+
+        Returns:
+            The restart policy.
+
+        Raises:
+            CharmConfigInvalidError: if the restart policy configuration is invalid.
+        """
+        restart_delay = int(charm.config.get(RESTART_DELAY_CONFIG_NAME, cls.restart_delay))
+        start_limit_burst = int(
+            charm.config.get(START_LIMIT_BURST_CONFIG_NAME, cls.start_limit_burst)
+        )
+        start_limit_interval = int(
+            charm.config.get(START_LIMIT_INTERVAL_CONFIG_NAME, cls.start_limit_interval)
+        )
+        if restart_delay < 0 or start_limit_interval < 0:
+            raise CharmConfigInvalidError(
+                f"{RESTART_DELAY_CONFIG_NAME} and {START_LIMIT_INTERVAL_CONFIG_NAME} must not be "
+                "negative."
+            )
+        if start_limit_burst < 1:
+            raise CharmConfigInvalidError(f"{START_LIMIT_BURST_CONFIG_NAME} must be at least 1.")
+        return cls(
+            restart_delay=restart_delay,
+            start_limit_burst=start_limit_burst,
+            start_limit_interval=start_limit_interval,
+        )
+
+
+def _workers_from_charm(charm: ops.CharmBase) -> int:
+    """Get the number of tmate-ssh-server workers from the charm configuration.
+
+    Args:
+        charm: The charm root TmateSSHServer charm.
+
+    Returns:
+        The number of workers, one per CPU core if configured to 0.
+
+    Raises:
+        CharmConfigInvalidError: if the number of workers is negative.
+    """
+    workers = int(charm.config.get(WORKERS_CONFIG_NAME, 1))
+    if workers < 0:
+        raise CharmConfigInvalidError(f"{WORKERS_CONFIG_NAME} must not be negative.")
+    return workers or os.cpu_count() or 1
+
+
 @dataclasses.dataclass(frozen=True)
 class State:
     """The tmate-ssh-server operator charm state.
@@ -87,10 +219,16 @@ class State:
     Attributes:
         ip_addr: The host IP address of the given tmate-ssh-server unit.
         proxy_config: The proxy configuration to apply to services used by tmate.
+        host_key_config: The host key configuration.
+        restart_policy: The restart policy of the tmate-ssh-server service.
+        workers: The number of tmate-ssh-server workers, each listening on its own port.
     """
 
     ip_addr: typing.Optional[typing.Union[ipaddress.IPv4Address, ipaddress.IPv6Address, str]]
     proxy_config: typing.Optional[ProxyConfig]
+    host_key_config: HostKeyConfig = HostKeyConfig()
+    restart_policy: RestartPolicy = RestartPolicy()
+    workers: int = 1
 
     @classmethod
     def from_charm(cls, charm: ops.CharmBase) -> "State":
@@ -111,10 +249,19 @@ class State:
         except ValidationError as exc:
             logger.error("Invalid juju model proxy configuration, %s", exc)
             raise CharmConfigInvalidError("Invalid model proxy configuration.") from exc
+        host_key_config = HostKeyConfig.from_charm(charm)
+        restart_policy = RestartPolicy.from_charm(charm)
+        workers = _workers_from_charm(charm)
 
         binding = charm.model.get_binding("juju-info")
         if not binding:
-            return cls(ip_addr=None, proxy_config=proxy_config)
+            return cls(
+                ip_addr=None,
+                proxy_config=proxy_config,
+                host_key_config=host_key_config,
+                restart_policy=restart_policy,
+                workers=workers,
+            )
         # If unable to get a casted IPvX address, it is not useful.
         # https://github.com/canonical/operator/blob/8a08e8e1b389fce4e7b54663863c4b2d06e72224/ops/model.py#L939-L947
         if isinstance(binding.network.bind_address, str):
@@ -123,5 +270,9 @@ class State:
             )
 
         return cls(
-            ip_addr=binding.network.bind_address if binding else None, proxy_config=proxy_config
+            ip_addr=binding.network.bind_address if binding else None,
+            proxy_config=proxy_config,
+            host_key_config=host_key_config,
+            restart_policy=restart_policy,
+            workers=workers,
         )
@@ -0,0 +1,381 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Control systemd services over D-Bus, falling back to systemctl."""
+
+import functools
+import logging
+
+# subprocess module is required to query systemctl when the system bus is unavailable, the
+# security implications have been considered.
+import subprocess  # nosec
+import time
+import typing
+
+import jeepney
+from charms.operator_libs_linux.v1 import systemd
+from jeepney.io.blocking import DBusConnection, open_dbus_connection
+from jeepney.wrappers import unwrap_msg
+
+logger = logging.getLogger(__name__)
+
+SYSTEMD_BUS_NAME = "org.freedesktop.systemd1"
+SYSTEMD_PATH = "/org/freedesktop/systemd1"
+MANAGER_INTERFACE = "org.freedesktop.systemd1.Manager"
+UNIT_INTERFACE = "org.freedesktop.systemd1.Unit"
+SERVICE_INTERFACE = "org.freedesktop.systemd1.Service"
+PROPERTIES_INTERFACE = "org.freedesktop.DBus.Properties"
+
+# Time in seconds for systemd to answer a method call.
+CALL_TIMEOUT = 30
+# Time in seconds for a start or stop job to complete, like systemctl waits for it.
+JOB_TIMEOUT = 60 * 5
+
+# The value of systemd for unset unsigned 64-bit properties, e.g. MemoryCurrent.
+UINT64_MAX = 2**64 - 1
+
+# The signal of systemd completing a job, sent to the subscribed clients.
+JOB_REMOVED_RULE = jeepney.MatchRule(
+    type="signal", interface=MANAGER_INTERFACE, member="JobRemoved", path=SYSTEMD_PATH
+)
+
+
+class ServiceManager(typing.Protocol):
+    """Control of the systemd services."""
+
+    def daemon_reload(self) -> None:
+        """Reload the systemd unit files."""
+
+    def service_enable(self, name: str) -> None:
+        """Enable a service.
+
+        Args:
+            name: The name of the service.
+        """
+
+    def service_disable(self, name: str) -> None:
+        """Disable a service.
+
+        Args:
+            name: The name of the service.
+        """
+
+    def service_start(self, name: str) -> None:
+        """Start a service and wait for the start job to complete.
+
+        Args:
+            name: The name of the service.
+        """
+
+    def service_stop(self, name: str) -> None:
+        """Stop a service and wait for the stop job to complete.
+
+        Args:
+            name: The name of the service.
+        """
+
+    def service_reset_failed(self, name: str) -> None:
+        """Reset the failed state of a service, including its start limit.
+
+        Args:
+            name: The name of the service.
+        """
+
+    def properties(self, name: str, *properties: str) -> dict[str, str]:
+        """Get unit properties of a service, formatted like systemctl show --timestamp=unix does.
+
+        Timestamps are formatted as @ followed by the seconds since the epoch, and unset values
+        as [not set].
+
+        Args:
+            name: The name of the service.
+            properties: The names of the unit or service properties.
+        """
+
+
+def _unit_name(name: str) -> str:
+    """Get the full unit name of a service.
+
+    Args:
+        name: The name of the service, with or without the .service suffix.
+
+    Returns:
+        The unit name of the service.
+    """
+    return name if name.endswith(".service") else f"{name}.service"
+
+
+def _format_property(name: str, value: typing.Any) -> str:
+    """Format a D-Bus property value like systemctl show --timestamp=unix does.
+
+    Args:
+        name: The name of the property.
+        value: The D-Bus value of the property.
+
+    Returns:
+        The formatted value.
+    """
+    if name.endswith("Timestamp"):
+        return f"@{value // 1_000_000}" if value else ""
+    if value == UINT64_MAX:
+        return "[not set]"
+    return str(value)
+
+
+class DBusManager:
+    """Control of the systemd services over one system bus connection."""
+
+    def __init__(self, connection: DBusConnection):
+        """Initialize the manager.
+
+        Args:
+            connection: The system bus connection.
+        """
+        self._connection = connection
+        self._subscribed = False
+
+    def _call(
+        self,
+        method: str,
+        signature: typing.Optional[str] = None,
+        body: tuple = (),
+        path: str = SYSTEMD_PATH,
+        interface: str = MANAGER_INTERFACE,
+    ) -> tuple:
+        """Call a systemd method.
+
+        Args:
+            method: The name of the method.
+            signature: The D-Bus signature of the arguments.
+            body: The arguments.
+            path: The object path.
+            interface: The interface of the method.
+
+        Returns:
+            The return values of the method.
+
+        Raises:
+            SystemdError: if the method call failed.
+        """
+        address = jeepney.DBusAddress(path, bus_name=SYSTEMD_BUS_NAME, interface=interface)
+        message = jeepney.new_method_call(address, method, signature, body)
+        try:
+            reply = self._connection.send_and_get_reply(message, timeout=CALL_TIMEOUT)
+            return unwrap_msg(reply)
+        except jeepney.DBusErrorResponse as exc:
+            raise systemd.SystemdError(f"systemd {method}{body} failed, {exc}.") from exc
+        except (OSError, TimeoutError) as exc:
+            raise systemd.SystemdError(f"systemd {method}{body} call failed, {exc!r}.") from exc
+
+    def _subscribe(self) -> None:
+        """Subscribe to the job signals of systemd.
+
+        Raises:
+            SystemdError: if the subscription failed.
+        """
+        if self._subscribed:
+            return
+        try:
+            unwrap_msg(
+                self._connection.send_and_get_reply(
+                    jeepney.message_bus.AddMatch(JOB_REMOVED_RULE), timeout=CALL_TIMEOUT
+                )
+            )
+        except (jeepney.DBusErrorResponse, OSError, TimeoutError) as exc:
+            raise systemd.SystemdError(f"Failed to watch systemd jobs, {exc!r}.") from exc
+        self._call("Subscribe")
+        self._subscribed = True
+
+    def _run_job(self, method: str, name: str) -> None:
+        """Queue a unit job and wait for it to complete.
+
+        Args:
+            method: The manager method queueing the job, e.g. StartUnit.
+            name: The name of the service.
+
+        Raises:
+            SystemdError: if the job failed or did not complete in time.
+        """
+        self._subscribe()
+        unit = _unit_name(name)
+        # Signals received while waiting for the method reply are queued by the filter.
+        with self._connection.filter(JOB_REMOVED_RULE, bufsize=64) as signals:
+            (job,) = self._call(method, "ss", (unit, "replace"))
+            deadline = time.monotonic() + JOB_TIMEOUT
+            while True:
+                try:
+                    signal = self._connection.recv_until_filtered(
+                        signals, timeout=max(deadline - time.monotonic(), 0)
+                    )
+                except (OSError, TimeoutError) as exc:
+                    raise systemd.SystemdError(f"{method} {unit} did not complete.") from exc
+                _, removed_job, _, result = signal.body
+                if removed_job == job:
+                    break
+        if result != "done":
+            raise systemd.SystemdError(f"{method} {unit} failed with result {result}.")
+
+    def daemon_reload(self) -> None:
+        """Reload the systemd unit files."""
+        self._call("Reload")
+
+    def service_enable(self, name: str) -> None:
+        """Enable a service.
+
+        Args:
+            name: The name of the service.
+        """
+        self._call("EnableUnitFiles", "asbb", ([_unit_name(name)], False, True))
+        # systemctl enable reloads the unit files too, to pick up the enablement.
+        self.daemon_reload()
+
+    def service_disable(self, name: str) -> None:
+        """Disable a service.
+
+        Args:
+            name: The name of the service.
+        """
+        self._call("DisableUnitFiles", "asb", ([_unit_name(name)], False))
+        self.daemon_reload()
+
+    def service_start(self, name: str) -> None:
+        """Start a service and wait for the start job to complete.
+
+        Args:
+            name: The name of the service.
+        """
+        self._run_job("StartUnit", name)
+
+    def service_stop(self, name: str) -> None:
+        """Stop a service and wait for the stop job to complete.
+
+        Args:
+            name: The name of the service.
+        """
+        self._run_job("StopUnit", name)
+
+    def service_reset_failed(self, name: str) -> None:
+        """Reset the failed state of a service, including its start limit.
+
+        Args:
+            name: The name of the service.
+        """
+        self._call("ResetFailedUnit", "s", (_unit_name(name),))
+
+    def properties(self, name: str, *properties: str) -> dict[str, str]:
+        """Get unit properties of a service, formatted like systemctl show does.
+
+        Args:
+            name: The name of the service.
+            properties: The names of the unit or service properties.
+
+        Returns:
+            The values of the properties found, by property name.
+        """
+        (path,) = self._call("LoadUnit", "s", (_unit_name(name),))
+        values: dict[str, str] = {}
+        for interface in (UNIT_INTERFACE, SERVICE_INTERFACE):
+            (all_properties,) = self._call(
+                "GetAll", "s", (interface,), path=path, interface=PROPERTIES_INTERFACE
+            )
+            values.update(
+                (property_, _format_property(property_, all_properties[property_][1]))
+                for property_ in properties
+                if property_ in all_properties
+            )
+        return values
+
+
+class SystemctlManager:
+    """Control of the systemd services by running systemctl."""
+
+    def daemon_reload(self) -> None:
+        """Reload the systemd unit files."""
+        systemd.daemon_reload()
+
+    def service_enable(self, name: str) -> None:
+        """Enable a service.
+
+        Args:
+            name: The name of the service.
+        """
+        systemd.service_enable(name)
+
+    def service_disable(self, name: str) -> None:
+        """Disable a service.
+
+        Args:
+            name: The name of the service.
+        """
+        systemd.service_disable(name)
+
+    def service_start(self, name: str) -> None:
+        """Start a service and wait for the start job to complete.
+
+        Args:
+            name: The name of the service.
+        """
+        systemd.service_start(name)
+
+    def service_stop(self, name: str) -> None:
+        """Stop a service and wait for the stop job to complete.
+
+        Args:
+            name: The name of the service.
+        """
+        systemd.service_stop(name)
+
+    def service_reset_failed(self, name: str) -> None:
+        """Reset the failed state of a service, including its start limit.
+
+        Args:
+            name: The name of the service.
+
+        Raises:
+            SystemdError: if systemctl failed.
+        """
+        cmd = ["systemctl", "reset-failed", _unit_name(name)]
+        try:
+            subprocess.run(cmd, capture_output=True, check=True, text=True)  # nosec B603
+        except subprocess.CalledProcessError as exc:
+            raise systemd.SystemdError(f"Command {cmd} failed, {exc.stderr}.") from exc
+
+    def properties(self, name: str, *properties: str) -> dict[str, str]:
+        """Get unit properties of a service.
+
+        Args:
+            name: The name of the service.
+            properties: The names of the unit or service properties.
+
+        Returns:
+            The values of the properties found, by property name.
+
+        Raises:
+            SystemdError: if systemctl failed.
+        """
+        cmd = [
+            "systemctl",
+            "show",
+            "--timestamp=unix",
+            f"--property={','.join(properties)}",
+            _unit_name(name),
+        ]
+        try:
+            output = subprocess.check_output(cmd, text=True)  # nosec B603
+        except subprocess.CalledProcessError as exc:
+            raise systemd.SystemdError(f"Command {cmd} failed, {exc.output}.") from exc
+        return dict(line.split("=", 1) for line in output.splitlines() if "=" in line)
+
+
+@functools.cache
+def manager() -> ServiceManager:
+    """Get the service manager of the charm, connecting to the system bus once per hook.
+
+    Returns:
+        The D-Bus service manager, the systemctl one if the system bus is unavailable.
+    """
+    try:
+        return DBusManager(open_dbus_connection(bus="SYSTEM"))
+    except (OSError, jeepney.AuthenticationError) as exc:
+        logger.warning("System bus unavailable, falling back to systemctl, %r.", exc)
+        return SystemctlManager()
@@ -0,0 +1,153 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Per-stage timing instrumentation of the install and restart paths."""
+
+import contextlib
+import dataclasses
+import json
+import logging
+import threading
+import time
+import typing
+from datetime import datetime, timezone
+
+import ops
+
+logger = logging.getLogger(__name__)
+
+# The number of most recent timelines kept in charm state.
+MAX_TIMELINES = 10
+
+
+@dataclasses.dataclass(frozen=True)
+class StageTiming:
+    """The timing of a single stage.
+
+    Attributes:
+        name: The name of the stage.
+        start: The start of the stage in seconds since the start of the timeline.
+        end: The end of the stage in seconds since the start of the timeline.
+        failed: Whether the stage raised an exception.
+    """
+
+    name: str
+    start: float
+    end: float
+    failed: bool
+
+
+class Timeline:
+    """Monotonic start and end timings of the stages of a hook path.
+
+    Stages may be recorded concurrently from multiple threads.
+
+    Attributes:
+        name: The name of the timed path, e.g. install.
+        stages: The timings of the completed stages, in order of completion.
+    """
+
+    def __init__(self, name: str):
+        """Start the timeline.
+
+        Args:
+            name: The name of the timed path.
+        """
+        self.name = name
+        self.stages: list[StageTiming] = []
+        self._started_at = datetime.now(timezone.utc)
+        self._origin = time.monotonic()
+        self._end: typing.Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _elapsed(self) -> float:
+        """Get the time since the start of the timeline.
+
+        Returns:
+            The elapsed seconds.
+        """
+        return time.monotonic() - self._origin
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> typing.Iterator[None]:
+        """Time the stage executed in the context.
+
+        Args:
+            name: The name of the stage.
+
+        Yields:
+            Control to the timed stage.
+        """
+        start = self._elapsed()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            timing = StageTiming(name=name, start=start, end=self._elapsed(), failed=failed)
+            with self._lock:
+                self.stages.append(timing)
+
+    def finish(self) -> None:
+        """Mark the end of the timeline."""
+        self._end = self._elapsed()
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        """Get the structured representation of the timeline.
+
+        Returns:
+            The timeline as a JSON serializable dictionary.
+        """
+        return {
+            "name": self.name,
+            "started-at": self._started_at.isoformat(),
+            "duration": round(self._end if self._end is not None else self._elapsed(), 3),
+            "failed": any(stage.failed for stage in self.stages),
+            "stages": [
+                {
+                    "name": stage.name,
+                    "start": round(stage.start, 3),
+                    "end": round(stage.end, 3),
+                    "duration": round(stage.end - stage.start, 3),
+                    "failed": stage.failed,
+                }
+                for stage in self.stages
+            ],
+        }
+
+
+class History(ops.Object):
+    """The most recent timelines, persisted in charm state."""
+
+    _stored = ops.StoredState()
+
+    def __init__(self, charm: ops.CharmBase):
+        """Initialize the timeline history.
+
+        Args:
+            charm: The parent charm to attach the history to.
+        """
+        super().__init__(charm, "timing-history")
+        self._stored.set_default(timelines=[])
+
+    def record(self, timeline: Timeline) -> None:
+        """Finish the timeline, log it and persist it with the most recent timelines.
+
+        The charm state is committed immediately so that the timeline of a failing hook is kept.
+
+        Args:
+            timeline: The timeline to record.
+        """
+        timeline.finish()
+        serialized = json.dumps(timeline.to_dict())
+        logger.info("Timeline: %s", serialized)
+        self._stored.timelines = [*self._stored.timelines, serialized][-MAX_TIMELINES:]
+        self.framework.commit()
+
+    def timelines(self) -> list[dict[str, typing.Any]]:
+        """Get the most recent timelines.
+
+        Returns:
+            The structured timelines, oldest first.
+        """
+        return [json.loads(timeline) for timeline in self._stored.timelines]
@@ -3,322 +3,603 @@
 
 """Configurations and functions to operate tmate-ssh-server."""
 
-import base64
 import dataclasses
 import hashlib
-import ipaddress
 import logging
-import secrets
-import string
+import os
+import random
+import selectors
+import socket
 
 # subprocess module is required to install and start docker daemon processes, the security
 # implications have been considered.
 import subprocess  # nosec
-import textwrap
+import time
 import typing
-from datetime import datetime, timedelta
 from functools import partial
 from pathlib import Path
 from time import sleep
 
 import jinja2
-from charms.operator_libs_linux.v0 import apt, passwd
 from charms.operator_libs_linux.v1 import systemd
 
+import daemon_status
+import docker_api
+import host_keys
+import prerequisites
 import state
-
-APT_DEPENDENCIES = ["openssh-client"]
+import systemd_bus
+import timing
 
 GIT_REPOSITORY_URL = "https://github.com/tmate-io/tmate-ssh-server.git"
 
 WORK_DIR = Path("/home/ubuntu/")
-CREATE_KEYS_SCRIPT_PATH = WORK_DIR / "create_keys.sh"
-KEYS_DIR = WORK_DIR / "keys"
-RSA_PUB_KEY_PATH = KEYS_DIR / "ssh_host_rsa_key.pub"
-ED25519_PUB_KEY_PATH = KEYS_DIR / "ssh_host_ed25519_key.pub"
-TMATE_SSH_SERVER_SERVICE_PATH = Path("/etc/systemd/system/tmate-ssh-server.service")
-DOCKER_DAEMON_CONFIG_PATH = Path("/etc/docker/daemon.json")
+TMATE_SSH_SERVER_SERVICE_PATH = Path("/etc/systemd/system/tmate-ssh-server@.service")
+# The unit file of the single tmate-ssh-server service, replaced by the worker template unit.
+LEGACY_SERVICE_PATH = Path("/etc/systemd/system/tmate-ssh-server.service")
+# The image of the single tmate-ssh-server service, whose containers were not removed on exit.
+LEGACY_IMAGE = "ghcr.io/canonical/tmate-ssh-server:0.1.1"
 TMATE_SERVICE_NAME = "tmate-ssh-server"
 
-USER = "ubuntu"
-GROUP = "ubuntu"
-
+# The port of the first worker, the other workers listen on the consecutive ports.
 PORT = 10022
 
-# systemd exit codes: https://refspecs.linuxbase.org/LSB_3.0.0/LSB-PDA/LSB-PDA/iniscrptact.html
-SYSTEMD_UNIT_NOT_RUNNING_CODE = 3
-
-logger = logging.getLogger(__name__)
-
+# The Docker Engine API client of the charm, reusing its connection across queries.
+DOCKER_CLIENT = docker_api.DockerClient()
 
-class DependencySetupError(Exception):
-    """Represents an error while installing and setting up dependencies."""
+# Time in seconds for the tmate-ssh-server container to start.
+CONTAINER_START_TIMEOUT = 60
+# Time in seconds for tmate-ssh-server to accept SSH connections once its container started.
+SSH_READY_TIMEOUT = 60
+# Identification lines of the SSH protocol versions supported by the clients, see RFC 4253.
+SSH_BANNER_PREFIXES = ("SSH-2.0-", "SSH-1.99-")
+# RFC 4253 limits the identification line to 255 characters, including CR LF.
+SSH_BANNER_MAX_LENGTH = 255
+# The server may send other lines before its identification line.
+SSH_BANNER_MAX_LINES = 16
 
 
-class KeyInstallError(Exception):
-    """Represents an error while installing/generating key files."""
+logger = logging.getLogger(__name__)
 
 
 class DaemonError(Exception):
     """Represents an error with the tmate-ssh-server daemon."""
 
 
-class IncompleteInitError(Exception):
-    """The tmate-ssh-server has not been fully initialized."""
-
-
 class FingerprintError(Exception):
     """Represents an error with generating fingerprints from public keys."""
 
 
-class DockerError(Exception):
-    """Represents an error using a docker command."""
+class WaitTimeoutError(TimeoutError):
+    """Represents a condition that did not become true before the deadline.
 
+    Attributes:
+        attempts: The attempts made to check the condition, in order.
+    """
 
-@dataclasses.dataclass
-class DaemonStatus:
-    """The status of the tmate-ssh-server daemon.
+    def __init__(self, attempts: "list[WaitAttempt]"):
+        """Initialize the error.
+
+        Args:
+            attempts: The attempts made to check the condition, in order.
+        """
+        super().__init__(
+            f"Timed out after {len(attempts)} attempts, last observed {attempts[-1].result!r}."
+        )
+        self.attempts = attempts
+
+    @property
+    def last_result(self) -> typing.Any:
+        """The result of the last attempt."""
+        return self.attempts[-1].result
+
+
+@dataclasses.dataclass(frozen=True)
+class WaitAttempt:
+    """An attempt to check a waited for condition.
 
     Attributes:
-        running: True if the daemon is running, False otherwise.
-        status: The status string of the daemon process.
+        result: The observed result of the check.
+        latency: The duration of the check in seconds.
     """
 
-    running: bool
-    status: str
+    result: typing.Any
+    latency: float
+
+
+def template_digest(name: str) -> str:
+    """Get the digest of a charm template, to detect changes to the files rendered from it.
+
+    Args:
+        name: The file name of the template.
+
+    Returns:
+        The SHA256 hex digest of the template.
+    """
+    return hashlib.sha256((Path("templates") / name).read_bytes()).hexdigest()
 
 
-def _setup_docker(proxy_config: typing.Optional[state.ProxyConfig] = None) -> None:
-    """Install and configure proxy settings for docker if available.
+def _wait_for(
+    func: typing.Callable[[], typing.Any],
+    timeout: float = 300,
+    ready: typing.Callable[[typing.Any], bool] = bool,
+    initial_interval: float = 0.5,
+    max_interval: float = 10,
+) -> list[WaitAttempt]:
+    """Wait for the result of a function to become ready, with exponential backoff.
+
+    The function is checked right away, then after intervals doubling from the initial interval up
+    to the maximum interval, each randomly shortened by up to half to spread out the checks. The
+    deadline is measured on the monotonic clock, so it is not affected by wall clock changes, and
+    the function is checked one last time at the deadline.
 
     Args:
-        proxy_config: The proxy configuration to enable for dockerd.
+        func: The function to check.
+        timeout: Time in seconds to wait for the result to become ready.
+        ready: Whether a result of the function is ready, its truthiness by default.
+        initial_interval: Time in seconds to wait after the first check.
+        max_interval: Maximum time in seconds to wait between checks.
+
+    Returns:
+        The attempts made to check the function, the last one being ready.
 
     Raises:
-        PackageNotFoundError: if the Docker apt package was not found.
-        PackageError: if there was a problem installing up Docker apt package.
+        WaitTimeoutError: if the result did not become ready within timeout.
     """
-    if proxy_config:
-        environment = jinja2.Environment(
-            loader=jinja2.FileSystemLoader("templates"), autoescape=True
-        )
-        docker_template = environment.get_template("docker_daemon.json.j2")
-        daemon_config = docker_template.render(
-            HTTP_PROXY=proxy_config.http_proxy,
-            HTTPS_PROXY=proxy_config.https_proxy,
-            NO_PROXY=proxy_config.no_proxy,
-        )
-        DOCKER_DAEMON_CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        DOCKER_DAEMON_CONFIG_PATH.touch(exist_ok=True)
-        DOCKER_DAEMON_CONFIG_PATH.write_text(daemon_config, encoding="utf-8")
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+    attempts: list[WaitAttempt] = []
+    while True:
+        start = time.monotonic()
+        result = func()
+        attempts.append(WaitAttempt(result=result, latency=time.monotonic() - start))
+        if ready(result):
+            logger.debug("Ready after %s attempts: %s.", len(attempts), attempts)
+            return attempts
+        if (remaining := deadline - time.monotonic()) <= 0:
+            raise WaitTimeoutError(attempts)
+        # The jitter is not security sensitive.
+        sleep(min(random.uniform(interval / 2, interval), remaining))  # nosec B311
+        interval = min(interval * 2, max_interval)
+
+
+def container_state(name: str) -> typing.Optional[docker_api.ContainerState]:
+    """Get the state of a docker container from the docker daemon.
+
+    Args:
+        name: The exact name of the docker container.
 
+    Returns:
+        The container state, None if there is no container of that name.
+
+    Raises:
+        DockerError: if the docker daemon could not be queried.
+    """
     try:
-        apt.add_package("docker.io", update_cache=True)
-    except (apt.PackageNotFoundError, apt.PackageError) as exc:
-        logger.error("Failed to add docker package, %s.", exc)
-        raise
-    passwd.add_group("docker")
-    passwd.add_user_to_group(USER, "docker")
+        return DOCKER_CLIENT.container(name)
+    except docker_api.DockerAPIError as exc:
+        raise prerequisites.DockerError(
+            f"Failed to get docker container {name} state, {exc}"
+        ) from exc
 
 
-def install_dependencies(proxy_config: typing.Optional[state.ProxyConfig] = None) -> None:
-    """Install dependenciese required to start tmate-ssh-server container.
+def check_docker_container(name: str) -> bool:
+    """Return True if the container is running.
 
     Args:
-        proxy_config: The proxy configuration to enable for dockerd.
+        name: The exact name of the docker container to check.
+
+    Returns:
+        True if the container is running, False otherwise.
 
     Raises:
-        DependencySetupError: if there was something wrong installing the apt package
-            dependencies.
+        DaemonError: if the docker daemon could not be queried.
     """
     try:
-        apt.add_package(APT_DEPENDENCIES, update_cache=True)
-        _setup_docker(proxy_config=proxy_config)
-    except (apt.PackageNotFoundError, apt.PackageError) as exc:
-        raise DependencySetupError("Failed to install apt packages.") from exc
+        container = container_state(name)
+    except prerequisites.DockerError as exc:
+        raise DaemonError(str(exc)) from exc
+    return bool(container and container.running)
+
 
+def _watch_container_start(names: typing.Sequence[str], timeout: int) -> subprocess.Popen:
+    """Subscribe to the start events of containers.
 
-def install_keys(host_ip: typing.Union[ipaddress.IPv4Address, ipaddress.IPv6Address, str]) -> None:
-    """Install key creation script and generate keys.
+    The subscription ends by itself after the timeout, so reading the events never blocks for
+    longer than the timeout.
 
     Args:
-        host_ip: The charm host's public IP address.
+        names: The names of the docker containers to watch.
+        timeout: Time in seconds to watch for the container starts.
+
+    Returns:
+        The docker events process, writing a line per container start event.
 
     Raises:
-        KeyInstallError: if there was an error creating ssh keys.
+        DaemonError: if the docker events command failed to run.
     """
-    environment = jinja2.Environment(loader=jinja2.FileSystemLoader("templates"), autoescape=True)
-    template = environment.get_template("create_keys.sh.j2")
-    script = template.render(keys_dir=KEYS_DIR, host=str(host_ip), port=PORT)
-    WORK_DIR.mkdir(parents=True, exist_ok=True)
-    KEYS_DIR.mkdir(parents=True, exist_ok=True)
-    CREATE_KEYS_SCRIPT_PATH.write_text(script, encoding="utf-8")
+    # Events are replayed from just before the subscription, so a container starting while the
+    # subscription is set up is not missed. The container name is reused across restarts, so the
+    # replay starts with sub-second precision to not pick up the start of a previous container.
+    since = time.time()
+    # Filters of the same key match any of their values.
+    container_filters = [arg for name in names for arg in ("--filter", f"container={name}")]
+    cmd = [
+        "docker",
+        "events",
+        "--filter",
+        "type=container",
+        *container_filters,
+        "--filter",
+        "event=start",
+        "--since",
+        f"{since:.9f}",
+        "--until",
+        f"{since + timeout:.9f}",
+        "--format",
+        "{{.Status}}",
+    ]
     try:
-        # B603:subprocess_without_shell_equals_true false positive
-        # see https://github.com/PyCQA/bandit/issues/333
-        subprocess.check_call(["/usr/bin/chown", "-R", f"{USER}:{GROUP}", str(WORK_DIR)])  # nosec
-        CREATE_KEYS_SCRIPT_PATH.chmod(755)
-        subprocess.check_call([str(CREATE_KEYS_SCRIPT_PATH)])  # nosec
-    except subprocess.CalledProcessError as exc:
-        raise KeyInstallError from exc
+        return subprocess.Popen(  # nosec B603
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+    except OSError as exc:
+        raise DaemonError(f"Failed to watch docker containers {list(names)} events.") from exc
 
 
-def _wait_for(
-    func: typing.Callable[[], typing.Any], timeout: int = 300, check_interval: int = 10
-) -> None:
-    """Wait for function execution to become truthy.
+def _wait_for_container_start(events: subprocess.Popen, count: int, timeout: float) -> None:
+    """Wait for container start events, one line each.
 
     Args:
-        func: A callback function to wait to return a truthy value.
-        timeout: Time in seconds to wait for function result to become truthy.
-        check_interval: Time in seconds to wait between ready checks.
+        events: The docker events process of the container start events.
+        count: The number of container start events to wait for.
+        timeout: Time in seconds to wait for the containers to start.
 
     Raises:
-        TimeoutError: if the callback function did not return a truthy value within timeout.
+        TimeoutError: if the containers did not start within timeout.
     """
-    start_time = now = datetime.now()
-    min_wait_seconds = timedelta(seconds=timeout)
-    while now - start_time < min_wait_seconds:
-        if func():
-            return
-        now = datetime.now()
-        sleep(check_interval)
-    if func():
-        return
-    raise TimeoutError()
+    stdout = typing.cast(typing.IO[bytes], events.stdout)
+    deadline = time.monotonic() + timeout
+    output = b""
+    with selectors.DefaultSelector() as selector:
+        selector.register(stdout, selectors.EVENT_READ)
+        while output.count(b"\n") < count:
+            # The pipe is read unbuffered, so events written together are not left waiting in a
+            # buffer. No output means that the subscription ended without all start events.
+            if not selector.select(max(deadline - time.monotonic(), 0)) or not (
+                chunk := os.read(stdout.fileno(), 4096)
+            ):
+                raise TimeoutError()
+            output += chunk
+
+
+def probe_ssh_banner(address: str, port: int = PORT, timeout: float = 5) -> typing.Optional[str]:
+    """Check that tmate-ssh-server accepts SSH connections by reading its identification banner.
 
+    Args:
+        address: The address tmate-ssh-server is bound to.
+        port: The port tmate-ssh-server is bound to.
+        timeout: Time in seconds to wait for the connection and for each read.
 
-def check_docker_container(name: str) -> bool:
-    """Return True if the container is running.
+    Returns:
+        The SSH identification banner, None if the server did not send a valid banner.
+    """
+    try:
+        with socket.create_connection((address, port), timeout=timeout) as connection:
+            with connection.makefile("rb") as stream:
+                for _ in range(SSH_BANNER_MAX_LINES):
+                    line = stream.readline(SSH_BANNER_MAX_LENGTH)
+                    if not line:
+                        break
+                    if line.startswith(b"SSH-"):
+                        banner = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                        return banner if banner.startswith(SSH_BANNER_PREFIXES) else None
+    except OSError as exc:
+        logger.debug("Failed to read the SSH banner of %s:%s, %s.", address, port, exc)
+        return None
+    logger.debug("No SSH banner received from %s:%s.", address, port)
+    return None
+
+
+def worker_ports(workers: int) -> list[int]:
+    """Get the ports of the tmate-ssh-server workers.
 
     Args:
-        name: The name of the docker container to check.
+        workers: The number of workers.
 
     Returns:
-        True if the container is running, False otherwise.
+        The consecutive ports of the workers, starting at the default tmate-ssh-server port.
+    """
+    return list(range(PORT, PORT + workers))
 
-    Raises:
-        DaemonError: If the subprocess command exits with a non-zero exit code.
+
+def _service_name(port: int) -> str:
+    """Get the name of the systemd service instance of a tmate-ssh-server worker.
+
+    Args:
+        port: The port of the worker.
+
+    Returns:
+        The name of the template unit instance.
     """
-    try:
-        cmd = ["docker", "ps", "--filter", f"name={name}", "--format", "{{.Status}}"]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True)  # nosec B603
-        return "Up" in result.stdout
-    except subprocess.CalledProcessError as exc:
-        raise DaemonError(
-            f"Command {cmd} failed with return code {exc.returncode}. Output: {exc.stdout}"
-        ) from exc
+    return f"{TMATE_SERVICE_NAME}@{port}"
 
 
-def status() -> DaemonStatus:
-    """Check the status of the tmate-ssh-server service.
+def status(ports: typing.Sequence[int] = (PORT,)) -> dict[int, daemon_status.DaemonStatus]:
+    """Check the status of the tmate-ssh-server worker services.
+
+    Only the unit properties making up the status are queried, without the journal of the units.
+
+    Args:
+        ports: The ports of the workers.
 
     Returns:
-        The status of the tmate-ssh-server daemon.
+        The status of each tmate-ssh-server worker, by port.
 
     Raises:
         DaemonError: if there was an error checking the status of tmate-ssh-server.
     """
-    try:
-        # Input to subprocess.check_output is trusted, as it is not user input.
-        status_str = subprocess.check_output(["systemctl", "status", TMATE_SERVICE_NAME])  # nosec
-    except subprocess.CalledProcessError as exc:
-        if exc.returncode == SYSTEMD_UNIT_NOT_RUNNING_CODE:
-            return DaemonStatus(running=False, status=exc.stdout.decode("utf-8"))
-        raise DaemonError("Failed to check tmate-ssh-server status.") from exc
+    manager = systemd_bus.manager()
+    statuses = {}
+    for port in ports:
+        try:
+            properties = manager.properties(_service_name(port), *daemon_status.STATUS_PROPERTIES)
+        except systemd.SystemdError as exc:
+            raise DaemonError(f"Failed to check tmate-ssh-server worker {port} status.") from exc
+        statuses[port] = daemon_status.from_properties(properties)
+    return statuses
 
-    return DaemonStatus(running=True, status=status_str.decode("utf-8"))
 
+def container_name(unit_name: str) -> str:
+    """Get the name of the tmate-ssh-server containers of a unit.
 
-def start_daemon(address: str) -> None:
-    """Install unit files, enable and start daemon.
+    Each worker runs a container of this name suffixed with the port of the worker.
+
+    Args:
+        unit_name: The name of the Juju unit, e.g. tmate-ssh-server/0.
+
+    Returns:
+        The container name, stable across restarts of the daemon.
+    """
+    return f"tmate-ssh-server-{unit_name.replace('/', '-')}"
+
+
+def worker_container_name(name: str, port: int) -> str:
+    """Get the name of the container of a tmate-ssh-server worker.
+
+    Args:
+        name: The name of the tmate-ssh-server containers of the unit.
+        port: The port of the worker.
+
+    Returns:
+        The name of the worker container, set by the service template.
+    """
+    return f"{name}-{port}"
+
+
+def _write_service_file(
+    address: str, name: str, image: str, restart_policy: state.RestartPolicy
+) -> bool:
+    """Render the template unit file of the tmate-ssh-server worker services.
 
     Args:
         address: The IP address to bind to.
+        name: The name of the tmate-ssh-server container.
+        image: The tmate-ssh-server image reference to run.
+        restart_policy: The systemd restart policy of the service.
 
-    Raises:
-        DaemonError: if there was an error starting the tmate-ssh-server docker process.
+    Returns:
+        Whether the unit file changed.
     """
     environment = jinja2.Environment(loader=jinja2.FileSystemLoader("templates"), autoescape=True)
-    container_name = "".join(
-        secrets.choice(string.ascii_lowercase + string.digits) for _ in range(10)
-    )
     service_content = environment.get_template("tmate-ssh-server.service.j2").render(
-        NAME=container_name,
+        NAME=name,
         WORKDIR=WORK_DIR,
-        KEYS_DIR=KEYS_DIR,
-        PORT=PORT,
+        KEYS_DIR=host_keys.KEYS_DIR,
         ADDRESS=address,
+        IMAGE=image,
+        RESTART_DELAY=restart_policy.restart_delay,
+        START_LIMIT_BURST=restart_policy.start_limit_burst,
+        START_LIMIT_INTERVAL=restart_policy.start_limit_interval,
     )
+    if (
+        TMATE_SSH_SERVER_SERVICE_PATH.exists()
+        and TMATE_SSH_SERVER_SERVICE_PATH.read_text(encoding="utf-8") == service_content
+    ):
+        return False
     TMATE_SSH_SERVER_SERVICE_PATH.write_text(service_content, encoding="utf-8")
-    try:
-        systemd.daemon_reload()
-        systemd.service_enable(TMATE_SERVICE_NAME)
-        systemd.service_start(TMATE_SERVICE_NAME)
-        _wait_for(partial(check_docker_container, container_name), timeout=60)
-        _wait_for(partial(systemd.service_running, TMATE_SERVICE_NAME), timeout=60 * 10)
-    except systemd.SystemdError as exc:
-        raise DaemonError("Failed to start tmate-ssh-server daemon.") from exc
-    except TimeoutError as exc:
-        raise DaemonError("Timed out waiting for tmate service to start.") from exc
+    return True
 
 
-@dataclasses.dataclass
-class Fingerprints:
-    """The public key fingerprints.
+def apply_restart_policy(
+    address: str, name: str, image: str, restart_policy: state.RestartPolicy
+) -> bool:
+    """Apply a changed restart policy to the installed tmate-ssh-server service.
 
-    Attributes:
-        rsa: The RSA public key fingerprint.
-        ed25519: The ed25519 public key fingerprint.
-    """
+    systemd applies the restart policy once the unit files are reloaded, the running daemon is
+    not restarted.
 
-    rsa: str
-    ed25519: str
+    Args:
+        address: The IP address the daemon binds to.
+        name: The name of the tmate-ssh-server container.
+        image: The tmate-ssh-server image reference the daemon runs.
+        restart_policy: The systemd restart policy of the service.
+
+    Returns:
+        Whether the unit file changed, False if the service is not installed yet.
 
+    Raises:
+        DaemonError: if the unit files could not be reloaded.
+    """
+    if not TMATE_SSH_SERVER_SERVICE_PATH.exists():
+        return False
+    if not _write_service_file(address, name, image, restart_policy):
+        return False
+    try:
+        systemd_bus.manager().daemon_reload()
+    except systemd.SystemdError as exc:
+        raise DaemonError("Failed to reload tmate-ssh-server unit file.") from exc
+    return True
 
-def _calculate_fingerprint(key: str) -> str:
-    """Calculate the SHA256 fingerprint of a key.
 
-    Args:
-        key: Base64 encoded key value.
+def legacy_service_installed() -> bool:
+    """Check whether the single tmate-ssh-server service of previous charm revisions is installed.
 
     Returns:
-        Fingerprint of a key.
+        Whether the service unit file of previous charm revisions is installed.
     """
-    decoded_bytes = base64.b64decode(key)
-    key_hash = hashlib.sha256(decoded_bytes).digest()
-    return base64.b64encode(key_hash).decode("utf-8").removesuffix("=")
+    return LEGACY_SERVICE_PATH.exists()
 
 
-def get_fingerprints() -> Fingerprints:
-    """Get fingerprint from generated keys.
+def _remove_legacy_containers() -> None:
+    """Remove the stopped containers left behind by the single tmate-ssh-server service.
+
+    Previous charm revisions ran a randomly named container on every start without removing it
+    on exit, and pruned the stopped containers in the update-status hook. The containers of the
+    workers are removed on exit, so the leftovers of the single service are removed once here.
 
     Raises:
-        IncompleteInitError: if the keys have not been generated by the create_keys.sh script.
+        DaemonError: if the stopped containers could not be listed or removed.
+    """
+    try:
+        listed = subprocess.run(  # nosec B603
+            [
+                "docker",
+                "ps",
+                "--all",
+                "--quiet",
+                "--filter",
+                f"ancestor={LEGACY_IMAGE}",
+                "--filter",
+                "status=created",
+                "--filter",
+                "status=exited",
+                "--filter",
+                "status=dead",
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        if containers := listed.stdout.split():
+            logger.info("Removing %d stopped tmate-ssh-server containers.", len(containers))
+            subprocess.run(  # nosec B603
+                ["docker", "rm", *containers], capture_output=True, check=True, text=True
+            )
+    except subprocess.CalledProcessError as exc:
+        raise DaemonError(f"Failed to remove stopped containers, {exc.stderr}.") from exc
 
-    Returns:
-        The generated public key fingerprints.
+
+def _remove_legacy_service(manager: systemd_bus.ServiceManager) -> None:
+    """Remove the single tmate-ssh-server service installed by previous charm revisions.
+
+    The service listens on the port of the first worker, so it is stopped before the workers
+    start.
+
+    Args:
+        manager: The service manager.
+
+    Raises:
+        SystemdError: if the service could not be stopped or disabled.
+        DaemonError: if the stopped containers of the service could not be removed.
     """
-    if not KEYS_DIR.exists() or not RSA_PUB_KEY_PATH.exists() or not ED25519_PUB_KEY_PATH.exists():
-        raise IncompleteInitError("Missing keys path(s).")
+    if not legacy_service_installed():
+        return
+    logger.info("Replacing the tmate-ssh-server service with worker services.")
+    manager.service_stop(TMATE_SERVICE_NAME)
+    manager.service_disable(TMATE_SERVICE_NAME)
+    # The unit file is removed last, so that the removal is retried if a step fails.
+    _remove_legacy_containers()
+    LEGACY_SERVICE_PATH.unlink()
+
+
+def start_daemon(  # pylint: disable=too-many-arguments
+    address: str,
+    name: str,
+    image: str = prerequisites.IMAGE,
+    *,
+    restart_policy: typing.Optional[state.RestartPolicy] = None,
+    ports: typing.Sequence[int] = (PORT,),
+    timeline: typing.Optional[timing.Timeline] = None,
+) -> None:
+    """Install unit files, enable and start the tmate-ssh-server workers.
 
-    # format of a public key is: ssh-rsa <b64-encoded-key> <user>
-    rsa_pub_key = RSA_PUB_KEY_PATH.read_text(encoding="utf-8")
-    rsa_key_b64 = rsa_pub_key.split()[1]
-    rsa_fingerprint = _calculate_fingerprint(rsa_key_b64)
+    Each worker runs an ephemeral container, removed once it stops, and any leftover container of
+    the same name is removed before it starts, so restarts leave no stopped containers behind.
+    systemd restarts a worker when it exits, within the limits of the restart policy.
 
-    ed25519_pub_key = ED25519_PUB_KEY_PATH.read_text(encoding="utf-8")
-    ed25519_key_b64 = ed25519_pub_key.split()[1]
-    ed25519_fingerprint = _calculate_fingerprint(ed25519_key_b64)
+    Args:
+        address: The IP address to bind to.
+        name: The name of the tmate-ssh-server containers, suffixed with the worker port.
+        image: The tmate-ssh-server image reference to run.
+        restart_policy: The systemd restart policy of the service, the default one if not given.
+        ports: The ports of the workers to start.
+        timeline: The timeline to record the timings of the start steps in.
 
-    return Fingerprints(rsa=f"SHA256:{rsa_fingerprint}", ed25519=f"SHA256:{ed25519_fingerprint}")
+    Raises:
+        DaemonError: if there was an error starting the tmate-ssh-server docker process.
+    """
+    _write_service_file(address, name, image, restart_policy or state.RestartPolicy())
+    timeline = timeline if timeline else timing.Timeline(name="start-daemon")
+    manager = systemd_bus.manager()
+    try:
+        with timeline.stage("daemon-reload"):
+            _remove_legacy_service(manager)
+            manager.daemon_reload()
+        # Starting an active worker is a no-op without a container start event, so only the
+        # containers not running yet are waited for.
+        stopped = [
+            worker_container_name(name, port)
+            for port in ports
+            if not check_docker_container(worker_container_name(name, port))
+        ]
+        # Subscribe before starting so that the wait returns as soon as the containers are up,
+        # instead of polling for them.
+        events = (
+            _watch_container_start(stopped, timeout=CONTAINER_START_TIMEOUT) if stopped else None
+        )
+        try:
+            with timeline.stage("service-start"):
+                for port in ports:
+                    manager.service_enable(_service_name(port))
+                    manager.service_start(_service_name(port))
+            if events:
+                with timeline.stage("wait-container"):
+                    _wait_for_container_start(
+                        events, count=len(stopped), timeout=CONTAINER_START_TIMEOUT
+                    )
+        finally:
+            if events:
+                events.terminate()
+                events.wait()
+        # systemctl start returns once the start job completed, so the services are checked
+        # right away and only polled if they are not active yet.
+        with timeline.stage("wait-service"):
+            _wait_for(
+                partial(status, ports),
+                timeout=60 * 10,
+                ready=lambda statuses: all(daemon.running for daemon in statuses.values()),
+            )
+        with timeline.stage("wait-ssh"):
+            for port in ports:
+                _wait_for(partial(probe_ssh_banner, address, port), timeout=SSH_READY_TIMEOUT)
+    except systemd.SystemdError as exc:
+        raise DaemonError("Failed to start tmate-ssh-server daemon.") from exc
+    except TimeoutError as exc:
+        raise DaemonError("Timed out waiting for tmate service to start.") from exc
 
 
-def generate_tmate_conf(host: str) -> str:
+def generate_tmate_conf(
+    host: str, fingerprints: typing.Optional[host_keys.Fingerprints] = None
+) -> str:
     """Generate the .tmate.conf values from generated keys.
 
+    tmate clients connect to a single port, the port of the first worker. The ports of all the
+    workers are published over the debug-ssh integration.
+
     Args:
         host: The host IP address.
+        fingerprints: The public key fingerprints, read from the generated keys if not given.
 
     Raises:
         FingerprintError: if there was an error generating fingerprints from public keys.
@@ -326,26 +607,68 @@ def generate_tmate_conf(host: str) -> str:
     Returns:
         The tmate config file contents.
     """
+    if not fingerprints:
+        try:
+            fingerprints = host_keys.get_fingerprints()
+        except (host_keys.IncompleteInitError, host_keys.KeyInstallError) as exc:
+            raise FingerprintError("Error generating fingerprints.") from exc
+
+    lines = [f"set -g tmate-server-host {host}", f"set -g tmate-server-port {PORT}"]
+    for algorithm in state.HOST_KEY_ALGORITHMS:
+        if fingerprint := getattr(fingerprints, algorithm):
+            lines.append(f"set -g tmate-server-{algorithm}-fingerprint {fingerprint}")
+    return "\n" + "\n".join(lines) + "\n"
+
+
+def reset_failed(ports: typing.Sequence[int] = (PORT,)) -> None:
+    """Reset the failed state of tmate-ssh-server workers, including their start limit.
+
+    Args:
+        ports: The ports of the workers.
+
+    Raises:
+        DaemonError: if the failed state could not be reset.
+    """
+    manager = systemd_bus.manager()
     try:
-        fingerprints = get_fingerprints()
-    except (IncompleteInitError, KeyInstallError) as exc:
-        raise FingerprintError("Error generating fingerprints.") from exc
+        for port in ports:
+            manager.service_reset_failed(_service_name(port))
+    except systemd.SystemdError as exc:
+        raise DaemonError("Failed to reset tmate-ssh-server failed state.") from exc
 
-    return textwrap.dedent(f"""
-        set -g tmate-server-host {host}
-        set -g tmate-server-port {PORT}
-        set -g tmate-server-rsa-fingerprint {fingerprints.rsa}
-        set -g tmate-server-ed25519-fingerprint {fingerprints.ed25519}
-        """)
 
+def stop_daemon(ports: typing.Sequence[int] = (PORT,)) -> None:
+    """Stop tmate-ssh-server workers.
 
-def remove_stopped_containers() -> None:
-    """Remove all stopped containers.
+    systemd stops the containers with SIGTERM, letting tmate-ssh-server shut down its sessions.
+
+    Args:
+        ports: The ports of the workers.
 
     Raises:
-        DockerError: if there was an error removing stopped containers.
+        DaemonError: if the daemon failed to stop.
     """
+    manager = systemd_bus.manager()
     try:
-        subprocess.check_call(["docker", "container", "prune", "-f"])  # nosec
-    except subprocess.CalledProcessError as exc:
-        raise DockerError("Failed to remove stopped containers.") from exc
+        for port in ports:
+            manager.service_stop(_service_name(port))
+    except systemd.SystemdError as exc:
+        raise DaemonError("Failed to stop tmate-ssh-server daemon.") from exc
+
+
+def remove_workers(ports: typing.Sequence[int]) -> None:
+    """Stop and disable tmate-ssh-server workers, so that they do not start on boot.
+
+    Args:
+        ports: The ports of the workers.
+
+    Raises:
+        DaemonError: if the workers failed to stop or to be disabled.
+    """
+    manager = systemd_bus.manager()
+    try:
+        for port in ports:
+            manager.service_stop(_service_name(port))
+            manager.service_disable(_service_name(port))
+    except systemd.SystemdError as exc:
+        raise DaemonError(f"Failed to remove tmate-ssh-server workers {list(ports)}.") from exc
@@ -3,14 +3,35 @@
 
 """Fixtures for tmate-ssh-server-operator charm unit tests."""
 
+from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
 from ops.testing import Harness
 
+import docker_api
+import host_keys
+import systemd_bus
 import tmate
 from charm import TmateSSHServerOperatorCharm
-from tmate import Fingerprints
+from host_keys import Fingerprints
+
+
+@pytest.fixture(autouse=True, name="service_manager")
+def service_manager_fixture(monkeypatch: pytest.MonkeyPatch) -> systemd_bus.SystemctlManager:
+    """Control the services with systemctl, the unit tests do not connect to the system bus."""
+    service_manager = systemd_bus.SystemctlManager()
+    monkeypatch.setattr(systemd_bus, "manager", lambda: service_manager)
+    return service_manager
+
+
+@pytest.fixture(autouse=True, name="docker_client")
+def docker_client_fixture(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    """Query a docker daemon without containers, the unit tests do not connect to docker."""
+    client_mock = MagicMock(spec=docker_api.DockerClient)
+    client_mock.container.return_value = None
+    monkeypatch.setattr(tmate, "DOCKER_CLIENT", client_mock)
+    return client_mock
 
 
 @pytest.fixture(scope="function", name="harness")
@@ -39,9 +60,21 @@ def fingerprints_fixture():
 
 @pytest.fixture(scope="function", name="patch_get_fingerprints")
 def patch_get_fingerprints_fixture(monkeypatch: pytest.MonkeyPatch, fingerprints: Fingerprints):
-    """Monkeypatch get_fingerprints function."""
+    """Monkeypatch get_fingerprints function and the identity of the key files."""
     monkeypatch.setattr(
-        tmate,
+        host_keys,
         "get_fingerprints",
-        MagicMock(spec=tmate.get_fingerprints, return_value=fingerprints),
+        MagicMock(spec=host_keys.get_fingerprints, return_value=fingerprints),
     )
+    monkeypatch.setattr(
+        host_keys, "key_files_id", MagicMock(spec=host_keys.key_files_id, return_value="key-files")
+    )
+
+
+@pytest.fixture(scope="function", name="keys_dir")
+def keys_dir_fixture(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    """Monkeypatch the host key paths into a temporary directory."""
+    keys_dir = tmp_path / "keys"
+    monkeypatch.setattr(host_keys, "KEYS_DIR", keys_dir)
+    monkeypatch.setattr(host_keys, "STAGED_KEYS_DIR", tmp_path / "staged-keys")
+    return keys_dir
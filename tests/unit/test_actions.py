@@ -3,11 +3,14 @@
 
 """tmate-ssh-server charm actions unit tests."""
 
+import json
 from unittest.mock import MagicMock
 
 import ops
 import pytest
 
+import host_keys
+import timing
 import tmate
 from charm import TmateSSHServerOperatorCharm
 
@@ -37,14 +40,14 @@ def test_on_get_server_config_error(
     charm: TmateSSHServerOperatorCharm,
 ):
     """
-    arrange: given a monkeypatched tmate.generate_tmate_conf that raises an exception.
+    arrange: given a monkeypatched host_keys.key_files_id that raises an exception.
     act: when on_get_server_config is called.
     assert: the event is failed.
     """
     monkeypatch.setattr(
-        tmate,
-        "generate_tmate_conf",
-        MagicMock(spec=tmate.generate_tmate_conf, side_effect=[tmate.FingerprintError]),
+        host_keys,
+        "key_files_id",
+        MagicMock(spec=host_keys.key_files_id, side_effect=[host_keys.IncompleteInitError]),
     )
 
     mock_event = MagicMock(spec=ops.ActionEvent)
@@ -53,22 +56,41 @@ def test_on_get_server_config_error(
     mock_event.fail.assert_called_once()
 
 
+@pytest.mark.usefixtures("patch_get_fingerprints")
 def test_on_get_server_config(
-    monkeypatch: pytest.MonkeyPatch,
     charm: TmateSSHServerOperatorCharm,
+    fingerprints: host_keys.Fingerprints,
 ):
     """
-    arrange: given a monkeypatched tmate.generate_tmate_conf that returns a tmate config.
+    arrange: given a monkeypatched host_keys.get_fingerprints that returns fingerprints.
     act: when on_get_server_config is called.
     assert: the event returns the tmate configuration values.
     """
-    monkeypatch.setattr(
-        tmate,
-        "generate_tmate_conf",
-        MagicMock(spec=tmate.generate_tmate_conf, return_value=(value := "test_config_value")),
+    mock_event = MagicMock(spec=ops.ActionEvent)
+    charm.actions.on_get_server_config(mock_event)
+
+    mock_event.set_results.assert_called_once_with(
+        {
+            "tmate-config": tmate.generate_tmate_conf(
+                str(charm.state.ip_addr), fingerprints=fingerprints
+            )
+        }
     )
 
+
+def test_on_get_timings(charm: TmateSSHServerOperatorCharm):
+    """
+    arrange: given a recorded timeline.
+    act: when on_get_timings is called.
+    assert: the event returns the recorded timelines as JSON.
+    """
+    timeline = timing.Timeline(name="install")
+    with timeline.stage("dependencies"):
+        pass
+    charm.timings.record(timeline)
+
     mock_event = MagicMock(spec=ops.ActionEvent)
-    charm.actions.on_get_server_config(mock_event)
+    charm.actions.on_get_timings(mock_event)
 
-    mock_event.set_results.assert_called_once_with({"tmate-config": value})
+    results = mock_event.set_results.call_args.args[0]
+    assert json.loads(results["timelines"]) == [timeline.to_dict()]
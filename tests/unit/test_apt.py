@@ -0,0 +1,520 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm vendored apt library unit tests."""
+
+import os
+import subprocess
+import time
+import typing
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from charms.operator_libs_linux.v0 import apt
+
+# Need access to protected functions for testing
+# pylint: disable=protected-access
+
+# dpkg-query --show --showformat='${Package}\t${Architecture}\t${Version}\t${db:Status-Abbrev}\n'
+DPKG_BASH = "bash\tamd64\t5.2.15-2+b9\tii \n"
+DPKG_LIBC6 = "libc6\tamd64\t2.36-9+deb12u13\tii \n"
+DPKG_LIBC6_I386 = "libc6\ti386\t2.35-0ubuntu3.8\tii \n"
+DPKG_OPENSSH_CLIENT = "openssh-client\tamd64\t1:8.9p1-3ubuntu0.10\tii \n"
+DPKG_TMATE_REMOVED = "tmate\tamd64\t2.4.0-2\trc \n"
+DPKG_TZDATA = "tzdata\tall\t2024a-0ubuntu0.22.04\tii \n"
+
+# dpkg -l bash
+DPKG_LIST_BASH = """Desired=Unknown/Install/Remove/Purge/Hold
+| Status=Not/Inst/Conf-files/Unpacked/halF-conf/Half-inst/trig-aWait/Trig-pend
+|/ Err?=(none)/Reinst-required (Status,Err: uppercase=bad)
+||/ Name           Version      Architecture Description
++++-==============-============-============-=================================
+ii  bash           5.2.15-2+b9  amd64        GNU Bourne Again SHell
+"""
+
+# apt-cache policy <packages>, unknown packages are left out of the output.
+POLICY_BASH = """bash:
+  Installed: 5.2.15-2+b9
+  Candidate: 5.2.15-2+b9
+  Version table:
+ *** 5.2.15-2+b9 100
+        100 /var/lib/dpkg/status
+"""
+POLICY_DOCKER_IO = """docker.io:
+  Installed: (none)
+  Candidate: 24.0.7-0ubuntu2~22.04.1
+  Version table:
+     24.0.7-0ubuntu2~22.04.1 500
+        500 http://archive.ubuntu.com/ubuntu jammy-updates/universe amd64 Packages
+        500 http://security.ubuntu.com/ubuntu jammy-security/universe amd64 Packages
+     20.10.12-0ubuntu4 500
+        500 http://archive.ubuntu.com/ubuntu jammy/universe amd64 Packages
+"""
+POLICY_OPENSSH_CLIENT_PINNED = """openssh-client:
+  Installed: 1:8.9p1-3ubuntu0.10
+  Candidate: 1:8.9p1-3
+  Version table:
+ *** 1:8.9p1-3ubuntu0.10 500
+        500 http://archive.ubuntu.com/ubuntu jammy-updates/main amd64 Packages
+        100 /var/lib/dpkg/status
+     1:8.9p1-3 1001
+        500 http://archive.ubuntu.com/ubuntu jammy/main amd64 Packages
+"""
+POLICY_MAIL_TRANSPORT_AGENT = """mail-transport-agent:
+  Installed: (none)
+  Candidate: (none)
+  Version table:
+"""
+# The architecture qualifier is dropped for the packages of the system architecture.
+POLICY_LIBC6 = """libc6:
+  Installed: 2.36-9+deb12u13
+  Candidate: 2.36-9+deb12u13
+  Version table:
+ *** 2.36-9+deb12u13 100
+        100 /var/lib/dpkg/status
+"""
+POLICY_LIBC6_I386 = """libc6:i386:
+  Installed: (none)
+  Candidate: 2.35-0ubuntu3.8
+  Version table:
+     2.35-0ubuntu3.8 500
+        500 http://archive.ubuntu.com/ubuntu jammy-updates/main i386 Packages
+"""
+
+
+@pytest.fixture(autouse=True, name="lookup_cache")
+def lookup_cache_fixture(monkeypatch: pytest.MonkeyPatch) -> apt._LookupCache:
+    """Start each test with an empty lookup memo on an amd64 system."""
+    lookup_cache = apt._LookupCache()
+    lookup_cache._arch = "amd64"
+    monkeypatch.setattr(apt, "_lookup_cache", lookup_cache)
+    return lookup_cache
+
+
+def _dpkg_query(stdout: str, returncode: int = 0) -> MagicMock:
+    """Build a monkeypatched subprocess.run running dpkg-query.
+
+    Args:
+        stdout: The output of dpkg-query.
+        returncode: The exit code of dpkg-query, 1 if some packages are unknown.
+
+    Returns:
+        The subprocess.run mock.
+    """
+    return MagicMock(
+        spec=subprocess.run,
+        return_value=subprocess.CompletedProcess(
+            args=["dpkg-query"], returncode=returncode, stdout=stdout, stderr=""
+        ),
+    )
+
+
+def _summary(packages: typing.Mapping[str, apt.DebianPackage]) -> dict[str, tuple[str, str, str]]:
+    """Summarize the located packages.
+
+    Args:
+        packages: The located packages by requested name.
+
+    Returns:
+        The name, full version and state of the located packages by requested name.
+    """
+    return {
+        requested: (package.name, package.fullversion, package.state.value)
+        for requested, package in packages.items()
+    }
+
+
+@pytest.mark.parametrize(
+    "packages, stdout, returncode, expected",
+    [
+        pytest.param(
+            ["bash"],
+            DPKG_BASH,
+            0,
+            {"bash": ("bash", "5.2.15-2+b9.amd64", "present")},
+            id="installed",
+        ),
+        pytest.param(
+            ["bash", "missing"],
+            DPKG_BASH,
+            1,
+            {"bash": ("bash", "5.2.15-2+b9.amd64", "present")},
+            id="missing package",
+        ),
+        pytest.param(["tmate"], DPKG_TMATE_REMOVED, 0, {}, id="removed package"),
+        pytest.param(
+            ["openssh-client"],
+            DPKG_OPENSSH_CLIENT,
+            0,
+            {"openssh-client": ("openssh-client", "1:8.9p1-3ubuntu0.10.amd64", "present")},
+            id="epoch",
+        ),
+        pytest.param(
+            ["tzdata"],
+            DPKG_TZDATA,
+            0,
+            {"tzdata": ("tzdata", "2024a-0ubuntu0.22.04.all", "present")},
+            id="architecture independent",
+        ),
+        pytest.param(
+            ["libc6:amd64"],
+            DPKG_LIBC6,
+            0,
+            {"libc6:amd64": ("libc6:amd64", "2.36-9+deb12u13.amd64", "present")},
+            id="arch-qualified",
+        ),
+        pytest.param(
+            ["libc6", "libc6:i386"],
+            DPKG_LIBC6 + DPKG_LIBC6_I386,
+            0,
+            {
+                "libc6": ("libc6", "2.36-9+deb12u13.amd64", "present"),
+                "libc6:i386": ("libc6:i386", "2.35-0ubuntu3.8.i386", "present"),
+            },
+            id="foreign architecture",
+        ),
+        pytest.param(["libc6"], DPKG_LIBC6_I386, 0, {}, id="foreign architecture only"),
+        pytest.param(
+            ["bash"],
+            "bash\tamd64\n" + DPKG_BASH,
+            0,
+            {"bash": ("bash", "5.2.15-2+b9.amd64", "present")},
+            id="unparsable line",
+        ),
+    ],
+)
+def test_from_installed_packages(
+    monkeypatch: pytest.MonkeyPatch,
+    packages: list[str],
+    stdout: str,
+    returncode: int,
+    expected: dict[str, tuple[str, str, str]],
+):
+    """
+    arrange: given the dpkg-query output of the installed packages.
+    act: when from_installed_packages is called.
+    assert: the installed packages are returned by requested name, in a single dpkg-query call.
+    """
+    run_mock = _dpkg_query(stdout, returncode)
+    monkeypatch.setattr(apt.subprocess, "run", run_mock)
+
+    assert _summary(apt.DebianPackage.from_installed_packages(packages)) == expected
+    run_mock.assert_called_once()
+    assert run_mock.call_args.args[0][3:] == packages
+
+
+def test_from_installed_packages_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a dpkg-query call failing for another reason than unknown packages.
+    act: when from_installed_packages is called.
+    assert: PackageError is raised.
+    """
+    monkeypatch.setattr(apt.subprocess, "run", _dpkg_query("", returncode=2))
+
+    with pytest.raises(apt.PackageError):
+        apt.DebianPackage.from_installed_packages(["bash"])
+
+
+@pytest.mark.parametrize(
+    "packages, output, expected",
+    [
+        pytest.param(["missing"], "", {}, id="missing package"),
+        pytest.param(
+            ["docker.io"],
+            POLICY_DOCKER_IO,
+            {"docker.io": ("docker.io", "24.0.7-0ubuntu2~22.04.1.amd64", "available")},
+            id="multiple versions",
+        ),
+        pytest.param(
+            ["openssh-client"],
+            POLICY_OPENSSH_CLIENT_PINNED,
+            {"openssh-client": ("openssh-client", "1:8.9p1-3.amd64", "available")},
+            id="pinned version",
+        ),
+        pytest.param(["mail-transport-agent"], POLICY_MAIL_TRANSPORT_AGENT, {}, id="virtual"),
+        pytest.param(
+            ["libc6:amd64"],
+            POLICY_LIBC6,
+            {"libc6:amd64": ("libc6:amd64", "2.36-9+deb12u13.amd64", "available")},
+            id="arch-qualified",
+        ),
+        pytest.param(
+            ["libc6:i386"],
+            POLICY_LIBC6_I386,
+            {"libc6:i386": ("libc6:i386", "2.35-0ubuntu3.8.i386", "available")},
+            id="foreign architecture",
+        ),
+        pytest.param(
+            ["bash", "docker.io", "missing", "mail-transport-agent"],
+            POLICY_BASH + POLICY_DOCKER_IO + POLICY_MAIL_TRANSPORT_AGENT,
+            {
+                "bash": ("bash", "5.2.15-2+b9.amd64", "available"),
+                "docker.io": ("docker.io", "24.0.7-0ubuntu2~22.04.1.amd64", "available"),
+            },
+            id="several packages",
+        ),
+    ],
+)
+def test_from_apt_cache_policy(
+    monkeypatch: pytest.MonkeyPatch,
+    packages: list[str],
+    output: str,
+    expected: dict[str, tuple[str, str, str]],
+):
+    """
+    arrange: given the apt-cache policy output of the packages.
+    act: when from_apt_cache_policy is called.
+    assert: the packages with an installation candidate are returned by requested name.
+    """
+    check_output_mock = MagicMock(spec=subprocess.check_output, return_value=output)
+    monkeypatch.setattr(apt, "check_output", check_output_mock)
+
+    assert _summary(apt.DebianPackage.from_apt_cache_policy(packages)) == expected
+    check_output_mock.assert_called_once()
+    assert check_output_mock.call_args.args[0] == ["apt-cache", "policy", *packages]
+
+
+def test_from_apt_cache_policy_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a failing apt-cache policy call.
+    act: when from_apt_cache_policy is called.
+    assert: PackageError is raised.
+    """
+    monkeypatch.setattr(
+        apt,
+        "check_output",
+        MagicMock(
+            spec=subprocess.check_output,
+            side_effect=subprocess.CalledProcessError(100, "apt-cache", stderr="E: failed"),
+        ),
+    )
+
+    with pytest.raises(apt.PackageError, match="E: failed"):
+        apt.DebianPackage.from_apt_cache_policy(["bash"])
+
+
+def test_from_system_bulk(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given an installed package, a package known to apt and a missing package.
+    act: when from_system_bulk is called.
+    assert: only the packages not installed are looked up in the apt cache and the missing
+        package is left out.
+    """
+    monkeypatch.setattr(apt.subprocess, "run", _dpkg_query(DPKG_BASH, returncode=1))
+    check_output_mock = MagicMock(spec=subprocess.check_output, return_value=POLICY_DOCKER_IO)
+    monkeypatch.setattr(apt, "check_output", check_output_mock)
+
+    packages = apt.DebianPackage.from_system_bulk(["bash", "docker.io", "missing"])
+
+    assert _summary(packages) == {
+        "bash": ("bash", "5.2.15-2+b9.amd64", "present"),
+        "docker.io": ("docker.io", "24.0.7-0ubuntu2~22.04.1.amd64", "available"),
+    }
+    assert check_output_mock.call_args.args[0] == ["apt-cache", "policy", "docker.io", "missing"]
+
+
+def test_from_system_bulk_all_installed(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given installed packages.
+    act: when from_system_bulk is called.
+    assert: the apt cache is not queried.
+    """
+    monkeypatch.setattr(apt.subprocess, "run", _dpkg_query(DPKG_BASH + DPKG_LIBC6))
+    check_output_mock = MagicMock(spec=subprocess.check_output)
+    monkeypatch.setattr(apt, "check_output", check_output_mock)
+
+    packages = apt.DebianPackage.from_system_bulk(["bash", "libc6"])
+
+    assert list(packages) == ["bash", "libc6"]
+    check_output_mock.assert_not_called()
+
+
+def _system(run_calls: list[list[str]], lookups: list[str]) -> tuple[MagicMock, MagicMock]:
+    """Build a monkeypatched system with bash installed, recording the commands run.
+
+    Args:
+        run_calls: The list to record the commands run with subprocess.run in.
+        lookups: The list to record the packages looked up with dpkg -l in.
+
+    Returns:
+        The subprocess.run and check_output mocks.
+    """
+
+    def run(cmd: list[str], **_: typing.Any) -> subprocess.CompletedProcess:
+        run_calls.append(cmd)
+        stdout = DPKG_BASH if cmd[0] == "dpkg-query" else ""
+        return subprocess.CompletedProcess(args=cmd, returncode=0, stdout=stdout, stderr="")
+
+    def check_output(cmd: list[str], **_: typing.Any) -> str:
+        lookups.append(cmd[-1])
+        if cmd[-1] != "bash":
+            raise subprocess.CalledProcessError(1, cmd)
+        return DPKG_LIST_BASH
+
+    return (
+        MagicMock(spec=subprocess.run, side_effect=run),
+        MagicMock(spec=subprocess.check_output, side_effect=check_output),
+    )
+
+
+def _lookup() -> None:
+    """Look up an installed package in bulk, then alone from the bulk memo, and a missing one."""
+    apt.DebianPackage.from_installed_packages(["bash"])
+    apt.DebianPackage.from_installed_package("bash")
+    with pytest.raises(apt.PackageNotFoundError):
+        apt.DebianPackage.from_installed_package("missing")
+
+
+@pytest.mark.parametrize(
+    "operation",
+    [
+        pytest.param(
+            lambda: apt._install(
+                [apt.DebianPackage("docker.io", "24.0.7", "", "amd64", apt.PackageState.Available)]
+            ),
+            id="install",
+        ),
+        pytest.param(lambda: apt.remove_package("bash"), id="remove"),
+        pytest.param(apt.update, id="update"),
+    ],
+)
+def test_lookup_cache_invalidated(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, operation: typing.Callable[[], typing.Any]
+):
+    """
+    arrange: given memoized package lookups, including a package that was not found.
+    act: when packages are installed or removed, or the apt cache is updated.
+    assert: the lookups are memoized until then, and queried again afterwards.
+    """
+    monkeypatch.setattr(apt, "APT_LISTS_PATH", str(tmp_path))
+    run_calls: list[list[str]] = []
+    lookups: list[str] = []
+    run_mock, check_output_mock = _system(run_calls, lookups)
+    monkeypatch.setattr(apt.subprocess, "run", run_mock)
+    monkeypatch.setattr(apt, "check_output", check_output_mock)
+    _lookup()
+    _lookup()
+    assert [cmd[0] for cmd in run_calls] == ["dpkg-query"]
+    assert lookups == ["missing"]
+
+    operation()
+    _lookup()
+
+    assert [cmd[0] for cmd in run_calls].count("dpkg-query") == 2
+    assert run_calls[-1][0] == "dpkg-query"
+    assert lookups == ["missing", "missing"]
+
+
+def test_lookup_memo_not_found(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a package that is not installed.
+    act: when the package is looked up twice.
+    assert: the miss is memoized and each lookup raises a new PackageNotFoundError.
+    """
+    lookups: list[str] = []
+    _, check_output_mock = _system([], lookups)
+    monkeypatch.setattr(apt, "check_output", check_output_mock)
+
+    with pytest.raises(apt.PackageNotFoundError) as first:
+        apt.DebianPackage.from_installed_package("missing")
+    with pytest.raises(apt.PackageNotFoundError) as second:
+        apt.DebianPackage.from_installed_package("missing")
+
+    assert lookups == ["missing"]
+    assert second.value is not first.value
+    assert second.value.message == first.value.message
+
+
+def test_lookup_memo_package_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given an apt-cache call that fails.
+    act: when the package is looked up in the apt cache twice.
+    assert: the error is not memoized and the apt cache is queried again.
+    """
+    check_output_mock = MagicMock(
+        spec=subprocess.check_output,
+        side_effect=subprocess.CalledProcessError(100, "apt-cache", stderr="E: lock"),
+    )
+    monkeypatch.setattr(apt, "check_output", check_output_mock)
+
+    for _ in range(2):
+        with pytest.raises(apt.PackageError):
+            apt.DebianPackage.from_apt_cache("docker.io")
+
+    assert check_output_mock.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "age, max_age, force, updated",
+    [
+        pytest.param(60, None, False, True, id="no max age"),
+        pytest.param(60, 3600, False, False, id="fresh"),
+        pytest.param(7200, 3600, False, True, id="stale"),
+        pytest.param(60, 3600, True, True, id="forced"),
+    ],
+)
+def test_update(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    lookup_cache: apt._LookupCache,
+    age: int,
+    max_age: typing.Optional[int],
+    force: bool,
+    updated: bool,
+):
+    """
+    arrange: given package lists refreshed some time ago and a memoized package lookup.
+    act: when update is called with a max age, or forced.
+    assert: the apt cache is updated and the memo dropped only if the lists are older than the
+        max age or the update is forced, and the refresh time of the lists is recorded.
+    """
+    monkeypatch.setattr(apt, "APT_LISTS_PATH", str(tmp_path))
+    refreshed_at = time.time() - age
+    os.utime(tmp_path, (refreshed_at, refreshed_at))
+    run_mock = MagicMock(spec=subprocess.run)
+    monkeypatch.setattr(apt.subprocess, "run", run_mock)
+    lookup_cache.packages[("installed", "bash", "", "amd64")] = apt.PackageNotFoundError("bash")
+
+    assert apt.update(max_age=max_age, force=force) == updated
+
+    assert run_mock.called == updated
+    if updated:
+        run_mock.assert_called_once_with(["apt-get", "update"], capture_output=True, check=True)
+    assert bool(lookup_cache.packages) != updated
+    lists_age = apt._lists_age()
+    assert lists_age is not None
+    assert (lists_age < age) == updated
+
+
+def test_update_lists_missing(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """
+    arrange: given a missing package lists directory.
+    act: when update is called with a max age.
+    assert: the apt cache is updated, without recording the refresh time.
+    """
+    monkeypatch.setattr(apt, "APT_LISTS_PATH", str(tmp_path / "missing"))
+    run_mock = MagicMock(spec=subprocess.run)
+    monkeypatch.setattr(apt.subprocess, "run", run_mock)
+
+    assert apt.update(max_age=3600)
+
+    run_mock.assert_called_once()
+    assert apt._lists_age() is None
+
+
+def test_update_error(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """
+    arrange: given a failing apt-get update.
+    act: when update is called.
+    assert: CalledProcessError is raised.
+    """
+    monkeypatch.setattr(apt, "APT_LISTS_PATH", str(tmp_path))
+    monkeypatch.setattr(
+        apt.subprocess,
+        "run",
+        MagicMock(spec=subprocess.run, side_effect=subprocess.CalledProcessError(100, "apt-get")),
+    )
+
+    with pytest.raises(subprocess.CalledProcessError):
+        apt.update(force=True)
@@ -7,15 +7,37 @@ from unittest.mock import MagicMock
 
 import ops
 import pytest
+from ops.testing import Harness
 
+import docker_api
+import host_keys
+import prerequisites
 import tmate
 from charm import TmateSSHServerOperatorCharm
-from state import State
+from daemon_status import DaemonStatus
+from state import (
+    DEBUG_SSH_INTEGRATION_NAME,
+    DEPENDENCY_BUNDLE_RESOURCE_NAME,
+    IMAGE_RESOURCE_NAME,
+    HostKeyConfig,
+    State,
+)
 
 # Need access to protected functions for testing
 # pylint: disable=protected-access
 
 
+@pytest.fixture(autouse=True, name="preflight")
+def preflight_fixture(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    """Monkeypatch the preflight probe to report no satisfied prerequisites."""
+    preflight_mock = MagicMock(
+        spec=prerequisites.preflight,
+        return_value=prerequisites.Preflight(dependencies=False, image=None),
+    )
+    monkeypatch.setattr(prerequisites, "preflight", preflight_mock)
+    return preflight_mock
+
+
 def test__on_install_dependencies_error(
     monkeypatch: pytest.MonkeyPatch,
     charm: TmateSSHServerOperatorCharm,
@@ -26,12 +48,16 @@ def test__on_install_dependencies_error(
     assert: exceptions are re-raised.
     """
     mock_install_deps = MagicMock(
-        spec=tmate.install_dependencies, side_effect=[tmate.DependencySetupError]
+        spec=prerequisites.install_dependencies, side_effect=[prerequisites.DependencySetupError]
     )
-    monkeypatch.setattr(tmate, "install_dependencies", mock_install_deps)
+    monkeypatch.setattr(prerequisites, "install_dependencies", mock_install_deps)
+    monkeypatch.setattr(host_keys, "install_keys", MagicMock(spec=host_keys.install_keys))
+    pull_image_mock = MagicMock(spec=prerequisites.pull_image, return_value=prerequisites.IMAGE)
+    monkeypatch.setattr(prerequisites, "pull_image", pull_image_mock)
 
-    with pytest.raises(tmate.DependencySetupError):
+    with pytest.raises(prerequisites.DependencySetupError):
         charm._on_install(MagicMock(spec=ops.InstallEvent))
+    pull_image_mock.assert_not_called()
 
 
 def test__on_install_keys_error(
@@ -43,13 +69,23 @@ def test__on_install_keys_error(
     act: when _on_install is called.
     assert: exceptions are re-raised.
     """
-    mock_install_deps = MagicMock(spec=tmate.install_dependencies)
-    monkeypatch.setattr(tmate, "install_dependencies", mock_install_deps)
-    mock_install_deps = MagicMock(spec=tmate.install_keys, side_effect=[tmate.KeyInstallError])
-    monkeypatch.setattr(tmate, "install_keys", mock_install_deps)
+    mock_install_deps = MagicMock(spec=prerequisites.install_dependencies)
+    monkeypatch.setattr(prerequisites, "install_dependencies", mock_install_deps)
+    mock_install_deps = MagicMock(
+        spec=host_keys.install_keys, side_effect=[host_keys.KeyInstallError]
+    )
+    monkeypatch.setattr(host_keys, "install_keys", mock_install_deps)
+    monkeypatch.setattr(
+        prerequisites,
+        "pull_image",
+        MagicMock(spec=prerequisites.pull_image, return_value=prerequisites.IMAGE),
+    )
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
 
-    with pytest.raises(tmate.KeyInstallError):
+    with pytest.raises(host_keys.KeyInstallError):
         charm._on_install(MagicMock(spec=ops.InstallEvent))
+    start_daemon_mock.assert_not_called()
 
 
 def test__on_install_daemon_error(
@@ -61,10 +97,15 @@ def test__on_install_daemon_error(
     act: when _on_install is called.
     assert: exceptions are re-raised.
     """
-    mock_install_deps = MagicMock(spec=tmate.install_dependencies)
-    monkeypatch.setattr(tmate, "install_dependencies", mock_install_deps)
-    mock_install_keys = MagicMock(spec=tmate.install_keys)
-    monkeypatch.setattr(tmate, "install_keys", mock_install_keys)
+    mock_install_deps = MagicMock(spec=prerequisites.install_dependencies)
+    monkeypatch.setattr(prerequisites, "install_dependencies", mock_install_deps)
+    mock_install_keys = MagicMock(spec=host_keys.install_keys)
+    monkeypatch.setattr(host_keys, "install_keys", mock_install_keys)
+    monkeypatch.setattr(
+        prerequisites,
+        "pull_image",
+        MagicMock(spec=prerequisites.pull_image, return_value=prerequisites.IMAGE),
+    )
     mock_install_deps = MagicMock(spec=tmate.start_daemon, side_effect=[tmate.DaemonError])
     monkeypatch.setattr(tmate, "start_daemon", mock_install_deps)
 
@@ -81,8 +122,8 @@ def test__on_install_defer(
     act: when _on_install is called.
     assert: the event is deferred.
     """
-    mock_install_deps = MagicMock(spec=tmate.install_dependencies)
-    monkeypatch.setattr(tmate, "install_dependencies", mock_install_deps)
+    mock_install_deps = MagicMock(spec=prerequisites.install_dependencies)
+    monkeypatch.setattr(prerequisites, "install_dependencies", mock_install_deps)
     mock_state = MagicMock(spec=State)
     mock_state.ip_addr = None
     monkeypatch.setattr(charm, "state", mock_state)
@@ -98,23 +139,29 @@ def test__on_install_error(
     charm: TmateSSHServerOperatorCharm,
 ):
     """
-    arrange: given a monkeypatched tmate.get_fingerprints that raises an error.
+    arrange: given a monkeypatched host_keys.get_fingerprints that raises an error.
     act: when _on_install is called.
     assert: the charm raises an error.
     """
-    mock_install_deps = MagicMock(spec=tmate.install_dependencies)
-    monkeypatch.setattr(tmate, "install_dependencies", mock_install_deps)
-    monkeypatch.setattr(tmate, "install_keys", MagicMock())
+    mock_install_deps = MagicMock(spec=prerequisites.install_dependencies)
+    monkeypatch.setattr(prerequisites, "install_dependencies", mock_install_deps)
+    monkeypatch.setattr(host_keys, "install_keys", MagicMock())
     monkeypatch.setattr(tmate, "start_daemon", MagicMock())
     monkeypatch.setattr(
-        tmate, "get_fingerprints", MagicMock(side_effect=[tmate.IncompleteInitError])
+        prerequisites,
+        "pull_image",
+        MagicMock(spec=prerequisites.pull_image, return_value=prerequisites.IMAGE),
+    )
+    monkeypatch.setattr(
+        host_keys, "get_fingerprints", MagicMock(side_effect=[host_keys.IncompleteInitError])
     )
 
     mock_event = MagicMock(spec=ops.InstallEvent)
-    with pytest.raises(tmate.IncompleteInitError):
+    with pytest.raises(host_keys.IncompleteInitError):
         charm._on_install(mock_event)
 
 
+@pytest.mark.usefixtures("patch_get_fingerprints")
 def test__on_install(
     monkeypatch: pytest.MonkeyPatch,
     charm: TmateSSHServerOperatorCharm,
@@ -124,10 +171,16 @@ def test__on_install(
     act: when _on_install is called.
     assert: the unit is in active status and tmate ssh server port is opened.
     """
-    monkeypatch.setattr(tmate, "install_dependencies", MagicMock(spec=tmate.install_dependencies))
-    monkeypatch.setattr(tmate, "install_keys", MagicMock(spec=tmate.install_keys))
+    monkeypatch.setattr(
+        prerequisites, "install_dependencies", MagicMock(spec=prerequisites.install_dependencies)
+    )
+    monkeypatch.setattr(host_keys, "install_keys", MagicMock(spec=host_keys.install_keys))
+    monkeypatch.setattr(
+        prerequisites,
+        "pull_image",
+        MagicMock(spec=prerequisites.pull_image, return_value=prerequisites.IMAGE),
+    )
     monkeypatch.setattr(tmate, "start_daemon", MagicMock(spec=tmate.start_daemon))
-    monkeypatch.setattr(tmate, "get_fingerprints", MagicMock(spec=tmate.get_fingerprints))
 
     mock_event = MagicMock(spec=ops.InstallEvent)
     charm._on_install(mock_event)
@@ -136,6 +189,20 @@ def test__on_install(
     assert charm.unit.status.name == "active"
 
 
+def _running_container(name: str) -> docker_api.ContainerState:
+    """Build the state of a running tmate-ssh-server worker container.
+
+    Args:
+        name: The name of the container.
+
+    Returns:
+        The container state.
+    """
+    return docker_api.ContainerState(
+        name=name, running=True, health=None, started_at=None, restart_count=0
+    )
+
+
 def test__on_update_status_ip_not_assigned(
     monkeypatch: pytest.MonkeyPatch,
     charm: TmateSSHServerOperatorCharm,
@@ -145,12 +212,10 @@ def test__on_update_status_ip_not_assigned(
     act: when _on_update_status is called.
     assert: the charm returns and calls no other functions.
     """
-    status_mock = MagicMock(return_value=tmate.DaemonStatus(running=True, status=""))
+    status_mock = MagicMock(return_value={tmate.PORT: DaemonStatus(running=True, status="")})
     start_daemon_mock = MagicMock(spec=tmate.start_daemon)
-    remove_stopped_containers_mock = MagicMock(spec=tmate.remove_stopped_containers)
     monkeypatch.setattr(tmate, "status", status_mock)
     monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
-    monkeypatch.setattr(tmate, "remove_stopped_containers", remove_stopped_containers_mock)
 
     mock_state = MagicMock(spec=State)
     mock_state.ip_addr = None
@@ -161,7 +226,6 @@ def test__on_update_status_ip_not_assigned(
 
     status_mock.assert_not_called()
     start_daemon_mock.assert_not_called()
-    remove_stopped_containers_mock.assert_not_called()
 
 
 def test__on_update_status_error(
@@ -186,80 +250,646 @@ def test__on_update_status_error(
         charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
 
     # 2. tmate.is_running returns False for running and start_daemon raises an error
-    status_mock.side_effect = [tmate.DaemonStatus(running=False, status="")]
+    status_mock.side_effect = [{tmate.PORT: DaemonStatus(running=False, status="")}]
     start_daemon_mock.side_effect = tmate.DaemonError
 
     with pytest.raises(tmate.DaemonError):
         charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
 
 
-def test__on_update_status_remove_stopped_containers_error(
+def test__on_update_status_restart_daemon(
     monkeypatch: pytest.MonkeyPatch,
     charm: TmateSSHServerOperatorCharm,
-    caplog: pytest.LogCaptureFixture,
 ):
     """
-    arrange: given a monkeypatched tmate.remove_stopped_containers that raises an exception.
+    arrange: given a monkeypatched tmate.status which returns False for running.
     act: when _on_update_status is called.
-    assert: the exception is caught and logged and re-raised.
+    assert: status is set to active, tmate ssh server is restarted in the container of the unit,
+        with the restart timeline recorded.
     """
-    monkeypatch.setattr(
-        tmate, "status", MagicMock(return_value=tmate.DaemonStatus(running=False, status=""))
-    )
+    status_mock = MagicMock(return_value={tmate.PORT: DaemonStatus(running=False, status="")})
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "status", status_mock)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+
+    charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
+
+    start_daemon_mock.assert_called_once()
+    assert start_daemon_mock.call_args.kwargs["name"] == "tmate-ssh-server-tmate-ssh-server-0"
+    assert charm.unit.status.name == "active"
+    (timeline,) = charm.timings.timelines()
+    assert timeline["name"] == "restart"
+    assert [stage["name"] for stage in timeline["stages"]] == ["start-daemon"]
+
+
+def test__on_update_status_systemd_restarting(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+):
+    """
+    arrange: given a tmate daemon which exited and which systemd is about to restart.
+    act: when _on_update_status is called.
+    assert: the daemon is left for systemd to restart.
+    """
+    daemon_status = {tmate.PORT: DaemonStatus(running=False, status="activating (auto-restart)")}
+    monkeypatch.setattr(tmate, "status", MagicMock(spec=tmate.status, return_value=daemon_status))
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+
+    charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
+
+    start_daemon_mock.assert_not_called()
+    assert charm.unit.status.name == "maintenance"
+
+
+def test__on_update_status_start_limit_hit(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+):
+    """
+    arrange: given a failed tmate daemon which systemd gave up restarting.
+    act: when _on_update_status is called.
+    assert: the failed state of the daemon is reset before it is started again.
+    """
+    daemon_status = {tmate.PORT: DaemonStatus(running=False, status="failed (failed)")}
+    monkeypatch.setattr(tmate, "status", MagicMock(spec=tmate.status, return_value=daemon_status))
+    reset_failed_mock = MagicMock(spec=tmate.reset_failed)
+    monkeypatch.setattr(tmate, "reset_failed", reset_failed_mock)
     monkeypatch.setattr(tmate, "start_daemon", MagicMock(spec=tmate.start_daemon))
+
+    charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
+
+    reset_failed_mock.assert_called_once_with([tmate.PORT])
+    (timeline,) = charm.timings.timelines()
+    assert [stage["name"] for stage in timeline["stages"]] == ["reset-failed", "start-daemon"]
+    assert charm.unit.status.name == "active"
+
+
+def test__on_update_status_not_accepting_connections(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+    docker_client: MagicMock,
+):
+    """
+    arrange: given a running tmate daemon which does not send an SSH banner.
+    act: when _on_update_status is called.
+    assert: tmate ssh server is stopped and started again.
+    """
+    docker_client.container.side_effect = _running_container
+    daemon_status = {tmate.PORT: DaemonStatus(running=True, status="")}
+    monkeypatch.setattr(tmate, "status", MagicMock(spec=tmate.status, return_value=daemon_status))
+    monkeypatch.setattr(tmate, "probe_ssh_banner", MagicMock(return_value=None))
+    stop_daemon_mock = MagicMock(spec=tmate.stop_daemon)
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    for name, mock in (
+        ("stop_daemon", stop_daemon_mock),
+        ("start_daemon", start_daemon_mock),
+    ):
+        monkeypatch.setattr(tmate, name, mock)
+
+    charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
+
+    stop_daemon_mock.assert_called_once_with([tmate.PORT])
+    start_daemon_mock.assert_called_once()
+    (timeline,) = charm.timings.timelines()
+    assert timeline["stages"][0]["name"] == "stop-daemon"
+
+
+def test__on_update_status_everything_ok(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+    docker_client: MagicMock,
+):
+    """
+    arrange: given a running tmate daemon which sends an SSH banner.
+    act: when _on_update_status is called.
+    assert: status is set to active and tmate ssh server is not restarted.
+    """
+    docker_client.container.side_effect = _running_container
+    status_mock = MagicMock(return_value={tmate.PORT: DaemonStatus(running=True, status="")})
     monkeypatch.setattr(
-        tmate, "remove_stopped_containers", MagicMock(side_effect=tmate.DockerError)
+        tmate,
+        "probe_ssh_banner",
+        MagicMock(spec=tmate.probe_ssh_banner, return_value="SSH-2.0-tmate"),
     )
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "status", status_mock)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
 
-    with pytest.raises(tmate.DockerError):
-        charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
+    charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
 
-    assert "Failed to remove stopped containers." in caplog.text
+    start_daemon_mock.assert_not_called()
+    docker_client.container.assert_called_once_with("tmate-ssh-server-tmate-ssh-server-0-10022")
+    assert charm.unit.status.name == "active"
 
 
-def test__on_update_status_restart_daemon(
+def test__on_update_status_container_not_running(
     monkeypatch: pytest.MonkeyPatch,
     charm: TmateSSHServerOperatorCharm,
 ):
     """
-    arrange: given a monkeypatched tmate.status which returns False for running.
+    arrange: given a running tmate daemon without its docker container.
     act: when _on_update_status is called.
-    assert: status is set to active, tmate ssh server is restarted and
-        stopped docker containers are removed.
+    assert: tmate ssh server is restarted without probing it.
     """
-    status_mock = MagicMock(return_value=tmate.DaemonStatus(running=False, status=""))
+    daemon_status = {tmate.PORT: DaemonStatus(running=True, status="")}
+    monkeypatch.setattr(tmate, "status", MagicMock(spec=tmate.status, return_value=daemon_status))
+    probe_mock = MagicMock(spec=tmate.probe_ssh_banner)
+    monkeypatch.setattr(tmate, "probe_ssh_banner", probe_mock)
+    monkeypatch.setattr(tmate, "stop_daemon", MagicMock(spec=tmate.stop_daemon))
     start_daemon_mock = MagicMock(spec=tmate.start_daemon)
-    remove_stopped_containers_mock = MagicMock(spec=tmate.remove_stopped_containers)
-    monkeypatch.setattr(tmate, "status", status_mock)
     monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
-    monkeypatch.setattr(tmate, "remove_stopped_containers", remove_stopped_containers_mock)
 
     charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
 
+    probe_mock.assert_not_called()
+    start_daemon_mock.assert_called_once()
+
+
+def test__on_update_status_workers(
+    monkeypatch: pytest.MonkeyPatch, harness: Harness, docker_client: MagicMock
+):
+    """
+    arrange: given three workers, running, stopped and exited for systemd to restart.
+    act: when _on_update_status is called.
+    assert: only the stopped worker is restarted and the unit waits for the exited one.
+    """
+    docker_client.container.side_effect = _running_container
+    harness.update_config({"workers": 3})
+    harness.begin()
+    statuses = {
+        10022: DaemonStatus(running=True, status="active (running)"),
+        10023: DaemonStatus(running=False, status="inactive (dead)"),
+        10024: DaemonStatus(running=False, status="activating (auto-restart)"),
+    }
+    status_mock = MagicMock(spec=tmate.status, return_value=statuses)
+    monkeypatch.setattr(tmate, "status", status_mock)
+    probe_mock = MagicMock(spec=tmate.probe_ssh_banner, return_value="SSH-2.0-tmate")
+    monkeypatch.setattr(tmate, "probe_ssh_banner", probe_mock)
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+
+    harness.charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
+
+    status_mock.assert_called_once_with([10022, 10023, 10024])
+    probe_mock.assert_called_once_with("10.0.0.10", 10022)
     start_daemon_mock.assert_called_once()
-    remove_stopped_containers_mock.assert_called_once()
+    assert start_daemon_mock.call_args.kwargs["ports"] == [10023]
+    assert harness.charm.unit.status == ops.MaintenanceStatus(
+        "Waiting for tmate-ssh-server to restart."
+    )
+
+
+@pytest.mark.parametrize(
+    "content, attached",
+    [
+        pytest.param(b"bundle", True, id="attached"),
+        pytest.param(b"", False, id="empty placeholder"),
+    ],
+)
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_install_dependency_bundle(
+    monkeypatch: pytest.MonkeyPatch, harness: Harness, content: bytes, attached: bool
+):
+    """
+    arrange: given a dependency bundle resource.
+    act: when _on_install is called.
+    assert: the bundle is passed to install_dependencies only if it is not an empty placeholder.
+    """
+    harness.add_resource(DEPENDENCY_BUNDLE_RESOURCE_NAME, content)
+    harness.begin()
+    install_deps_mock = MagicMock(spec=prerequisites.install_dependencies)
+    monkeypatch.setattr(prerequisites, "install_dependencies", install_deps_mock)
+    monkeypatch.setattr(host_keys, "install_keys", MagicMock(spec=host_keys.install_keys))
+    monkeypatch.setattr(
+        prerequisites,
+        "pull_image",
+        MagicMock(spec=prerequisites.pull_image, return_value=prerequisites.IMAGE),
+    )
+    monkeypatch.setattr(tmate, "start_daemon", MagicMock(spec=tmate.start_daemon))
+
+    harness.charm._on_install(MagicMock(spec=ops.InstallEvent))
+
+    bundle_path = install_deps_mock.call_args.kwargs["bundle_path"]
+    assert (bundle_path is not None) == attached
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_install_image_resource(monkeypatch: pytest.MonkeyPatch, harness: Harness):
+    """
+    arrange: given an attached tmate-ssh-server image resource.
+    act: when _on_install and then _on_update_status with a stopped daemon are called.
+    assert: the image is loaded and the daemon is started and restarted by the image digest.
+    """
+    harness.add_resource(IMAGE_RESOURCE_NAME, b"image")
+    harness.begin()
+    monkeypatch.setattr(
+        prerequisites, "install_dependencies", MagicMock(spec=prerequisites.install_dependencies)
+    )
+    monkeypatch.setattr(host_keys, "install_keys", MagicMock(spec=host_keys.install_keys))
+    monkeypatch.setattr(
+        prerequisites,
+        "load_image",
+        MagicMock(spec=prerequisites.load_image, return_value="sha256:0123"),
+    )
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+    monkeypatch.setattr(
+        tmate,
+        "status",
+        MagicMock(return_value={tmate.PORT: DaemonStatus(running=False, status="")}),
+    )
+
+    harness.charm._on_install(MagicMock(spec=ops.InstallEvent))
+    harness.charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
+
+    assert [call.kwargs["image"] for call in start_daemon_mock.call_args_list] == [
+        "sha256:0123",
+        "sha256:0123",
+    ]
+
+
+def test__on_install_image_resource_error(monkeypatch: pytest.MonkeyPatch, harness: Harness):
+    """
+    arrange: given an attached tmate-ssh-server image resource that fails to load.
+    act: when _on_install is called.
+    assert: the DockerError is re-raised.
+    """
+    harness.add_resource(IMAGE_RESOURCE_NAME, b"image")
+    harness.begin()
+    monkeypatch.setattr(
+        prerequisites, "install_dependencies", MagicMock(spec=prerequisites.install_dependencies)
+    )
+    monkeypatch.setattr(host_keys, "install_keys", MagicMock(spec=host_keys.install_keys))
+    monkeypatch.setattr(
+        prerequisites,
+        "load_image",
+        MagicMock(spec=prerequisites.load_image, side_effect=[prerequisites.DockerError]),
+    )
+
+    with pytest.raises(prerequisites.DockerError):
+        harness.charm._on_install(MagicMock(spec=ops.InstallEvent))
+
+
+def test__on_install_records_timeline(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+):
+    """
+    arrange: given mocked tmate functions where start_daemon raises an error.
+    act: when _on_install is called.
+    assert: the install timeline is recorded with every stage and the failed daemon stage.
+    """
+    monkeypatch.setattr(
+        prerequisites, "install_dependencies", MagicMock(spec=prerequisites.install_dependencies)
+    )
+    monkeypatch.setattr(host_keys, "install_keys", MagicMock(spec=host_keys.install_keys))
+    monkeypatch.setattr(
+        prerequisites, "pull_image", MagicMock(spec=prerequisites.pull_image, return_value="")
+    )
+    monkeypatch.setattr(
+        tmate, "start_daemon", MagicMock(spec=tmate.start_daemon, side_effect=tmate.DaemonError)
+    )
+
+    with pytest.raises(tmate.DaemonError):
+        charm._on_install(MagicMock(spec=ops.InstallEvent))
+
+    (timeline,) = charm.timings.timelines()
+    assert timeline["name"] == "install"
+    assert timeline["failed"]
+    stages = {stage["name"]: stage["failed"] for stage in timeline["stages"]}
+    assert stages == {
+        "fetch-resources": False,
+        "preflight": False,
+        "dependencies": False,
+        "keys": False,
+        "image": False,
+        "daemon": True,
+    }
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_install_resumes_from_checkpoint(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+):
+    """
+    arrange: given an install that failed to start the daemon after the other stages completed.
+    act: when _on_install is retried.
+    assert: only the daemon stage runs again.
+    """
+    install_dependencies_mock = MagicMock(spec=prerequisites.install_dependencies)
+    monkeypatch.setattr(prerequisites, "install_dependencies", install_dependencies_mock)
+    install_keys_mock = MagicMock(spec=host_keys.install_keys)
+    monkeypatch.setattr(host_keys, "install_keys", install_keys_mock)
+    pull_image_mock = MagicMock(spec=prerequisites.pull_image, return_value=prerequisites.IMAGE)
+    monkeypatch.setattr(prerequisites, "pull_image", pull_image_mock)
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon, side_effect=[tmate.DaemonError, None])
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+    with pytest.raises(tmate.DaemonError):
+        charm._on_install(MagicMock(spec=ops.InstallEvent))
+
+    charm._on_install(MagicMock(spec=ops.InstallEvent))
+
+    install_dependencies_mock.assert_called_once()
+    install_keys_mock.assert_called_once()
+    pull_image_mock.assert_called_once()
+    assert start_daemon_mock.call_count == 2
     assert charm.unit.status.name == "active"
 
 
-def test__on_update_status_everything_ok(
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_install_resumes_with_image_resource(
+    monkeypatch: pytest.MonkeyPatch, harness: Harness
+):
+    """
+    arrange: given an install with an image resource that failed to start the daemon.
+    act: when _on_install is retried in a new hook dispatch.
+    assert: the image is not loaded again and the daemon is started by the loaded image digest.
+    """
+    harness.add_resource(IMAGE_RESOURCE_NAME, b"image")
+    harness.begin()
+    monkeypatch.setattr(
+        prerequisites, "install_dependencies", MagicMock(spec=prerequisites.install_dependencies)
+    )
+    monkeypatch.setattr(host_keys, "install_keys", MagicMock(spec=host_keys.install_keys))
+    load_image_mock = MagicMock(spec=prerequisites.load_image, return_value="sha256:0123")
+    monkeypatch.setattr(prerequisites, "load_image", load_image_mock)
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon, side_effect=[tmate.DaemonError, None])
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+    with pytest.raises(tmate.DaemonError):
+        harness.charm._on_install(MagicMock(spec=ops.InstallEvent))
+    # A new hook dispatch initializes the image reference from the stored state.
+    harness.charm._image = harness.charm._stored.image
+
+    harness.charm._on_install(MagicMock(spec=ops.InstallEvent))
+
+    load_image_mock.assert_called_once()
+    assert [call.kwargs["image"] for call in start_daemon_mock.call_args_list] == [
+        "sha256:0123",
+        "sha256:0123",
+    ]
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_install_prebuilt_image(
     monkeypatch: pytest.MonkeyPatch,
     charm: TmateSSHServerOperatorCharm,
+    preflight: MagicMock,
 ):
     """
-    arrange: given a monkeypatched tmate.is_running which returns True.
+    arrange: given a machine with the dependencies and the tmate-ssh-server image pre-installed.
+    act: when _on_install is called.
+    assert: the dependencies and image stages are skipped and the daemon runs the present image.
+    """
+    preflight.return_value = prerequisites.Preflight(dependencies=True, image="sha256:0123")
+    install_dependencies_mock = MagicMock(spec=prerequisites.install_dependencies)
+    monkeypatch.setattr(prerequisites, "install_dependencies", install_dependencies_mock)
+    monkeypatch.setattr(host_keys, "install_keys", MagicMock(spec=host_keys.install_keys))
+    pull_image_mock = MagicMock(spec=prerequisites.pull_image)
+    monkeypatch.setattr(prerequisites, "pull_image", pull_image_mock)
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+
+    charm._on_install(MagicMock(spec=ops.InstallEvent))
+
+    install_dependencies_mock.assert_not_called()
+    pull_image_mock.assert_not_called()
+    assert start_daemon_mock.call_args.kwargs["image"] == "sha256:0123"
+    assert charm.unit.status.name == "active"
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_update_status_switch_keys(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+    fingerprints: host_keys.Fingerprints,
+):
+    """
+    arrange: given a key rotation whose overlap window has ended.
     act: when _on_update_status is called.
-    assert: status is set to active, tmate ssh server is not restarted and
-        stopped docker containers are not removed.
+    assert: the staged keys are activated, the daemon is restarted and only the new fingerprints
+        are published.
     """
-    status_mock = MagicMock(return_value=tmate.DaemonStatus(running=True, status=""))
+    monkeypatch.setattr(charm.key_rotation, "switch_due", MagicMock(return_value=True))
+    complete_mock = MagicMock()
+    monkeypatch.setattr(charm.key_rotation, "complete", complete_mock)
+    activate_mock = MagicMock(spec=host_keys.activate_staged_keys)
+    monkeypatch.setattr(host_keys, "activate_staged_keys", activate_mock)
+    monkeypatch.setattr(
+        host_keys,
+        "staged_fingerprints",
+        MagicMock(spec=host_keys.staged_fingerprints, return_value=None),
+    )
+    stop_daemon_mock = MagicMock(spec=tmate.stop_daemon)
+    monkeypatch.setattr(tmate, "stop_daemon", stop_daemon_mock)
     start_daemon_mock = MagicMock(spec=tmate.start_daemon)
-    remove_stopped_containers_mock = MagicMock(spec=tmate.remove_stopped_containers)
-    monkeypatch.setattr(tmate, "status", status_mock)
     monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
-    monkeypatch.setattr(tmate, "remove_stopped_containers", remove_stopped_containers_mock)
+    update_relation_data_mock = MagicMock()
+    monkeypatch.setattr(charm.sshdebug, "update_relation_data", update_relation_data_mock)
 
     charm._on_update_status(MagicMock(spec=ops.UpdateStatusEvent))
 
-    start_daemon_mock.assert_not_called()
-    remove_stopped_containers_mock.assert_not_called()
+    activate_mock.assert_called_once()
+    stop_daemon_mock.assert_called_once()
+    start_daemon_mock.assert_called_once()
+    complete_mock.assert_called_once()
+    update_relation_data_mock.assert_called_once_with(
+        host=str(charm.state.ip_addr), fingerprints=fingerprints, next_fingerprints=None
+    )
     assert charm.unit.status.name == "active"
+    (timeline,) = charm.timings.timelines()
+    assert timeline["name"] == "rotate-keys"
+
+
+def test__on_keys_changed_keys_not_installed(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+):
+    """
+    arrange: given host keys that have not been installed yet.
+    act: when _on_keys_changed is called.
+    assert: no host keys are generated.
+    """
+    monkeypatch.setattr(
+        host_keys,
+        "key_files_id",
+        MagicMock(spec=host_keys.key_files_id, side_effect=[host_keys.IncompleteInitError]),
+    )
+    install_keys_mock = MagicMock(spec=host_keys.install_keys)
+    monkeypatch.setattr(host_keys, "install_keys", install_keys_mock)
+
+    charm._on_keys_changed(MagicMock(spec=ops.EventBase))
+
+    install_keys_mock.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "handler, event_type",
+    [
+        pytest.param("_on_keys_changed", ops.EventBase, id="keys changed"),
+        pytest.param("_on_config_changed", ops.ConfigChangedEvent, id="config changed"),
+        pytest.param("_on_upgrade_charm", ops.UpgradeCharmEvent, id="upgrade charm"),
+    ],
+)
+def test_handlers_ip_not_assigned(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+    handler: str,
+    event_type: type[ops.EventBase],
+):
+    """
+    arrange: given a monkeypatched state.ip_addr that does not yet have a value.
+    act: when the handler is called.
+    assert: no host keys are generated, no restart policy is applied and no worker is started.
+    """
+    mock_state = MagicMock(spec=State)
+    mock_state.ip_addr = None
+    monkeypatch.setattr(charm, "state", mock_state)
+    install_keys_mock = MagicMock(spec=host_keys.install_keys)
+    monkeypatch.setattr(host_keys, "install_keys", install_keys_mock)
+    apply_mock = MagicMock(spec=tmate.apply_restart_policy)
+    monkeypatch.setattr(tmate, "apply_restart_policy", apply_mock)
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+
+    getattr(charm, handler)(MagicMock(spec=event_type))
+
+    install_keys_mock.assert_not_called()
+    apply_mock.assert_not_called()
+    start_daemon_mock.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "legacy",
+    [
+        pytest.param(True, id="single service installed"),
+        pytest.param(False, id="workers installed"),
+    ],
+)
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_upgrade_charm(monkeypatch: pytest.MonkeyPatch, harness: Harness, legacy: bool):
+    """
+    arrange: given the single service of a previous charm revision, or already installed workers.
+    act: when _on_upgrade_charm is called.
+    assert: the single service is replaced by the workers, whose ports are published.
+    """
+    relation_id = harness.add_relation(DEBUG_SSH_INTEGRATION_NAME, "github_runner")
+    harness.add_relation_unit(relation_id, "github_runner/0")
+    harness.update_config({"workers": 2})
+    harness.begin()
+    monkeypatch.setattr(tmate, "legacy_service_installed", MagicMock(return_value=legacy))
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+
+    harness.charm._on_upgrade_charm(MagicMock(spec=ops.UpgradeCharmEvent))
+
+    assert start_daemon_mock.called == legacy
+    if legacy:
+        assert start_daemon_mock.call_args.kwargs["ports"] == [10022, 10023]
+        assert sorted(port.port for port in harness.charm.unit.opened_ports()) == [10022, 10023]
+        relation_data = harness.get_relation_data(relation_id, harness.charm.unit)
+        assert relation_data["ports"] == "10022,10023"
+        (timeline,) = harness.charm.timings.timelines()
+        assert timeline["name"] == "upgrade"
+
+
+@pytest.mark.parametrize(
+    "changed",
+    [
+        pytest.param(False, id="unchanged"),
+        pytest.param(True, id="changed"),
+    ],
+)
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_keys_changed(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: Harness,
+    fingerprints: host_keys.Fingerprints,
+    changed: bool,
+):
+    """
+    arrange: given installed host keys and a host key configuration.
+    act: when _on_keys_changed is called.
+    assert: the host keys are generated for the configuration and the daemon is restarted only if
+        the host keys changed.
+    """
+    harness.update_config({"host-key-algorithms": "ed25519", "rsa-key-size": 2048})
+    harness.begin()
+    new_fingerprints = host_keys.Fingerprints(ed25519="new") if changed else fingerprints
+    install_keys_mock = MagicMock(spec=host_keys.install_keys, return_value=new_fingerprints)
+    monkeypatch.setattr(host_keys, "install_keys", install_keys_mock)
+    stop_daemon_mock = MagicMock(spec=tmate.stop_daemon)
+    monkeypatch.setattr(tmate, "stop_daemon", stop_daemon_mock)
+    monkeypatch.setattr(tmate, "start_daemon", MagicMock(spec=tmate.start_daemon))
+
+    harness.charm._on_keys_changed(MagicMock(spec=ops.EventBase))
+
+    install_keys_mock.assert_called_once_with(
+        host_key_config=HostKeyConfig(algorithms=("ed25519",), rsa_key_size=2048)
+    )
+    assert stop_daemon_mock.called == changed
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_keys_changed_rolling_restart(monkeypatch: pytest.MonkeyPatch, harness: Harness):
+    """
+    arrange: given two workers and changed host keys.
+    act: when _on_keys_changed is called.
+    assert: the workers are stopped and started one at a time, in the order of their ports.
+    """
+    harness.update_config({"workers": 2})
+    harness.begin()
+    monkeypatch.setattr(
+        host_keys,
+        "install_keys",
+        MagicMock(spec=host_keys.install_keys, return_value=host_keys.Fingerprints(ed25519="new")),
+    )
+    daemon_mock = MagicMock()
+    monkeypatch.setattr(tmate, "stop_daemon", daemon_mock.stop_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", daemon_mock.start_daemon)
+
+    harness.charm._on_keys_changed(MagicMock(spec=ops.EventBase))
+
+    assert [
+        (name, args[0] if args else kwargs["ports"])
+        for name, args, kwargs in daemon_mock.mock_calls
+    ] == [
+        ("stop_daemon", [10022]),
+        ("start_daemon", [10022]),
+        ("stop_daemon", [10023]),
+        ("start_daemon", [10023]),
+    ]
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_keys_changed_shared_keys(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+    fingerprints: host_keys.Fingerprints,
+):
+    """
+    arrange: given installed host keys and host keys shared by the leader unit.
+    act: when _on_keys_changed is called.
+    assert: the shared host keys are installed instead of generating host keys.
+    """
+    keys = {"ed25519": "ed25519_key"}
+    monkeypatch.setattr(charm.shared_keys, "get", MagicMock(return_value=keys))
+    write_keys_mock = MagicMock(spec=host_keys.write_keys, return_value=fingerprints)
+    monkeypatch.setattr(host_keys, "write_keys", write_keys_mock)
+    install_keys_mock = MagicMock(spec=host_keys.install_keys)
+    monkeypatch.setattr(host_keys, "install_keys", install_keys_mock)
+
+    charm._on_keys_changed(MagicMock(spec=ops.EventBase))
+
+    write_keys_mock.assert_called_once_with(keys)
+    install_keys_mock.assert_not_called()
+
+
+def test_host_keys_storage_location(charm: TmateSSHServerOperatorCharm):
+    """
+    arrange: given the charm metadata.
+    act: when the location of the host-keys storage is read.
+    assert: the storage is mounted at the host keys directory.
+    """
+    assert charm.meta.storages["host-keys"].location == str(host_keys.KEYS_DIR)
@@ -0,0 +1,187 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm configuration unit tests."""
+
+from unittest.mock import MagicMock
+
+import ops
+import pytest
+from ops.testing import Harness
+
+import prerequisites
+import tmate
+from charm import TmateSSHServerOperatorCharm
+from state import DEBUG_SSH_INTEGRATION_NAME, RestartPolicy
+
+# Need access to protected functions for testing
+# pylint: disable=protected-access
+
+
+@pytest.mark.parametrize(
+    "config, message",
+    [
+        pytest.param(
+            {"host-key-algorithms": "rsa"},
+            "host-key-algorithms must include ed25519.",
+            id="host key algorithms",
+        ),
+        pytest.param(
+            {"restart-delay": -1},
+            "restart-delay and start-limit-interval must not be negative.",
+            id="negative restart delay",
+        ),
+        pytest.param(
+            {"start-limit-burst": 0},
+            "start-limit-burst must be at least 1.",
+            id="no start limit burst",
+        ),
+        pytest.param({"workers": -1}, "workers must not be negative.", id="negative workers"),
+    ],
+)
+def test_invalid_config(
+    monkeypatch: pytest.MonkeyPatch, harness: Harness, config: dict, message: str
+):
+    """
+    arrange: given an invalid charm configuration.
+    act: when the charm is initialized and the install and update-status hooks are emitted.
+    assert: the unit is blocked with the configuration error, the install is deferred and the
+        other hooks do nothing.
+    """
+    harness.update_config(config)
+    harness.begin()
+    mock_event = MagicMock(spec=ops.InstallEvent)
+    status_mock = MagicMock(spec=tmate.status)
+    monkeypatch.setattr(tmate, "status", status_mock)
+
+    harness.charm._on_install(mock_event)
+    harness.charm.on.update_status.emit()
+
+    assert harness.charm.unit.status == ops.BlockedStatus(message)
+    mock_event.defer.assert_called_once()
+    status_mock.assert_not_called()
+
+
+def test__on_config_changed_clears_blocked(
+    monkeypatch: pytest.MonkeyPatch, charm: TmateSSHServerOperatorCharm
+):
+    """
+    arrange: given an installed unit blocked by a previously invalid configuration.
+    act: when _on_config_changed is called with a valid configuration.
+    assert: the unit is active again.
+    """
+    monkeypatch.setattr(tmate, "apply_restart_policy", MagicMock(spec=tmate.apply_restart_policy))
+    charm.unit.set_ports(tmate.PORT)
+    charm.unit.status = ops.BlockedStatus("invalid")
+
+    charm._on_config_changed(MagicMock(spec=ops.ConfigChangedEvent))
+
+    assert charm.unit.status.name == "active"
+
+
+@pytest.mark.parametrize(
+    "applied",
+    [
+        pytest.param(False, id="unchanged"),
+        pytest.param(True, id="changed"),
+    ],
+)
+def test__on_config_changed(
+    monkeypatch: pytest.MonkeyPatch, harness: Harness, caplog: pytest.LogCaptureFixture, applied
+):
+    """
+    arrange: given a configured restart policy.
+    act: when the configuration changes.
+    assert: the restart policy is applied to the service of the unit.
+    """
+    harness.update_config({"restart-delay": 10, "start-limit-burst": 3})
+    harness.begin()
+    apply_mock = MagicMock(spec=tmate.apply_restart_policy, return_value=applied)
+    monkeypatch.setattr(tmate, "apply_restart_policy", apply_mock)
+
+    harness.charm._on_config_changed(MagicMock(spec=ops.ConfigChangedEvent))
+
+    apply_mock.assert_called_once_with(
+        address="10.0.0.10",
+        name="tmate-ssh-server-tmate-ssh-server-0",
+        image=prerequisites.IMAGE,
+        restart_policy=RestartPolicy(restart_delay=10, start_limit_burst=3),
+    )
+    assert ("Applied restart policy" in caplog.text) == applied
+
+
+@pytest.mark.parametrize(
+    "opened, workers, removed",
+    [
+        pytest.param([10022], 3, [], id="scale up"),
+        pytest.param([10022, 10023, 10024], 1, [10023, 10024], id="scale down"),
+    ],
+)
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test__on_config_changed_workers(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: Harness,
+    opened: list[int],
+    workers: int,
+    removed: list[int],
+):
+    """
+    arrange: given installed workers with opened ports and a changed number of workers.
+    act: when _on_config_changed is called.
+    assert: the added workers are started, the dropped ones removed, and the ports updated.
+    """
+    relation_id = harness.add_relation(DEBUG_SSH_INTEGRATION_NAME, "github_runner")
+    harness.add_relation_unit(relation_id, "github_runner/0")
+    harness.update_config({"workers": workers})
+    harness.begin()
+    harness.charm.unit.set_ports(*opened)
+    monkeypatch.setattr(tmate, "apply_restart_policy", MagicMock(return_value=False))
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+    remove_workers_mock = MagicMock(spec=tmate.remove_workers)
+    monkeypatch.setattr(tmate, "remove_workers", remove_workers_mock)
+
+    harness.charm._on_config_changed(MagicMock(spec=ops.ConfigChangedEvent))
+
+    expected_ports = list(range(tmate.PORT, tmate.PORT + workers))
+    added = [port for port in expected_ports if port not in opened]
+    assert start_daemon_mock.called == bool(added)
+    if added:
+        assert start_daemon_mock.call_args.kwargs["ports"] == added
+    assert remove_workers_mock.called == bool(removed)
+    if removed:
+        remove_workers_mock.assert_called_once_with(removed)
+    assert sorted(port.port for port in harness.charm.unit.opened_ports()) == expected_ports
+    relation_data = harness.get_relation_data(relation_id, harness.charm.unit)
+    assert relation_data["ports"] == ",".join(str(port) for port in expected_ports)
+    (timeline,) = harness.charm.timings.timelines()
+    assert timeline["name"] == "scale-workers"
+
+
+@pytest.mark.parametrize(
+    "opened",
+    [
+        pytest.param([], id="not installed"),
+        pytest.param([10022], id="unchanged"),
+    ],
+)
+def test__on_config_changed_workers_unchanged(
+    monkeypatch: pytest.MonkeyPatch, charm: TmateSSHServerOperatorCharm, opened: list[int]
+):
+    """
+    arrange: given workers which are not installed yet or match the configuration.
+    act: when _on_config_changed is called.
+    assert: no worker is started or removed.
+    """
+    charm.unit.set_ports(*opened)
+    monkeypatch.setattr(tmate, "apply_restart_policy", MagicMock(return_value=False))
+    start_daemon_mock = MagicMock(spec=tmate.start_daemon)
+    monkeypatch.setattr(tmate, "start_daemon", start_daemon_mock)
+    remove_workers_mock = MagicMock(spec=tmate.remove_workers)
+    monkeypatch.setattr(tmate, "remove_workers", remove_workers_mock)
+
+    charm._on_config_changed(MagicMock(spec=ops.ConfigChangedEvent))
+
+    start_daemon_mock.assert_not_called()
+    remove_workers_mock.assert_not_called()
+    assert not charm.timings.timelines()
@@ -0,0 +1,88 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm daemon_status module unit tests."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+import daemon_status
+
+
+@pytest.mark.parametrize(
+    "properties, expected",
+    [
+        pytest.param(
+            {
+                "ActiveState": "active",
+                "SubState": "running",
+                "MainPID": "1234",
+                "NRestarts": "2",
+                "ActiveEnterTimestamp": "@1736157600",
+                "MemoryCurrent": "52428800",
+                "TasksCurrent": "12",
+            },
+            daemon_status.DaemonStatus(
+                running=True,
+                status="active (running)",
+                main_pid=1234,
+                restarts=2,
+                active_since=datetime(2025, 1, 6, 10, 0, tzinfo=timezone.utc),
+                memory=52428800,
+                tasks=12,
+            ),
+            id="running",
+        ),
+        pytest.param(
+            {
+                "ActiveState": "inactive",
+                "SubState": "dead",
+                "MainPID": "0",
+                "NRestarts": "0",
+                "ActiveEnterTimestamp": "",
+                "MemoryCurrent": "[not set]",
+                "TasksCurrent": "[not set]",
+            },
+            daemon_status.DaemonStatus(running=False, status="inactive (dead)", restarts=0),
+            id="not running",
+        ),
+        pytest.param(
+            {"ActiveState": "active", "ActiveEnterTimestamp": "Mon 2025-01-06 10:00:00 UTC"},
+            daemon_status.DaemonStatus(running=True, status="active (unknown)"),
+            id="formatted timestamp",
+        ),
+        pytest.param(
+            {}, daemon_status.DaemonStatus(running=False, status="unknown (unknown)"), id="none"
+        ),
+    ],
+)
+def test_from_properties(properties: dict[str, str], expected: daemon_status.DaemonStatus):
+    """
+    arrange: given unit properties of a tmate-ssh-server worker service.
+    act: when from_properties is called.
+    assert: the daemon status is built from the unit properties.
+    """
+    assert daemon_status.from_properties(properties) == expected
+
+
+@pytest.mark.parametrize(
+    "status, restarting, failed",
+    [
+        pytest.param("active (running)", False, False, id="running"),
+        pytest.param("activating (auto-restart)", True, False, id="restarting"),
+        pytest.param("activating (auto-restart-queued)", True, False, id="restart queued"),
+        pytest.param("activating (start-pre)", False, False, id="starting"),
+        pytest.param("failed (failed)", False, True, id="failed"),
+    ],
+)
+def test_daemon_status_restarting(status: str, restarting: bool, failed: bool):
+    """
+    arrange: given a daemon status.
+    act: when the restarting and failed properties are read.
+    assert: whether systemd is restarting the daemon or gave up on it is returned.
+    """
+    worker = daemon_status.DaemonStatus(running=False, status=status)
+
+    assert worker.restarting == restarting
+    assert worker.failed == failed
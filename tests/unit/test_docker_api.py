@@ -0,0 +1,252 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm docker_api module unit tests."""
+
+import http.server
+import json
+import socketserver
+import threading
+import typing
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+import docker_api
+
+# Need access to protected functions for testing
+# pylint: disable=protected-access
+
+INSPECT = {
+    "Id": "0123456789abcdef",
+    "Name": "/tmate-ssh-server-0",
+    "RestartCount": 2,
+    "State": {
+        "Running": True,
+        "StartedAt": "2025-01-02T03:04:05.123456789Z",
+        "Health": {"Status": "healthy"},
+    },
+}
+STATE = docker_api.ContainerState(
+    name="tmate-ssh-server-0",
+    running=True,
+    health="healthy",
+    started_at=datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+    restart_count=2,
+)
+INSPECT_PATH = "/containers/tmate-ssh-server-0/json"
+
+
+class FakeDockerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Docker daemon serving canned responses over a unix socket.
+
+    Attributes:
+        responses: The status and JSON body by request path, None to drop the connection.
+        requests: The paths of the received requests.
+        connections: The number of accepted connections.
+        close_after_response: Whether to close the connection after each response without
+            announcing it, like a daemon closing an idle connection.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path):
+        """Start listening on the socket.
+
+        Args:
+            socket_path: The path of the unix socket.
+        """
+        super().__init__(str(socket_path), _Handler)
+        self.responses: dict[str, typing.Optional[tuple[int, typing.Any]]] = {}
+        self.requests: list[str] = []
+        self.connections = 0
+        self.close_after_response = False
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Handler of the fake docker daemon requests."""
+
+    protocol_version = "HTTP/1.1"
+    server: FakeDockerDaemon
+
+    def setup(self) -> None:
+        """Count the accepted connection."""
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Send the canned response of the request path."""
+        self.server.requests.append(self.path)
+        response = self.server.responses.get(self.path, (404, {"message": "No such container"}))
+        if response is None:
+            self.close_connection = True
+            return
+        status, body = response
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        self.close_connection = self.server.close_after_response
+
+    def log_message(self, *_: typing.Any) -> None:
+        """Do not log the requests, the client address of unix sockets is empty."""
+
+
+@pytest.fixture(name="socket_path")
+def socket_path_fixture(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Path of the fake docker daemon socket, short enough for a unix socket address."""
+    return tmp_path_factory.mktemp("docker") / "docker.sock"
+
+
+@pytest.fixture(name="docker_daemon")
+def docker_daemon_fixture(socket_path: Path) -> typing.Iterator[FakeDockerDaemon]:
+    """Run a fake docker daemon."""
+    daemon = FakeDockerDaemon(socket_path)
+    thread = threading.Thread(
+        target=daemon.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield daemon
+    daemon.shutdown()
+    daemon.server_close()
+
+
+@pytest.fixture(name="client")
+def client_fixture(socket_path: Path) -> typing.Iterator[docker_api.DockerClient]:
+    """Docker client of the fake docker daemon."""
+    with docker_api.DockerClient(socket_path=socket_path, timeout=5) as client:
+        yield client
+
+
+def test_container(docker_daemon: FakeDockerDaemon, client: docker_api.DockerClient):
+    """
+    arrange: given a docker daemon with a running container.
+    act: when container is called twice.
+    assert: the container state is returned, both queries sharing one connection.
+    """
+    docker_daemon.responses[INSPECT_PATH] = (200, INSPECT)
+
+    assert client.container("tmate-ssh-server-0") == STATE
+    assert client.container("tmate-ssh-server-0") == STATE
+    assert docker_daemon.requests == [INSPECT_PATH, INSPECT_PATH]
+    assert docker_daemon.connections == 1
+
+
+def test_container_never_started(docker_daemon: FakeDockerDaemon, client: docker_api.DockerClient):
+    """
+    arrange: given a docker daemon with a created container without health check.
+    act: when container is called.
+    assert: the container state without start time and health is returned.
+    """
+    docker_daemon.responses[INSPECT_PATH] = (
+        200,
+        {
+            "Id": "0123456789abcdef",
+            "Name": "/tmate-ssh-server-0",
+            "RestartCount": 0,
+            "State": {"Running": False, "StartedAt": "0001-01-01T00:00:00Z"},
+        },
+    )
+
+    assert client.container("tmate-ssh-server-0") == docker_api.ContainerState(
+        name="tmate-ssh-server-0", running=False, health=None, started_at=None, restart_count=0
+    )
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        pytest.param("tmate-ssh-server-0", id="no container"),
+        pytest.param("0123", id="container ID prefix"),
+    ],
+)
+def test_container_not_found(
+    docker_daemon: FakeDockerDaemon, client: docker_api.DockerClient, name: str
+):
+    """
+    arrange: given a docker daemon with a container of another name.
+    act: when container is called.
+    assert: None is returned.
+    """
+    docker_daemon.responses["/containers/0123/json"] = (200, INSPECT)
+
+    assert client.container(name) is None
+
+
+@pytest.mark.parametrize(
+    "response, message",
+    [
+        pytest.param((500, {"message": "server error"}), "failed with 500", id="error status"),
+        pytest.param((200, b"not json"), "Invalid docker daemon response", id="invalid json"),
+        pytest.param(None, "Failed to query docker daemon", id="connection dropped"),
+    ],
+)
+def test_container_error(
+    docker_daemon: FakeDockerDaemon,
+    client: docker_api.DockerClient,
+    response: typing.Optional[tuple[int, typing.Any]],
+    message: str,
+):
+    """
+    arrange: given a docker daemon failing to answer the container query.
+    act: when container is called.
+    assert: DockerAPIError is raised.
+    """
+    docker_daemon.responses[INSPECT_PATH] = response
+
+    with pytest.raises(docker_api.DockerAPIError, match=message):
+        client.container("tmate-ssh-server-0")
+
+
+def test_container_no_daemon(socket_path: Path):
+    """
+    arrange: given no docker daemon listening on the socket.
+    act: when container is called.
+    assert: DockerAPIError is raised.
+    """
+    client = docker_api.DockerClient(socket_path=socket_path)
+
+    with pytest.raises(docker_api.DockerAPIError, match="Failed to query docker daemon"):
+        client.container("tmate-ssh-server-0")
+
+
+def test_container_reconnect(docker_daemon: FakeDockerDaemon, client: docker_api.DockerClient):
+    """
+    arrange: given a docker daemon closing the connection after each response.
+    act: when container is called twice.
+    assert: the client reconnects and the container state is returned both times.
+    """
+    docker_daemon.responses[INSPECT_PATH] = (200, INSPECT)
+    docker_daemon.close_after_response = True
+
+    assert client.container("tmate-ssh-server-0") == STATE
+    assert client.container("tmate-ssh-server-0") == STATE
+    assert docker_daemon.connections == 2
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        pytest.param(
+            "2025-01-02T03:04:05.1Z",
+            datetime(2025, 1, 2, 3, 4, 5, 100000, tzinfo=timezone.utc),
+            id="short fraction",
+        ),
+        pytest.param(
+            "2025-01-02T03:04:05+02:00",
+            datetime.fromisoformat("2025-01-02T03:04:05+02:00"),
+            id="no fraction",
+        ),
+        pytest.param("", None, id="empty"),
+    ],
+)
+def test__parse_timestamp(value: str, expected: typing.Optional[datetime]):
+    """
+    arrange: given a docker timestamp.
+    act: when _parse_timestamp is called.
+    assert: the timestamp is parsed.
+    """
+    assert docker_api._parse_timestamp(value) == expected
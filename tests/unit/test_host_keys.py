@@ -0,0 +1,402 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm host_keys module unit tests."""
+
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import dsa, rsa
+
+import host_keys
+import state
+
+# Need access to protected functions for testing
+# pylint: disable=protected-access
+
+
+@pytest.fixture(name="chown")
+def chown_fixture(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    """Monkeypatch the file ownership change."""
+    chown_mock = MagicMock(spec=host_keys.shutil.chown)
+    monkeypatch.setattr(host_keys.shutil, "chown", chown_mock)
+    return chown_mock
+
+
+def test_install_keys_error(keys_dir: Path, chown: MagicMock):
+    """
+    arrange: given a monkeypatched chown call that fails to find the user.
+    act: when install_keys is called.
+    assert: KeyInstallError is raised and no keys are written.
+    """
+    chown.side_effect = LookupError
+
+    with pytest.raises(host_keys.KeyInstallError):
+        host_keys.install_keys()
+
+    assert not list(keys_dir.iterdir())
+
+
+def test_install_keys(keys_dir: Path, chown: MagicMock):
+    """
+    arrange: given an empty keys directory.
+    act: when install_keys is called.
+    assert: OpenSSH host keys are written with private and public modes and the fingerprints of
+        the written keys are returned.
+    """
+    fingerprints = host_keys.install_keys()
+
+    for key_type in ("rsa", "ed25519"):
+        key_path = keys_dir / f"ssh_host_{key_type}_key"
+        private_key = serialization.load_ssh_private_key(key_path.read_bytes(), password=None)
+        public_key = serialization.load_ssh_public_key(key_path.with_suffix(".pub").read_bytes())
+        assert private_key.public_key() == public_key
+        assert key_path.stat().st_mode & 0o777 == 0o600
+        assert key_path.with_suffix(".pub").stat().st_mode & 0o777 == 0o644
+    assert fingerprints == host_keys.get_fingerprints()
+    # The keys directory and the four key files only.
+    assert chown.call_count == 5
+
+
+@pytest.mark.usefixtures("chown")
+def test_install_keys_existing(keys_dir: Path):
+    """
+    arrange: given previously generated host keys.
+    act: when install_keys is called.
+    assert: the existing keys are kept.
+    """
+    fingerprints = host_keys.install_keys()
+    private_key = (keys_dir / "ssh_host_ed25519_key").read_bytes()
+
+    assert host_keys.install_keys() == fingerprints
+    assert (keys_dir / "ssh_host_ed25519_key").read_bytes() == private_key
+
+
+@pytest.mark.usefixtures("chown")
+def test_install_keys_public_key_missing(keys_dir: Path):
+    """
+    arrange: given reused host keys with a missing and an invalid public key.
+    act: when install_keys is called.
+    assert: the public keys are restored from the private keys and the fingerprints are kept.
+    """
+    fingerprints = host_keys.install_keys()
+    (keys_dir / "ssh_host_rsa_key.pub").unlink()
+    (keys_dir / "ssh_host_ed25519_key.pub").write_text("invalid", encoding="utf-8")
+
+    assert host_keys.install_keys() == fingerprints
+
+
+@pytest.mark.usefixtures("chown")
+def test_install_keys_invalid(keys_dir: Path):
+    """
+    arrange: given a previously generated ed25519 host key that is corrupted.
+    act: when install_keys is called.
+    assert: a new ed25519 host key is generated and the RSA host key is kept.
+    """
+    fingerprints = host_keys.install_keys()
+    (keys_dir / "ssh_host_ed25519_key").write_text("invalid", encoding="utf-8")
+
+    new_fingerprints = host_keys.install_keys()
+
+    assert new_fingerprints.ed25519 != fingerprints.ed25519
+    assert new_fingerprints.rsa == fingerprints.rsa
+
+
+@pytest.mark.usefixtures("chown")
+def test_install_keys_algorithms(keys_dir: Path):
+    """
+    arrange: given previously generated RSA and ed25519 host keys.
+    act: when install_keys is called with only ed25519 host keys configured.
+    assert: the RSA key is removed and the ed25519 key is kept.
+    """
+    fingerprints = host_keys.install_keys()
+
+    new_fingerprints = host_keys.install_keys(
+        host_key_config=state.HostKeyConfig(algorithms=("ed25519",))
+    )
+
+    assert new_fingerprints.ed25519 == fingerprints.ed25519
+    assert new_fingerprints.rsa is None
+    assert sorted(path.name for path in keys_dir.iterdir()) == [
+        "ssh_host_ed25519_key",
+        "ssh_host_ed25519_key.pub",
+    ]
+    assert new_fingerprints == host_keys.get_fingerprints()
+
+
+@pytest.mark.usefixtures("chown")
+def test_install_keys_rsa_key_size(keys_dir: Path):
+    """
+    arrange: given a previously generated RSA host key of the default size.
+    act: when install_keys is called with another RSA key size.
+    assert: the RSA key is regenerated with the configured size.
+    """
+    fingerprints = host_keys.install_keys()
+
+    new_fingerprints = host_keys.install_keys(
+        host_key_config=state.HostKeyConfig(algorithms=("ed25519", "rsa"), rsa_key_size=2048)
+    )
+
+    assert new_fingerprints.rsa != fingerprints.rsa
+    assert new_fingerprints.ed25519 == fingerprints.ed25519
+    public_key = serialization.load_ssh_public_key(
+        (keys_dir / "ssh_host_rsa_key.pub").read_bytes()
+    )
+    assert isinstance(public_key, rsa.RSAPublicKey)
+    assert public_key.key_size == 2048
+
+
+def test_key_files_id(keys_dir: Path):
+    """
+    arrange: given public key files.
+    act: when key_files_id is called before and after a key file is replaced.
+    assert: the identity changes with the replaced key file.
+    """
+    keys_dir.mkdir()
+    (keys_dir / "ssh_host_rsa_key.pub").write_text("ssh-rsa AAAA", encoding="utf-8")
+    (keys_dir / "ssh_host_ed25519_key.pub").write_text("ssh-ed25519 AAAA", encoding="utf-8")
+    key_files = host_keys.key_files_id()
+    replacement = keys_dir / "replacement"
+    replacement.write_text("ssh-ed25519 AAAB", encoding="utf-8")
+
+    replacement.replace(keys_dir / "ssh_host_ed25519_key.pub")
+
+    assert host_keys.key_files_id() != key_files
+
+
+def test_key_files_id_missing(keys_dir: Path):
+    """
+    arrange: given no public key files.
+    act: when key_files_id is called.
+    assert: IncompleteInitError is raised.
+    """
+    with pytest.raises(host_keys.IncompleteInitError):
+        host_keys.key_files_id()
+    assert not keys_dir.exists()
+
+
+@pytest.mark.usefixtures("chown")
+def test_activate_staged_keys(keys_dir: Path):
+    """
+    arrange: given installed host keys and host keys staged by a key rotation.
+    act: when activate_staged_keys is called.
+    assert: the staged keys replace the installed keys and the staged keys directory is removed.
+    """
+    host_keys.install_keys()
+    staged_fingerprints = host_keys.install_keys(host_keys.STAGED_KEYS_DIR)
+    assert host_keys.staged_fingerprints() == staged_fingerprints
+
+    host_keys.activate_staged_keys()
+
+    assert host_keys.get_fingerprints() == staged_fingerprints
+    assert host_keys.staged_fingerprints() is None
+    assert not host_keys.STAGED_KEYS_DIR.exists()
+    assert len(list(keys_dir.iterdir())) == 4
+    assert (keys_dir / "ssh_host_ed25519_key").stat().st_mode & 0o777 == 0o600
+
+
+def test_activate_staged_keys_none_staged(keys_dir: Path):
+    """
+    arrange: given no staged host keys.
+    act: when activate_staged_keys is called.
+    assert: nothing is changed.
+    """
+    host_keys.activate_staged_keys()
+
+    assert not keys_dir.exists()
+
+
+def test_activate_staged_keys_error(monkeypatch: pytest.MonkeyPatch, keys_dir: Path):
+    """
+    arrange: given staged host keys and a keys directory that does not exist.
+    act: when activate_staged_keys is called.
+    assert: KeyInstallError is raised.
+    """
+    host_keys.STAGED_KEYS_DIR.mkdir()
+    (host_keys.STAGED_KEYS_DIR / "ssh_host_rsa_key.pub").write_text(
+        "ssh-rsa AAAA", encoding="utf-8"
+    )
+    monkeypatch.setattr(host_keys, "KEYS_DIR", keys_dir / "missing")
+
+    with pytest.raises(host_keys.KeyInstallError):
+        host_keys.activate_staged_keys()
+
+
+@pytest.mark.usefixtures("chown")
+def test_discard_staged_keys(keys_dir: Path):
+    """
+    arrange: given installed host keys and host keys staged by a key rotation.
+    act: when discard_staged_keys is called, twice.
+    assert: the staged keys directory is removed and the installed keys are kept.
+    """
+    fingerprints = host_keys.install_keys()
+    host_keys.install_keys(host_keys.STAGED_KEYS_DIR)
+
+    host_keys.discard_staged_keys()
+    host_keys.discard_staged_keys()
+
+    assert not host_keys.STAGED_KEYS_DIR.exists()
+    assert host_keys.get_fingerprints() == fingerprints
+    assert len(list(keys_dir.iterdir())) == 4
+
+
+@pytest.mark.usefixtures("keys_dir")
+def test_discard_staged_keys_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a staged keys path that cannot be removed.
+    act: when discard_staged_keys is called.
+    assert: KeyInstallError is raised.
+    """
+    monkeypatch.setattr(
+        host_keys.shutil, "rmtree", MagicMock(side_effect=PermissionError("permission denied"))
+    )
+    host_keys.STAGED_KEYS_DIR.mkdir()
+
+    with pytest.raises(host_keys.KeyInstallError, match="permission denied"):
+        host_keys.discard_staged_keys()
+
+
+def test_get_fingerprints_ed25519_missing(keys_dir: Path):
+    """
+    arrange: given an RSA public key file without an ed25519 public key file.
+    act: when get_fingerprints is called.
+    assert: IncompleteInitError is raised.
+    """
+    keys_dir.mkdir()
+    (keys_dir / "ssh_host_rsa_key.pub").write_text("ssh-rsa AAAA", encoding="utf-8")
+
+    with pytest.raises(host_keys.IncompleteInitError):
+        host_keys.get_fingerprints()
+
+
+@pytest.mark.usefixtures("chown")
+def test_write_keys(keys_dir: Path, tmp_path: Path):
+    """
+    arrange: given host keys read from another keys directory and installed ed25519 host keys.
+    act: when write_keys is called with the keys.
+    assert: the host keys are replaced with the given keys and unchanged keys are kept.
+    """
+    other_keys_dir = tmp_path / "other-keys"
+    fingerprints = host_keys.install_keys(other_keys_dir)
+    keys = host_keys.read_keys(other_keys_dir)
+    host_keys.install_keys(host_key_config=state.HostKeyConfig(algorithms=("ed25519",)))
+
+    assert host_keys.write_keys(keys) == fingerprints
+    assert sorted(keys) == ["ed25519", "rsa"]
+    private_key = (keys_dir / "ssh_host_rsa_key").read_bytes()
+    assert host_keys.write_keys(keys) == fingerprints
+    assert (keys_dir / "ssh_host_rsa_key").read_bytes() == private_key
+
+
+def _dsa_key() -> str:
+    """Generate a DSA private key, which is not a supported host key type.
+
+    Returns:
+        The OpenSSH DSA private key.
+    """
+    return (
+        dsa.generate_private_key(key_size=1024)
+        .private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.OpenSSH,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        .decode("utf-8")
+    )
+
+
+@pytest.mark.parametrize(
+    "keys",
+    [
+        pytest.param({"rsa": "invalid"}, id="ed25519 key missing"),
+        pytest.param({"ed25519": "invalid"}, id="invalid key"),
+        pytest.param({"ed25519": _dsa_key()}, id="unsupported key type"),
+    ],
+)
+@pytest.mark.usefixtures("chown")
+def test_write_keys_error(keys_dir: Path, keys: dict[str, str]):
+    """
+    arrange: given invalid host keys.
+    act: when write_keys is called.
+    assert: KeyInstallError is raised and no key files are written.
+    """
+    with pytest.raises(host_keys.KeyInstallError):
+        host_keys.write_keys(keys)
+
+    assert not list(keys_dir.glob("ssh_host_*"))
+
+
+def test_read_keys_error(keys_dir: Path):
+    """
+    arrange: given an ed25519 private key path that is not readable as a file.
+    act: when read_keys is called.
+    assert: KeyInstallError is raised.
+    """
+    (keys_dir / "ssh_host_ed25519_key").mkdir(parents=True)
+
+    with pytest.raises(host_keys.KeyInstallError):
+        host_keys.read_keys()
+
+
+def test__calculate_fingerprint():
+    """
+    arrange: given a test fingerprint data.
+    act: when _calculate_fingerprint is called.
+    assert: correct fingerprint data is returned.
+    """
+    test_b64_pub_key_data = "AAAAB3NzaC1yc2EAAAADAQABAAABgQDt5qyv585y8lKFoirTyexOR9YwMSzihoDG/N6mi\
+    FzHv/22Fd/6NN96Xymf8HGoUdR6KhUZ3SQRwUmmPRb2eASaOBvDzDdSSzWT6N2DuW31WXw/Kw1DUXZ6AWyAH5O3Y5kvmD\
+    7prT3QGVgOKtm9Cy/EeXzNdbiK6sTbfER2k6KZpjdz/onA0iovd7N2SrxZwSfvhZ6sTpD//WDTmN/bV+W+6/d3zNYwak4\
+    mNPRNTC1hcjBryOMYJ2Q0MnjAtWf7MKU1IvNYiWUZlPKVBlPuDxML/4kSf5xbC/qG2EIyYsywHErfThX2sOZuU2gc+4+1\
+    mb1YZpEpPDGLN/l4Er2gtQaW8qes6JozuGmjU6+ZZt7sLqYrBSChJbHlDPDNee9mjMRVPXtppqzpmpZsYR7N7PoRC+KLe\
+    K/4OQKLtHSYxKVCf4dGaDvgxsoG4AyECE7is3bMlkc87GxhV0IEb1A1iZ3ycAxIrmP9G5g2Nao/OL9G4zVW9AY4Lg4M4k\
+    H26zctvb0="
+
+    assert (
+        host_keys._calculate_fingerprint(test_b64_pub_key_data)
+        == "uW23WW14JnjeVLUg4kWvbhWptvjAbODK2d4jJmnQyqI"
+    )
+
+
+def test_get_fingerprints_incomplete_init_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a monkeypatched paths that don't exist.
+    act: when get_fingerprints is called.
+    assert: IncompleteInitError is raised.
+    """
+    mock_path = MagicMock(spec=Path)
+    mock_path.exists.return_value = False
+    monkeypatch.setattr(host_keys, "KEYS_DIR", mock_path)
+
+    with pytest.raises(host_keys.IncompleteInitError):
+        host_keys.get_fingerprints()
+
+
+def test_get_fingerprints(monkeypatch: pytest.MonkeyPatch, keys_dir: Path):
+    """
+    arrange: given public key files and a monkeypatched _calculate_fingerprint method.
+    act: when get_fingerprints is called.
+    assert: Correct fingerprint data is returned.
+    """
+    keys_dir.mkdir()
+    (keys_dir / "ssh_host_rsa_key.pub").write_text("ssh-rsa AAAA", encoding="utf-8")
+    (keys_dir / "ssh_host_ed25519_key.pub").write_text("ssh-ed25519 AAAA", encoding="utf-8")
+    rsa_fingerprint = "rsa"
+    ed25519_fingerprint = "ed25519"
+    monkeypatch.setattr(
+        host_keys,
+        "_calculate_fingerprint",
+        MagicMock(
+            spec=host_keys._calculate_fingerprint,
+            side_effect=[(rsa_fingerprint), (ed25519_fingerprint)],
+        ),
+    )
+
+    assert (
+        host_keys.Fingerprints(
+            rsa=f"SHA256:{rsa_fingerprint}", ed25519=f"SHA256:{ed25519_fingerprint}"
+        )
+        == host_keys.get_fingerprints()
+    )
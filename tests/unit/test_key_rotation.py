@@ -0,0 +1,273 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm key_rotation module unit tests."""
+
+import time
+from unittest.mock import MagicMock
+
+import ops
+import pytest
+from ops.testing import Harness
+
+import host_keys
+from charm import TmateSSHServerOperatorCharm
+from shared_keys import SECRET_ID_KEY, Rotation
+from state import PEER_INTEGRATION_NAME
+
+from .factories import StateFactory
+
+# Need access to protected functions for testing
+# pylint: disable=protected-access
+
+APP_NAME = "tmate-ssh-server"
+NEXT_KEYS = {"ed25519": "next_ed25519_key"}
+NEXT_FINGERPRINTS = host_keys.Fingerprints(ed25519="next_ed25519")
+
+
+def test_on_rotate_keys_no_address(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+):
+    """
+    arrange: given a monkeypatched state.ip_addr that does not yet have a value.
+    act: when on_rotate_keys is called.
+    assert: the event is failed.
+    """
+    monkeypatch.setattr(charm.key_rotation, "state", StateFactory(ip_addr=None))
+
+    mock_event = MagicMock(spec=ops.ActionEvent)
+    charm.key_rotation.on_rotate_keys(mock_event)
+
+    mock_event.fail.assert_called_once()
+
+
+def test_on_rotate_keys_not_installed(monkeypatch: pytest.MonkeyPatch, harness: Harness):
+    """
+    arrange: given a leader unit with host keys that have not been installed.
+    act: when on_rotate_keys is called.
+    assert: the event is failed and no keys are staged.
+    """
+    harness.set_leader(True)
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+    monkeypatch.setattr(
+        charm.server_config_cache,
+        "fingerprints",
+        MagicMock(side_effect=host_keys.IncompleteInitError),
+    )
+    install_keys_mock = MagicMock(spec=host_keys.install_keys)
+    monkeypatch.setattr(host_keys, "install_keys", install_keys_mock)
+
+    mock_event = MagicMock(spec=ops.ActionEvent)
+    charm.key_rotation.on_rotate_keys(mock_event)
+
+    mock_event.fail.assert_called_once()
+    install_keys_mock.assert_not_called()
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test_on_rotate_keys_not_leader(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+):
+    """
+    arrange: given a unit that is not the leader.
+    act: when on_rotate_keys is called.
+    assert: the event is failed and no keys are staged.
+    """
+    install_keys_mock = MagicMock(spec=host_keys.install_keys)
+    monkeypatch.setattr(host_keys, "install_keys", install_keys_mock)
+
+    mock_event = MagicMock(spec=ops.ActionEvent)
+    charm.key_rotation.on_rotate_keys(mock_event)
+
+    mock_event.fail.assert_called_once()
+    install_keys_mock.assert_not_called()
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test_on_rotate_keys_error(monkeypatch: pytest.MonkeyPatch, harness: Harness):
+    """
+    arrange: given a leader unit and a monkeypatched install_keys that raises KeyInstallError.
+    act: when on_rotate_keys is called.
+    assert: the event is failed and no switch is scheduled.
+    """
+    harness.set_leader(True)
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+    monkeypatch.setattr(
+        host_keys,
+        "install_keys",
+        MagicMock(spec=host_keys.install_keys, side_effect=host_keys.KeyInstallError),
+    )
+
+    mock_event = MagicMock(spec=ops.ActionEvent)
+    charm.key_rotation.on_rotate_keys(mock_event)
+
+    mock_event.fail.assert_called_once()
+    assert not charm.key_rotation.switch_due()
+
+
+@pytest.mark.parametrize(
+    "overlap, due",
+    [
+        pytest.param(3600, False, id="within overlap window"),
+        pytest.param(0, True, id="no overlap window"),
+    ],
+)
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test_on_rotate_keys(
+    monkeypatch: pytest.MonkeyPatch,
+    harness: Harness,
+    fingerprints: host_keys.Fingerprints,
+    overlap: int,
+    due: bool,
+):
+    """
+    arrange: given a leader unit with installed host keys.
+    act: when on_rotate_keys is called with an overlap window.
+    assert: new keys are staged and shared with the other units, both fingerprint sets are
+        published and the switch is due after the overlap window.
+    """
+    harness.set_leader(True)
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+    next_fingerprints = host_keys.Fingerprints(rsa="next_rsa", ed25519="next_ed25519")
+    install_keys_mock = MagicMock(spec=host_keys.install_keys, return_value=next_fingerprints)
+    monkeypatch.setattr(host_keys, "install_keys", install_keys_mock)
+    update_relation_data_mock = MagicMock()
+    monkeypatch.setattr(charm.sshdebug, "update_relation_data", update_relation_data_mock)
+    publish_mock = MagicMock()
+    monkeypatch.setattr(charm.shared_keys, "publish", publish_mock)
+
+    mock_event = MagicMock(spec=ops.ActionEvent)
+    mock_event.params = {"overlap": overlap}
+    charm.key_rotation.on_rotate_keys(mock_event)
+
+    install_keys_mock.assert_called_once_with(
+        host_keys.STAGED_KEYS_DIR, host_key_config=charm.state.host_key_config
+    )
+    update_relation_data_mock.assert_called_once_with(
+        host=str(charm.state.ip_addr),
+        fingerprints=fingerprints,
+        next_fingerprints=next_fingerprints,
+    )
+    results = mock_event.set_results.call_args.args[0]
+    assert results["next-rsa-fingerprint"] == "next_rsa"
+    assert results["next-ed25519-fingerprint"] == "next_ed25519"
+    assert charm.key_rotation.switch_due() == due
+    publish_mock.assert_called_once_with(charm.key_rotation.switch_at)
+
+    charm.key_rotation.complete()
+
+    assert not charm.key_rotation.switch_due()
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test_follow_non_leader(
+    monkeypatch: pytest.MonkeyPatch, harness: Harness, fingerprints: host_keys.Fingerprints
+):
+    """
+    arrange: given a unit that is not the leader and a key rotation shared by the leader.
+    act: when the shared host keys change, twice.
+    assert: the keys staged by the leader are staged once, both fingerprint sets are published
+        and the switch is due only after the overlap window of the leader.
+    """
+    switch_at = time.time() + 3600
+    relation_id = harness.add_relation(PEER_INTEGRATION_NAME, APP_NAME)
+    secret_id = harness.add_model_secret(
+        APP_NAME,
+        {
+            "ed25519-key": "ed25519_key",
+            "next-ed25519-key": "next_ed25519_key",
+            "switch-at": str(switch_at),
+        },
+    )
+    harness.update_relation_data(relation_id, APP_NAME, {SECRET_ID_KEY: secret_id})
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+    write_keys_mock = MagicMock(
+        spec=host_keys.write_keys,
+        side_effect=lambda _, keys_dir=None: NEXT_FINGERPRINTS if keys_dir else fingerprints,
+    )
+    monkeypatch.setattr(host_keys, "write_keys", write_keys_mock)
+    update_relation_data_mock = MagicMock()
+    monkeypatch.setattr(charm.sshdebug, "update_relation_data", update_relation_data_mock)
+
+    charm._on_keys_changed(MagicMock(spec=ops.EventBase))
+    charm._on_keys_changed(MagicMock(spec=ops.EventBase))
+
+    write_keys_mock.assert_any_call(NEXT_KEYS, host_keys.STAGED_KEYS_DIR)
+    update_relation_data_mock.assert_called_once_with(
+        host=str(charm.state.ip_addr),
+        fingerprints=fingerprints,
+        next_fingerprints=NEXT_FINGERPRINTS,
+    )
+    assert charm.key_rotation.switch_at == switch_at
+    assert not charm.key_rotation.switch_due()
+
+
+def test_follow_leader(monkeypatch: pytest.MonkeyPatch, harness: Harness):
+    """
+    arrange: given a leader unit.
+    act: when follow is called with a rotation.
+    assert: nothing is staged, the leader stages its own keys.
+    """
+    harness.set_leader(True)
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+    write_keys_mock = MagicMock(spec=host_keys.write_keys)
+    monkeypatch.setattr(host_keys, "write_keys", write_keys_mock)
+
+    charm.key_rotation.follow(Rotation(keys=NEXT_KEYS, switch_at=1000.0))
+
+    write_keys_mock.assert_not_called()
+    assert not charm.key_rotation.switch_at
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test_follow_completed_by_leader(
+    monkeypatch: pytest.MonkeyPatch, charm: TmateSSHServerOperatorCharm
+):
+    """
+    arrange: given a unit that is not the leader following a key rotation.
+    act: when follow is called once the leader completed the rotation, twice.
+    assert: the staged keys are discarded once and the rotation is completed.
+    """
+    monkeypatch.setattr(
+        host_keys,
+        "write_keys",
+        MagicMock(spec=host_keys.write_keys, return_value=NEXT_FINGERPRINTS),
+    )
+    discard_mock = MagicMock(spec=host_keys.discard_staged_keys)
+    monkeypatch.setattr(host_keys, "discard_staged_keys", discard_mock)
+    charm.key_rotation.follow(Rotation(keys=NEXT_KEYS, switch_at=time.time() + 3600))
+
+    charm.key_rotation.follow(None)
+    charm.key_rotation.follow(None)
+
+    discard_mock.assert_called_once_with()
+    assert not charm.key_rotation.switch_at
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test_follow_switched_before_leader(
+    monkeypatch: pytest.MonkeyPatch, charm: TmateSSHServerOperatorCharm
+):
+    """
+    arrange: given a unit that is not the leader and switched to the keys of a rotation first.
+    act: when follow is called with the rotation the leader has not completed yet.
+    assert: the keys of the rotation are not staged again.
+    """
+    write_keys_mock = MagicMock(spec=host_keys.write_keys, return_value=NEXT_FINGERPRINTS)
+    monkeypatch.setattr(host_keys, "write_keys", write_keys_mock)
+    rotation = Rotation(keys=NEXT_KEYS, switch_at=time.time())
+    charm.key_rotation.follow(rotation)
+    assert charm.key_rotation.switch_due()
+    charm.key_rotation.complete()
+
+    charm.key_rotation.follow(rotation)
+
+    write_keys_mock.assert_called_once()
+    assert not charm.key_rotation.switch_due()
@@ -0,0 +1,170 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm pipeline module unit tests."""
+
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+import pipeline
+
+
+def test_run_concurrent_stages():
+    """
+    arrange: given two independent stages that wait on each other and a stage requiring both.
+    act: when run is called.
+    assert: the independent stages run concurrently and the dependent stage runs last with all
+        stage results returned.
+    """
+    barrier = threading.Barrier(2, timeout=5)
+    order = []
+
+    def independent(name: str) -> str:
+        """Wait until the other independent stage has started.
+
+        Args:
+            name: The stage name.
+
+        Returns:
+            The stage name.
+        """
+        barrier.wait()
+        order.append(name)
+        return name
+
+    results = pipeline.run(
+        [
+            pipeline.Stage(name="final", func=lambda: order.append("final"), requires=("a", "b")),
+            pipeline.Stage(name="a", func=lambda: independent("a")),
+            pipeline.Stage(name="b", func=lambda: independent("b")),
+        ]
+    )
+
+    assert order[-1] == "final"
+    assert results["a"] == "a"
+    assert results["b"] == "b"
+
+
+def test_run_stage_error():
+    """
+    arrange: given a failing stage and a stage requiring it.
+    act: when run is called.
+    assert: the stage exception is re-raised and the dependent stage is not run.
+    """
+    dependent = MagicMock()
+
+    with pytest.raises(ValueError):
+        pipeline.run(
+            [
+                pipeline.Stage(name="failing", func=MagicMock(side_effect=ValueError)),
+                pipeline.Stage(name="dependent", func=dependent, requires=("failing",)),
+            ]
+        )
+
+    dependent.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "stages",
+    [
+        pytest.param(
+            [pipeline.Stage(name="a", func=MagicMock()), pipeline.Stage(name="a", func=print)],
+            id="duplicate name",
+        ),
+        pytest.param(
+            [pipeline.Stage(name="a", func=MagicMock(), requires=("unknown",))],
+            id="unknown requirement",
+        ),
+        pytest.param(
+            [
+                pipeline.Stage(name="a", func=MagicMock(), requires=("b",)),
+                pipeline.Stage(name="b", func=MagicMock(), requires=("a",)),
+            ],
+            id="circular requirement",
+        ),
+    ],
+)
+def test_run_invalid_pipeline(stages: list[pipeline.Stage]):
+    """
+    arrange: given stages which do not form a valid dependency graph.
+    act: when run is called.
+    assert: PipelineError is raised.
+    """
+    with pytest.raises(pipeline.PipelineError):
+        pipeline.run(stages)
+
+
+def test_run_skips_checkpointed_stages():
+    """
+    arrange: given checkpoints of a stage with unchanged and a stage with changed inputs.
+    act: when run is called.
+    assert: only the changed stage and the stages requiring it run, and all are checkpointed.
+    """
+    unchanged, changed, dependent = MagicMock(), MagicMock(), MagicMock()
+    on_checkpoint = MagicMock()
+    checkpoints = {"unchanged": "fingerprint-1", "changed": "old", "dependent": "fingerprint-3"}
+
+    results = pipeline.run(
+        [
+            pipeline.Stage(name="unchanged", func=unchanged, fingerprint="fingerprint-1"),
+            pipeline.Stage(name="changed", func=changed, fingerprint="fingerprint-2"),
+            pipeline.Stage(
+                name="dependent",
+                func=dependent,
+                requires=("unchanged", "changed"),
+                fingerprint="fingerprint-3",
+            ),
+        ],
+        checkpoints=checkpoints,
+        on_checkpoint=on_checkpoint,
+    )
+
+    unchanged.assert_not_called()
+    changed.assert_called_once()
+    dependent.assert_called_once()
+    assert set(results) == {"changed", "dependent"}
+    assert checkpoints == {
+        "unchanged": "fingerprint-1",
+        "changed": "fingerprint-2",
+        "dependent": "fingerprint-3",
+    }
+    on_checkpoint.assert_called()
+
+
+def test_run_failed_stage_checkpoint_cleared():
+    """
+    arrange: given a checkpointed stage that must run again because its requirement ran.
+    act: when run is called and the stage fails.
+    assert: the checkpoint of the failed stage is removed.
+    """
+    checkpoints = {"dependent": "fingerprint-2"}
+
+    with pytest.raises(ValueError):
+        pipeline.run(
+            [
+                pipeline.Stage(name="first", func=MagicMock(), fingerprint="fingerprint-1"),
+                pipeline.Stage(
+                    name="dependent",
+                    func=MagicMock(side_effect=ValueError),
+                    requires=("first",),
+                    fingerprint="fingerprint-2",
+                ),
+            ],
+            checkpoints=checkpoints,
+        )
+
+    assert checkpoints == {"first": "fingerprint-1"}
+
+
+def test_fingerprint():
+    """
+    arrange: given stage inputs.
+    act: when fingerprint is called.
+    assert: equal inputs have equal fingerprints and different inputs different fingerprints.
+    """
+    assert pipeline.fingerprint("a", {"b": 1, "c": 2}) == pipeline.fingerprint(
+        "a", {"c": 2, "b": 1}
+    )
+    assert pipeline.fingerprint("a") != pipeline.fingerprint("b")
@@ -0,0 +1,464 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm prerequisites module unit tests."""
+
+import hashlib
+import tarfile
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from unittest.mock import MagicMock
+
+import pytest
+from charms.operator_libs_linux.v0 import apt
+
+import prerequisites
+
+from .factories import ProxyConfigFactory
+
+# Need access to protected functions for testing
+# pylint: disable=protected-access
+
+
+def test_install_dependencies_proxy_config(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given proxy config, mocked DOCKER_DAEMON_CONFIG_PATH and mocked apt module functions.
+    act: when install_dependencies is called.
+    assert: docker daemon configuration is written.
+    """
+    monkeypatch.setattr(prerequisites.apt, "update", MagicMock(spec=apt.update))
+    monkeypatch.setattr(prerequisites.apt, "add_package", MagicMock(spec=apt.add_package))
+    monkeypatch.setattr(
+        prerequisites.passwd, "add_group", MagicMock(spec=prerequisites.passwd.add_group)
+    )
+    monkeypatch.setattr(
+        prerequisites.passwd,
+        "add_user_to_group",
+        MagicMock(spec=prerequisites.passwd.add_user_to_group),
+    )
+    proxy_config = ProxyConfigFactory()
+
+    with NamedTemporaryFile() as temporary_docker_daemon_file:
+        monkeypatch.setattr(
+            prerequisites,
+            "DOCKER_DAEMON_CONFIG_PATH",
+            (tmp_file_path := Path(temporary_docker_daemon_file.name)),
+        )
+        # ProxyConfigFactory is not considered as ProxyConfig for mypy
+        prerequisites.install_dependencies(proxy_config=proxy_config)  # type: ignore
+
+        assert f"""{{
+  "proxies": {{
+    "http-proxy": "{proxy_config.http_proxy}",
+    "https-proxy": "{proxy_config.https_proxy}",
+    "no-proxy": "{proxy_config.no_proxy}"
+  }}
+}}""" == tmp_file_path.read_text(encoding="utf-8")
+
+
+def test_install_dependencies_single_transaction(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given mocked apt and passwd module functions.
+    act: when install_dependencies is called.
+    assert: every package is installed through a single add_package call with one freshness
+        aware cache refresh.
+    """
+    add_package_mock = MagicMock(spec=apt.add_package)
+    monkeypatch.setattr(prerequisites.apt, "add_package", add_package_mock)
+    monkeypatch.setattr(
+        prerequisites.passwd, "add_group", MagicMock(spec=prerequisites.passwd.add_group)
+    )
+    monkeypatch.setattr(
+        prerequisites.passwd,
+        "add_user_to_group",
+        MagicMock(spec=prerequisites.passwd.add_user_to_group),
+    )
+
+    prerequisites.install_dependencies()
+
+    add_package_mock.assert_called_once_with(
+        [*prerequisites.APT_DEPENDENCIES, prerequisites.DOCKER_PACKAGE],
+        update_cache=True,
+        cache_max_age=prerequisites.APT_CACHE_MAX_AGE,
+    )
+
+
+@pytest.mark.parametrize(
+    "exception",
+    [
+        pytest.param(apt.PackageNotFoundError, id="package not found"),
+        pytest.param(apt.PackageError, id="package error"),
+    ],
+)
+def test_install_dependencies_apt_error(
+    exception: type[Exception], monkeypatch: pytest.MonkeyPatch
+):
+    """
+    arrange: given a monkeypatched apt module that raises an exception.
+    act: when install_dependencies is called.
+    assert: DependencyInstallError is raised.
+    """
+    monkeypatch.setattr(prerequisites.apt, "update", MagicMock(spec=apt.update))
+    monkeypatch.setattr(
+        prerequisites.apt, "add_package", MagicMock(spec=apt.add_package, side_effect=[exception])
+    )
+
+    with pytest.raises(prerequisites.DependencySetupError):
+        prerequisites.install_dependencies()
+
+
+def _create_dependency_bundle(
+    path: Path, packages: list[str], index: bool = True, corrupt: bool = False
+) -> Path:
+    """Create a dependency bundle tarball with fake .deb files.
+
+    Args:
+        path: The directory to create the bundle in.
+        packages: The package names to include.
+        index: Whether to include the Packages index.
+        corrupt: Whether to list a wrong checksum in the index.
+
+    Returns:
+        The path to the bundle tarball.
+    """
+    content_dir = path / "content"
+    content_dir.mkdir()
+    stanzas = []
+    for package in packages:
+        deb = content_dir / f"{package}_1.0_amd64.deb"
+        deb.write_bytes(package.encode("utf-8"))
+        checksum = "0" * 64 if corrupt else hashlib.sha256(deb.read_bytes()).hexdigest()
+        stanzas.append(
+            f"Package: {package}\nVersion: 1.0\nFilename: ./{deb.name}\nSHA256: {checksum}\n"
+            " continued description line"
+        )
+    if index:
+        (content_dir / prerequisites.DEPENDENCY_BUNDLE_INDEX).write_text("\n\n".join(stanzas))
+    bundle_path = path / "bundle.tar.gz"
+    with tarfile.open(bundle_path, "w:gz") as bundle:
+        for member in content_dir.iterdir():
+            bundle.add(member, arcname=member.name)
+    return bundle_path
+
+
+@pytest.fixture(name="bundle_dir")
+def bundle_dir_fixture(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    """Monkeypatch the dependency bundle extraction directory and passwd functions."""
+    bundle_dir = tmp_path / "extracted"
+    monkeypatch.setattr(prerequisites, "DEPENDENCY_BUNDLE_DIR", bundle_dir)
+    monkeypatch.setattr(
+        prerequisites.passwd, "add_group", MagicMock(spec=prerequisites.passwd.add_group)
+    )
+    monkeypatch.setattr(
+        prerequisites.passwd,
+        "add_user_to_group",
+        MagicMock(spec=prerequisites.passwd.add_user_to_group),
+    )
+    return bundle_dir
+
+
+def test_install_dependencies_bundle(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, bundle_dir: Path
+):
+    """
+    arrange: given a dependency bundle containing all required packages.
+    act: when install_dependencies is called with the bundle.
+    assert: the bundled packages are installed in one offline apt-get call and apt mirrors are
+        not used.
+    """
+    add_package_mock = MagicMock(spec=apt.add_package)
+    monkeypatch.setattr(prerequisites.apt, "add_package", add_package_mock)
+    run_mock = MagicMock(spec=prerequisites.subprocess.run)
+    monkeypatch.setattr(prerequisites.subprocess, "run", run_mock)
+    packages = [*prerequisites.APT_DEPENDENCIES, prerequisites.DOCKER_PACKAGE]
+    bundle_path = _create_dependency_bundle(tmp_path, packages)
+
+    prerequisites.install_dependencies(bundle_path=bundle_path)
+
+    add_package_mock.assert_not_called()
+    run_mock.assert_called_once()
+    cmd = run_mock.call_args.args[0]
+    assert "--no-download" in cmd
+    debs = [str(bundle_dir / f"{package}_1.0_amd64.deb") for package in packages]
+    assert all(deb in cmd for deb in debs)
+
+
+@pytest.mark.parametrize(
+    "packages, index, corrupt",
+    [
+        pytest.param(["openssh-client", "docker.io"], False, False, id="missing index"),
+        pytest.param(["openssh-client", "docker.io"], True, True, id="checksum mismatch"),
+        pytest.param(["openssh-client"], True, False, id="missing package"),
+    ],
+)
+@pytest.mark.usefixtures("bundle_dir")
+def test_install_dependencies_bundle_invalid(
+    tmp_path: Path, packages: list[str], index: bool, corrupt: bool
+):
+    """
+    arrange: given an invalid dependency bundle.
+    act: when install_dependencies is called with the bundle.
+    assert: DependencySetupError is raised.
+    """
+    bundle_path = _create_dependency_bundle(tmp_path, packages, index=index, corrupt=corrupt)
+
+    with pytest.raises(prerequisites.DependencySetupError):
+        prerequisites.install_dependencies(bundle_path=bundle_path)
+
+
+@pytest.mark.usefixtures("bundle_dir")
+def test__file_sha256(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """
+    arrange: given a file larger than the chunks it is read in.
+    act: when _file_sha256 is called.
+    assert: the SHA256 checksum of the whole file is returned.
+    """
+    monkeypatch.setattr(prerequisites, "HASH_CHUNK_SIZE", 4)
+    path = tmp_path / "package.deb"
+    path.write_bytes(b"0123456789")
+
+    assert prerequisites._file_sha256(path) == hashlib.sha256(b"0123456789").hexdigest()
+
+
+def test_install_dependencies_bundle_index_field_missing(tmp_path: Path):
+    """
+    arrange: given a dependency bundle whose index stanza lacks the checksum field.
+    act: when install_dependencies is called with the bundle.
+    assert: DependencySetupError is raised.
+    """
+    bundle_path = tmp_path / "bundle.tar.gz"
+    index_path = tmp_path / prerequisites.DEPENDENCY_BUNDLE_INDEX
+    index_path.write_text("Package: docker.io\nVersion: 1.0\nFilename: ./docker.io.deb\n")
+    with tarfile.open(bundle_path, "w:gz") as bundle:
+        bundle.add(index_path, arcname=index_path.name)
+
+    with pytest.raises(prerequisites.DependencySetupError):
+        prerequisites.install_dependencies(bundle_path=bundle_path)
+
+
+@pytest.mark.usefixtures("bundle_dir")
+def test_install_dependencies_bundle_not_a_tarball(tmp_path: Path):
+    """
+    arrange: given a dependency bundle resource that is not a tarball.
+    act: when install_dependencies is called with the bundle.
+    assert: DependencySetupError is raised.
+    """
+    bundle_path = tmp_path / "bundle.tar.gz"
+    bundle_path.write_text("not a tarball")
+
+    with pytest.raises(prerequisites.DependencySetupError):
+        prerequisites.install_dependencies(bundle_path=bundle_path)
+
+
+@pytest.mark.usefixtures("bundle_dir")
+def test_install_dependencies_bundle_apt_error(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """
+    arrange: given a valid dependency bundle and an apt-get call that fails.
+    act: when install_dependencies is called with the bundle.
+    assert: DependencySetupError is raised.
+    """
+    monkeypatch.setattr(
+        prerequisites.subprocess,
+        "run",
+        MagicMock(
+            spec=prerequisites.subprocess.run,
+            side_effect=[
+                prerequisites.subprocess.CalledProcessError(returncode=100, cmd="apt-get")
+            ],
+        ),
+    )
+    bundle_path = _create_dependency_bundle(
+        tmp_path, [*prerequisites.APT_DEPENDENCIES, prerequisites.DOCKER_PACKAGE]
+    )
+
+    with pytest.raises(prerequisites.DependencySetupError):
+        prerequisites.install_dependencies(bundle_path=bundle_path)
+
+
+@pytest.mark.parametrize(
+    "load_output",
+    [
+        pytest.param(f"Loaded image: {prerequisites.IMAGE}\n", id="tagged image"),
+        pytest.param("Loaded image ID: sha256:0123\n", id="untagged image"),
+    ],
+)
+def test_load_image(monkeypatch: pytest.MonkeyPatch, load_output: str):
+    """
+    arrange: given a monkeypatched docker load and inspect call.
+    act: when load_image is called.
+    assert: the loaded image is inspected and its ID is returned.
+    """
+    run_mock = MagicMock(
+        spec=prerequisites.subprocess.run,
+        side_effect=[
+            MagicMock(stdout=load_output),
+            MagicMock(stdout="sha256:0123\n"),
+        ],
+    )
+    monkeypatch.setattr(prerequisites.subprocess, "run", run_mock)
+
+    assert prerequisites.load_image(Path("image.tar")) == "sha256:0123"
+    assert run_mock.call_args.args[0][-1] == load_output.split(":", 1)[1].strip()
+
+
+@pytest.mark.parametrize(
+    "side_effect",
+    [
+        pytest.param(
+            [prerequisites.subprocess.CalledProcessError(returncode=1, cmd="test")],
+            id="load error",
+        ),
+        pytest.param([MagicMock(stdout="")], id="no image loaded"),
+        pytest.param(
+            [
+                MagicMock(stdout=f"Loaded image: {prerequisites.IMAGE}\n"),
+                prerequisites.subprocess.CalledProcessError(returncode=1, cmd="test"),
+            ],
+            id="inspect error",
+        ),
+    ],
+)
+def test_load_image_error(monkeypatch: pytest.MonkeyPatch, side_effect: list):
+    """
+    arrange: given a monkeypatched docker call that fails or loads no image.
+    act: when load_image is called.
+    assert: DockerError is raised.
+    """
+    monkeypatch.setattr(
+        prerequisites.subprocess,
+        "run",
+        MagicMock(spec=prerequisites.subprocess.run, side_effect=side_effect),
+    )
+
+    with pytest.raises(prerequisites.DockerError):
+        prerequisites.load_image(Path("image.tar"))
+
+
+def test_pull_image(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a monkeypatched docker pull call.
+    act: when pull_image is called.
+    assert: the pulled image reference is returned.
+    """
+    monkeypatch.setattr(
+        prerequisites.subprocess, "run", MagicMock(spec=prerequisites.subprocess.run)
+    )
+
+    assert prerequisites.pull_image() == prerequisites.IMAGE
+
+
+def test_pull_image_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a monkeypatched docker pull call that fails.
+    act: when pull_image is called.
+    assert: DockerError is raised.
+    """
+    monkeypatch.setattr(
+        prerequisites.subprocess,
+        "run",
+        MagicMock(
+            spec=prerequisites.subprocess.run,
+            side_effect=[prerequisites.subprocess.CalledProcessError(returncode=1, cmd="test")],
+        ),
+    )
+
+    with pytest.raises(prerequisites.DockerError):
+        prerequisites.pull_image()
+
+
+@pytest.fixture(name="prebuilt_machine")
+def prebuilt_machine_fixture(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> MagicMock:
+    """Monkeypatch a machine with the dependencies and the tmate-ssh-server image present."""
+    installed = {
+        name: MagicMock(spec=apt.DebianPackage)
+        for name in [*prerequisites.APT_DEPENDENCIES, prerequisites.DOCKER_PACKAGE]
+    }
+    monkeypatch.setattr(
+        prerequisites.apt.DebianPackage,
+        "from_installed_packages",
+        MagicMock(spec=apt.DebianPackage.from_installed_packages, return_value=installed),
+    )
+    group = MagicMock(spec=prerequisites.grp.struct_group)
+    group.gr_mem = [prerequisites.USER]
+    monkeypatch.setattr(prerequisites.grp, "getgrnam", MagicMock(return_value=group))
+    monkeypatch.setattr(prerequisites, "DOCKER_DAEMON_CONFIG_PATH", tmp_path / "daemon.json")
+    run_mock = MagicMock(spec=prerequisites.subprocess.run)
+    run_mock.return_value.stdout = "sha256:0123\n"
+    monkeypatch.setattr(prerequisites.subprocess, "run", run_mock)
+    return run_mock
+
+
+def test_preflight(prebuilt_machine: MagicMock):
+    """
+    arrange: given a machine with the dependencies and the tmate-ssh-server image present.
+    act: when preflight is called.
+    assert: the dependencies are satisfied and the image ID is returned.
+    """
+    assert prerequisites.preflight() == prerequisites.Preflight(
+        dependencies=True, image="sha256:0123"
+    )
+    assert prebuilt_machine.call_args.args[0][-1] == prerequisites.IMAGE
+
+
+def test_preflight_proxy_config(prebuilt_machine: MagicMock):
+    """
+    arrange: given a pre-built machine and a proxy configuration.
+    act: when preflight is called before and after the dockerd proxy settings are written.
+    assert: the dependencies are only satisfied once the proxy settings are up to date.
+    """
+    proxy_config = ProxyConfigFactory()
+
+    # ProxyConfigFactory is not considered as ProxyConfig for mypy
+    assert not prerequisites.preflight(proxy_config).dependencies  # type: ignore
+    prerequisites._configure_docker_proxy(proxy_config)  # type: ignore
+    assert prerequisites.preflight(proxy_config).dependencies  # type: ignore
+    prebuilt_machine.assert_called()
+
+
+@pytest.mark.parametrize(
+    "attribute, mock",
+    [
+        pytest.param(
+            "from_installed_packages",
+            MagicMock(return_value={}),
+            id="packages missing",
+        ),
+        pytest.param(
+            "from_installed_packages",
+            MagicMock(side_effect=apt.PackageError),
+            id="package query failed",
+        ),
+        pytest.param("getgrnam", MagicMock(side_effect=KeyError), id="group missing"),
+        pytest.param(
+            "getgrnam",
+            MagicMock(return_value=MagicMock(gr_mem=[])),
+            id="user not in group",
+        ),
+    ],
+)
+def test_preflight_dependencies_missing(
+    monkeypatch: pytest.MonkeyPatch, prebuilt_machine: MagicMock, attribute: str, mock: MagicMock
+):
+    """
+    arrange: given a pre-built machine with a missing dependency.
+    act: when preflight is called.
+    assert: the dependencies are not satisfied and the image is not looked up.
+    """
+    target = prerequisites.grp if attribute == "getgrnam" else prerequisites.apt.DebianPackage
+    monkeypatch.setattr(target, attribute, mock)
+
+    assert prerequisites.preflight() == prerequisites.Preflight(dependencies=False, image=None)
+    prebuilt_machine.assert_not_called()
+
+
+def test_preflight_image_missing(prebuilt_machine: MagicMock):
+    """
+    arrange: given a pre-built machine without the tmate-ssh-server image.
+    act: when preflight is called.
+    assert: the dependencies are satisfied but no image is returned.
+    """
+    prebuilt_machine.side_effect = prerequisites.subprocess.CalledProcessError(
+        returncode=1, cmd="test"
+    )
+
+    assert prerequisites.preflight() == prerequisites.Preflight(dependencies=True, image=None)
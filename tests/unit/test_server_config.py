@@ -0,0 +1,73 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm server_config module unit tests."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+import host_keys
+import tmate
+from charm import TmateSSHServerOperatorCharm
+
+
+def test_fingerprints_cached(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+    fingerprints: host_keys.Fingerprints,
+):
+    """
+    arrange: given unchanged and then replaced key files.
+    act: when fingerprints is called repeatedly.
+    assert: the fingerprints are only computed again once the key files change.
+    """
+    get_fingerprints_mock = MagicMock(spec=host_keys.get_fingerprints, return_value=fingerprints)
+    monkeypatch.setattr(host_keys, "get_fingerprints", get_fingerprints_mock)
+    key_files_id_mock = MagicMock(spec=host_keys.key_files_id, return_value="key-files")
+    monkeypatch.setattr(host_keys, "key_files_id", key_files_id_mock)
+
+    assert charm.server_config_cache.fingerprints() == fingerprints
+    assert charm.server_config_cache.fingerprints() == fingerprints
+    assert get_fingerprints_mock.call_count == 1
+
+    key_files_id_mock.return_value = "replaced"
+
+    assert charm.server_config_cache.fingerprints() == fingerprints
+    assert get_fingerprints_mock.call_count == 2
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints")
+def test_tmate_conf_cached(
+    monkeypatch: pytest.MonkeyPatch,
+    charm: TmateSSHServerOperatorCharm,
+    fingerprints: host_keys.Fingerprints,
+):
+    """
+    arrange: given a monkeypatched generate_tmate_conf.
+    act: when tmate_conf is called for the same host twice and then for another host.
+    assert: the tmate.conf is only generated again for the other host.
+    """
+    generate_mock = MagicMock(spec=tmate.generate_tmate_conf, side_effect=["conf-1", "conf-2"])
+    monkeypatch.setattr(tmate, "generate_tmate_conf", generate_mock)
+
+    assert charm.server_config_cache.tmate_conf("10.0.0.10") == "conf-1"
+    assert charm.server_config_cache.tmate_conf("10.0.0.10") == "conf-1"
+    assert charm.server_config_cache.tmate_conf("10.0.0.11") == "conf-2"
+    generate_mock.assert_called_with("10.0.0.11", fingerprints=fingerprints)
+
+
+def test_tmate_conf_error(monkeypatch: pytest.MonkeyPatch, charm: TmateSSHServerOperatorCharm):
+    """
+    arrange: given host keys that have not been generated.
+    act: when tmate_conf is called.
+    assert: FingerprintError is raised.
+    """
+    monkeypatch.setattr(
+        host_keys,
+        "key_files_id",
+        MagicMock(spec=host_keys.key_files_id, side_effect=[host_keys.IncompleteInitError]),
+    )
+
+    with pytest.raises(tmate.FingerprintError):
+        charm.server_config_cache.tmate_conf("10.0.0.10")
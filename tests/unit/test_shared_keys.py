@@ -0,0 +1,225 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm shared_keys module unit tests."""
+
+import typing
+from unittest.mock import MagicMock
+
+import pytest
+from ops.testing import Harness
+
+import host_keys
+from charm import TmateSSHServerOperatorCharm
+from shared_keys import REVISION_KEY, SECRET_ID_KEY, Rotation
+from state import PEER_INTEGRATION_NAME
+
+APP_NAME = "tmate-ssh-server"
+KEYS = {"rsa": "rsa_key", "ed25519": "ed25519_key"}
+CONTENT = {"rsa-key": "rsa_key", "ed25519-key": "ed25519_key"}
+NEXT_KEYS = {"ed25519": "next_ed25519_key"}
+ROTATION_CONTENT = {**CONTENT, "next-ed25519-key": "next_ed25519_key", "switch-at": "1000.5"}
+
+
+@pytest.fixture(name="read_keys")
+def read_keys_fixture(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    """Monkeypatch the installed host keys."""
+    read_keys_mock = MagicMock(spec=host_keys.read_keys, return_value=KEYS)
+    monkeypatch.setattr(host_keys, "read_keys", read_keys_mock)
+    return read_keys_mock
+
+
+@pytest.mark.usefixtures("keys_dir")
+def test_get(harness: Harness):
+    """
+    arrange: given a unit that is not the leader and host keys shared by the leader.
+    act: when get is called.
+    assert: the shared host keys are returned.
+    """
+    relation_id = harness.add_relation(PEER_INTEGRATION_NAME, APP_NAME)
+    secret_id = harness.add_model_secret(APP_NAME, CONTENT)
+    harness.update_relation_data(relation_id, APP_NAME, {SECRET_ID_KEY: secret_id})
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+
+    assert charm.shared_keys.get() == KEYS
+
+
+@pytest.mark.parametrize(
+    "leader, relation, shared",
+    [
+        pytest.param(True, True, True, id="leader"),
+        pytest.param(False, False, False, id="no peer integration"),
+        pytest.param(False, True, False, id="not shared yet"),
+    ],
+)
+@pytest.mark.usefixtures("keys_dir")
+def test_get_none(harness: Harness, leader: bool, relation: bool, shared: bool):
+    """
+    arrange: given a leader unit, or host keys not shared yet.
+    act: when get is called.
+    assert: None is returned.
+    """
+    harness.set_leader(leader)
+    relation_id = harness.add_relation(PEER_INTEGRATION_NAME, APP_NAME) if relation else None
+    if relation_id is not None and shared:
+        secret_id = harness.add_model_secret(APP_NAME, CONTENT)
+        harness.update_relation_data(relation_id, APP_NAME, {SECRET_ID_KEY: secret_id})
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+
+    assert charm.shared_keys.get() is None
+
+
+@pytest.mark.usefixtures("keys_dir")
+def test_get_secret_not_found(harness: Harness):
+    """
+    arrange: given a unit that is not the leader and a shared secret ID that does not exist.
+    act: when get is called.
+    assert: None is returned.
+    """
+    relation_id = harness.add_relation(PEER_INTEGRATION_NAME, APP_NAME)
+    harness.update_relation_data(relation_id, APP_NAME, {SECRET_ID_KEY: "secret:missing"})
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+
+    assert charm.shared_keys.get() is None
+
+
+@pytest.mark.parametrize(
+    "content, rotation",
+    [
+        pytest.param(ROTATION_CONTENT, Rotation(keys=NEXT_KEYS, switch_at=1000.5), id="rotation"),
+        pytest.param(CONTENT, None, id="no rotation"),
+    ],
+)
+@pytest.mark.usefixtures("keys_dir")
+def test_rotation(harness: Harness, content: dict[str, str], rotation: typing.Optional[Rotation]):
+    """
+    arrange: given a unit that is not the leader and host keys shared by the leader.
+    act: when rotation is called.
+    assert: the keys staged by the leader and the time to switch to them are returned, if any.
+    """
+    relation_id = harness.add_relation(PEER_INTEGRATION_NAME, APP_NAME)
+    secret_id = harness.add_model_secret(APP_NAME, content)
+    harness.update_relation_data(relation_id, APP_NAME, {SECRET_ID_KEY: secret_id})
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+
+    assert charm.shared_keys.rotation() == rotation
+    assert charm.shared_keys.get() == KEYS
+
+
+@pytest.mark.usefixtures("keys_dir")
+def test_rotation_leader(harness: Harness):
+    """
+    arrange: given a leader unit.
+    act: when rotation is called.
+    assert: None is returned, the leader staged the keys itself.
+    """
+    harness.set_leader(True)
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+
+    assert charm.shared_keys.rotation() is None
+
+
+@pytest.mark.usefixtures("keys_dir")
+def test_publish(harness: Harness, read_keys: MagicMock):
+    """
+    arrange: given a leader unit with installed host keys.
+    act: when publish is called before and after the host keys change.
+    assert: the host keys are shared in a secret, updated with a new revision marker only when
+        the host keys change.
+    """
+    harness.set_leader(True)
+    relation_id = harness.add_relation(PEER_INTEGRATION_NAME, APP_NAME)
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+
+    charm.shared_keys.publish()
+    charm.shared_keys.publish()
+
+    secret_id = harness.get_relation_data(relation_id, APP_NAME)[SECRET_ID_KEY]
+    assert harness.get_secret_revisions(secret_id) == [1]
+    assert harness.model.get_secret(id=secret_id).get_content() == CONTENT
+    revision = harness.get_relation_data(relation_id, APP_NAME)[REVISION_KEY]
+
+    read_keys.return_value = {"ed25519": "new_ed25519_key"}
+    charm.shared_keys.publish()
+
+    assert harness.get_secret_revisions(secret_id) == [1, 2]
+    assert harness.model.get_secret(id=secret_id).get_content(refresh=True) == {
+        "ed25519-key": "new_ed25519_key"
+    }
+    assert harness.get_relation_data(relation_id, APP_NAME)[REVISION_KEY] != revision
+
+
+@pytest.mark.usefixtures("keys_dir")
+def test_publish_not_leader(harness: Harness, read_keys: MagicMock):
+    """
+    arrange: given a unit that is not the leader.
+    act: when publish is called.
+    assert: the host keys are not shared.
+    """
+    relation_id = harness.add_relation(PEER_INTEGRATION_NAME, APP_NAME)
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+
+    charm.shared_keys.publish()
+
+    read_keys.assert_not_called()
+    assert SECRET_ID_KEY not in harness.get_relation_data(relation_id, APP_NAME)
+
+
+@pytest.mark.usefixtures("keys_dir")
+def test_publish_rotation(harness: Harness, read_keys: MagicMock):
+    """
+    arrange: given a leader unit with installed host keys and host keys staged by a rotation.
+    act: when publish is called during the rotation and once the staged keys are activated.
+    assert: the staged keys and the switch time are shared only during the rotation, with a new
+        revision marker.
+    """
+    harness.set_leader(True)
+    relation_id = harness.add_relation(PEER_INTEGRATION_NAME, APP_NAME)
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+    read_keys.side_effect = lambda keys_dir=None: NEXT_KEYS if keys_dir else KEYS
+
+    charm.shared_keys.publish(1000.5)
+
+    secret_id = harness.get_relation_data(relation_id, APP_NAME)[SECRET_ID_KEY]
+    assert harness.model.get_secret(id=secret_id).get_content() == ROTATION_CONTENT
+    revision = harness.get_relation_data(relation_id, APP_NAME)[REVISION_KEY]
+
+    read_keys.side_effect = lambda keys_dir=None: {} if keys_dir else KEYS
+    charm.shared_keys.publish(1000.5)
+
+    assert harness.model.get_secret(id=secret_id).get_content(refresh=True) == CONTENT
+    assert harness.get_relation_data(relation_id, APP_NAME)[REVISION_KEY] != revision
+
+
+@pytest.mark.usefixtures("patch_get_fingerprints", "keys_dir")
+def test_revision_changed_follows_rotation(
+    monkeypatch: pytest.MonkeyPatch, harness: Harness, fingerprints: host_keys.Fingerprints
+):
+    """
+    arrange: given a unit that is not the leader and a rotation shared by the leader.
+    act: when the leader publishes a new revision marker of the shared host keys.
+    assert: the peer relation-changed event makes the unit install the keys and follow the
+        rotation.
+    """
+    relation_id = harness.add_relation(PEER_INTEGRATION_NAME, APP_NAME)
+    secret_id = harness.add_model_secret(APP_NAME, ROTATION_CONTENT)
+    harness.update_relation_data(relation_id, APP_NAME, {SECRET_ID_KEY: secret_id})
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+    write_keys_mock = MagicMock(spec=host_keys.write_keys, return_value=fingerprints)
+    monkeypatch.setattr(host_keys, "write_keys", write_keys_mock)
+    follow_mock = MagicMock()
+    monkeypatch.setattr(charm.key_rotation, "follow", follow_mock)
+
+    harness.update_relation_data(relation_id, APP_NAME, {REVISION_KEY: "revision"})
+
+    write_keys_mock.assert_called_once_with(KEYS)
+    follow_mock.assert_called_once_with(Rotation(keys=NEXT_KEYS, switch_at=1000.5))
@@ -9,6 +9,7 @@ import ops
 import pytest
 from ops.testing import Harness
 
+import host_keys
 import tmate
 from charm import TmateSSHServerOperatorCharm
 from ssh_debug import DEBUG_SSH_INTEGRATION_NAME
@@ -22,20 +23,21 @@ from .factories import StateFactory
 def test_update_relation_data_no_relations(
     monkeypatch: pytest.MonkeyPatch,
     harness: Harness,
-    fingerprints: tmate.Fingerprints,
+    fingerprints: host_keys.Fingerprints,
 ):
     """
-    arrange: given debug_ssh integration.
+    arrange: given debug_ssh integration and two workers.
     act: when update_relation_data is called.
-    assert: relation data is correctly updated.
+    assert: relation data is correctly updated, with the ports of all workers.
     """
     monkeypatch.setattr(
-        tmate,
+        host_keys,
         "get_fingerprints",
-        MagicMock(spec=tmate.get_fingerprints, return_value=fingerprints),
+        MagicMock(spec=host_keys.get_fingerprints, return_value=fingerprints),
     )
     relation_id = harness.add_relation(DEBUG_SSH_INTEGRATION_NAME, "github_runner")
     harness.add_relation_unit(relation_id, "github_runner/0")
+    harness.update_config({"workers": 2})
     harness.begin()
 
     charm: TmateSSHServerOperatorCharm = harness.charm
@@ -45,29 +47,58 @@ def test_update_relation_data_no_relations(
     assert relation_data == {
         "host": "host",
         "port": str(tmate.PORT),
+        "ports": "10022,10023",
         "rsa_fingerprint": fingerprints.rsa,
         "ed25519_fingerprint": fingerprints.ed25519,
     }
 
 
+def test_update_relation_data_next_fingerprints(
+    harness: Harness,
+    fingerprints: host_keys.Fingerprints,
+):
+    """
+    arrange: given debug_ssh integration.
+    act: when update_relation_data is called with and then without next fingerprints.
+    assert: the next fingerprints are published and then removed from the relation data.
+    """
+    relation_id = harness.add_relation(DEBUG_SSH_INTEGRATION_NAME, "github_runner")
+    harness.add_relation_unit(relation_id, "github_runner/0")
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+    next_fingerprints = host_keys.Fingerprints(rsa="next_rsa", ed25519="next_ed25519")
+
+    charm.sshdebug.update_relation_data("host", fingerprints, next_fingerprints)
+
+    relation_data = harness.get_relation_data(relation_id, charm.unit)
+    assert relation_data["next_rsa_fingerprint"] == "next_rsa"
+    assert relation_data["next_ed25519_fingerprint"] == "next_ed25519"
+
+    charm.sshdebug.update_relation_data("host", fingerprints)
+
+    relation_data = harness.get_relation_data(relation_id, charm.unit)
+    assert "next_rsa_fingerprint" not in relation_data
+    assert "next_ed25519_fingerprint" not in relation_data
+
+
 def test__on_ssh_debug_relation_joined_error(
     monkeypatch: pytest.MonkeyPatch,
     charm: TmateSSHServerOperatorCharm,
 ):
     """
-    arrange: given a monkeypatched tmate.get_fingerprints that raises a IncompleteInitError.
+    arrange: given a monkeypatched host_keys.get_fingerprints that raises a IncompleteInitError.
     act: when _on_ssh_debug_relation_joined is called.
     assert: the charm raises an error.
     """
     monkeypatch.setattr(
-        tmate,
+        host_keys,
         "get_fingerprints",
-        MagicMock(spec=tmate.get_fingerprints, side_effect=[tmate.IncompleteInitError]),
+        MagicMock(spec=host_keys.get_fingerprints, side_effect=[host_keys.IncompleteInitError]),
     )
 
     mock_event = MagicMock(spec=ops.RelationJoinedEvent)
 
-    with pytest.raises(tmate.IncompleteInitError):
+    with pytest.raises(host_keys.IncompleteInitError):
         charm.sshdebug._on_ssh_debug_relation_joined(mock_event)
 
 
@@ -75,7 +106,7 @@ def test__on_ssh_debug_relation_joined_error(
 def test__on_ssh_debug_relation_joined(
     monkeypatch: pytest.MonkeyPatch,
     charm: TmateSSHServerOperatorCharm,
-    fingerprints: tmate.Fingerprints,
+    fingerprints: host_keys.Fingerprints,
 ):
     """
     arrange: given a monkeypatched get_fingerprints returning fingerprint data and state.
@@ -84,6 +115,11 @@ def test__on_ssh_debug_relation_joined(
     """
     mock_state = StateFactory()
     monkeypatch.setattr(charm.sshdebug, "state", mock_state)
+    monkeypatch.setattr(
+        host_keys,
+        "staged_fingerprints",
+        MagicMock(spec=host_keys.staged_fingerprints, return_value=None),
+    )
     mock_update_relation_data = MagicMock()
     monkeypatch.setattr(charm.sshdebug, "update_relation_data", mock_update_relation_data)
 
@@ -91,5 +127,28 @@ def test__on_ssh_debug_relation_joined(
     charm.sshdebug._on_ssh_debug_relation_joined(mock_event)
 
     mock_update_relation_data.assert_called_once_with(
-        host=mock_state.ip_addr, fingerprints=fingerprints
+        host=mock_state.ip_addr, fingerprints=fingerprints, next_fingerprints=None
     )
+
+
+def test_update_relation_data_algorithms(harness: Harness, fingerprints: host_keys.Fingerprints):
+    """
+    arrange: given debug_ssh integration with published RSA and ed25519 fingerprints.
+    act: when update_relation_data is called with ed25519 fingerprints only.
+    assert: the RSA fingerprint is removed.
+    """
+    relation_id = harness.add_relation(DEBUG_SSH_INTEGRATION_NAME, "github_runner")
+    harness.add_relation_unit(relation_id, "github_runner/0")
+    harness.begin()
+    charm: TmateSSHServerOperatorCharm = harness.charm
+    charm.sshdebug.update_relation_data("host", fingerprints)
+
+    charm.sshdebug.update_relation_data("host", host_keys.Fingerprints(ed25519="ed25519"))
+
+    relation_data = harness.get_relation_data(relation_id, charm.unit)
+    assert relation_data == {
+        "host": "host",
+        "port": str(tmate.PORT),
+        "ports": str(tmate.PORT),
+        "ed25519_fingerprint": "ed25519",
+    }
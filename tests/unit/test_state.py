@@ -3,6 +3,7 @@
 
 """tmate-ssh-server charm state unit tests."""
 
+import typing
 from unittest.mock import MagicMock
 
 import ops
@@ -35,6 +36,7 @@ def test_invalid_bind_address():
     mock_binding = MagicMock(spec=ops.Binding)
     mock_binding.network.bind_address = "invalid_address"
     mock_charm = MagicMock(spec=ops.CharmBase)
+    mock_charm.config = {}
     mock_charm.model.get_binding.return_value = mock_binding
 
     with pytest.raises(state.InvalidCharmStateError):
@@ -48,6 +50,139 @@ def test_bind_address_not_ready():
     assert: ip_addr is None.
     """
     mock_charm = MagicMock(spec=ops.CharmBase)
+    mock_charm.config = {}
     mock_charm.model.get_binding.return_value = None
 
     assert not State.from_charm(mock_charm).ip_addr
+
+
+@pytest.mark.parametrize(
+    "config, expected",
+    [
+        pytest.param({}, state.HostKeyConfig(("ed25519", "rsa"), 3072), id="default"),
+        pytest.param(
+            {"host-key-algorithms": "ed25519"},
+            state.HostKeyConfig(("ed25519",), 3072),
+            id="ed25519 only",
+        ),
+        pytest.param(
+            {"host-key-algorithms": "ed25519,rsa", "rsa-key-size": 4096},
+            state.HostKeyConfig(("ed25519", "rsa"), 4096),
+            id="ed25519 and rsa",
+        ),
+    ],
+)
+def test_host_key_config(config: dict, expected: state.HostKeyConfig):
+    """
+    arrange: given a host key configuration.
+    act: when the host key configuration is initialized.
+    assert: the configured algorithms and RSA key size are returned.
+    """
+    mock_charm = MagicMock(spec=ops.CharmBase)
+    mock_charm.config = config
+
+    assert state.HostKeyConfig.from_charm(mock_charm) == expected
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        pytest.param({"host-key-algorithms": "ed25519,dsa"}, id="unsupported algorithm"),
+        pytest.param({"host-key-algorithms": "ed25519,ecdsa"}, id="ecdsa not loaded by server"),
+        pytest.param({"host-key-algorithms": "rsa"}, id="ed25519 missing"),
+        pytest.param({"rsa-key-size": 1024}, id="unsupported rsa key size"),
+    ],
+)
+def test_host_key_config_invalid(config: dict):
+    """
+    arrange: given an invalid host key configuration.
+    act: when the charm state is initialized.
+    assert: CharmConfigInvalidError is raised.
+    """
+    mock_charm = MagicMock(spec=ops.CharmBase)
+    mock_charm.config = config
+
+    with pytest.raises(state.CharmConfigInvalidError):
+        State.from_charm(mock_charm)
+
+
+@pytest.mark.parametrize(
+    "config, expected",
+    [
+        pytest.param({}, state.RestartPolicy(2, 5, 300), id="default"),
+        pytest.param(
+            {"restart-delay": 0, "start-limit-burst": 1, "start-limit-interval": 0},
+            state.RestartPolicy(0, 1, 0),
+            id="configured",
+        ),
+    ],
+)
+def test_restart_policy(config: dict, expected: state.RestartPolicy):
+    """
+    arrange: given a restart policy configuration.
+    act: when the restart policy is initialized.
+    assert: the configured restart delay and start limit are returned.
+    """
+    mock_charm = MagicMock(spec=ops.CharmBase)
+    mock_charm.config = config
+
+    assert state.RestartPolicy.from_charm(mock_charm) == expected
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        pytest.param({"restart-delay": -1}, id="negative restart delay"),
+        pytest.param({"start-limit-interval": -1}, id="negative start limit interval"),
+        pytest.param({"start-limit-burst": 0}, id="no start allowed"),
+    ],
+)
+def test_restart_policy_invalid(config: dict):
+    """
+    arrange: given an invalid restart policy configuration.
+    act: when the charm state is initialized.
+    assert: CharmConfigInvalidError is raised.
+    """
+    mock_charm = MagicMock(spec=ops.CharmBase)
+    mock_charm.config = config
+
+    with pytest.raises(state.CharmConfigInvalidError):
+        State.from_charm(mock_charm)
+
+
+@pytest.mark.parametrize(
+    "config, cpu_count, expected",
+    [
+        pytest.param({}, 16, 1, id="default"),
+        pytest.param({"workers": 4}, 16, 4, id="configured"),
+        pytest.param({"workers": 0}, 16, 16, id="per CPU core"),
+        pytest.param({"workers": 0}, None, 1, id="CPU count unknown"),
+    ],
+)
+def test_workers(
+    monkeypatch: pytest.MonkeyPatch, config: dict, cpu_count: typing.Optional[int], expected: int
+):
+    """
+    arrange: given a workers configuration and a machine CPU count.
+    act: when the charm state is initialized.
+    assert: the configured number of workers, or one per CPU core, is returned.
+    """
+    monkeypatch.setattr(state.os, "cpu_count", lambda: cpu_count)
+    mock_charm = MagicMock(spec=ops.CharmBase)
+    mock_charm.config = config
+    mock_charm.model.get_binding.return_value = None
+
+    assert State.from_charm(mock_charm).workers == expected
+
+
+def test_workers_invalid():
+    """
+    arrange: given a negative workers configuration.
+    act: when the charm state is initialized.
+    assert: CharmConfigInvalidError is raised.
+    """
+    mock_charm = MagicMock(spec=ops.CharmBase)
+    mock_charm.config = {"workers": -1}
+
+    with pytest.raises(state.CharmConfigInvalidError):
+        State.from_charm(mock_charm)
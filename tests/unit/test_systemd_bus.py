@@ -0,0 +1,461 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm systemd_bus module unit tests."""
+
+import collections
+import contextlib
+import subprocess  # nosec
+import typing
+from unittest.mock import MagicMock
+
+import jeepney
+import pytest
+
+import systemd_bus
+
+# The service manager factory, before the service_manager fixture replaces it.
+get_manager = systemd_bus.manager
+JOB = "/org/freedesktop/systemd1/job/42"
+UNIT_PATH = "/org/freedesktop/systemd1/unit/tmate_2dssh_2dserver_2eservice"
+
+
+class FakeSystemdConnection:
+    """System bus connection answering like systemd.
+
+    Attributes:
+        calls: The member and body of the method calls.
+        job_results: The results of the queued jobs, None to never complete a job.
+        errors: The D-Bus error names to reply with, by member.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the connection."""
+        self.calls: list[tuple[str, tuple]] = []
+        self.job_results: list[typing.Optional[str]] = ["done"]
+        self.errors: dict[str, str] = {}
+        self._queues: list[collections.deque] = []
+
+    def _job_removed(self, job: str, result: str) -> jeepney.Message:
+        """Build a JobRemoved signal.
+
+        Args:
+            job: The object path of the job.
+            result: The result of the job.
+
+        Returns:
+            The signal.
+        """
+        emitter = jeepney.DBusAddress(
+            systemd_bus.SYSTEMD_PATH, interface=systemd_bus.MANAGER_INTERFACE
+        )
+        return jeepney.new_signal(
+            emitter, "JobRemoved", "uoss", (42, job, "tmate-ssh-server.service", result)
+        )
+
+    def _reply(self, message: jeepney.Message) -> jeepney.Message:
+        """Answer a method call.
+
+        Args:
+            message: The method call.
+
+        Returns:
+            The method return.
+        """
+        member = message.header.fields[jeepney.HeaderFields.member]
+        if member in ("StartUnit", "StopUnit"):
+            result = self.job_results.pop(0)
+            for queue in self._queues:
+                queue.append(self._job_removed("/org/freedesktop/systemd1/job/41", "done"))
+                if result:
+                    queue.append(self._job_removed(JOB, result))
+            return jeepney.new_method_return(message, "o", (JOB,))
+        if member == "EnableUnitFiles":
+            return jeepney.new_method_return(message, "ba(sss)", (False, []))
+        if member == "LoadUnit":
+            return jeepney.new_method_return(message, "o", (UNIT_PATH,))
+        if member == "GetAll" and message.body == (systemd_bus.UNIT_INTERFACE,):
+            return jeepney.new_method_return(
+                message, "a{sv}", ({"ActiveState": ("s", "active"), "Id": ("s", "tmate")},)
+            )
+        if member == "GetAll":
+            return jeepney.new_method_return(
+                message,
+                "a{sv}",
+                (
+                    {
+                        "MainPID": ("u", 1234),
+                        "MemoryCurrent": ("t", systemd_bus.UINT64_MAX),
+                        "ExecMainStartTimestamp": ("t", 1736157600123456),
+                        "ExecMainExitTimestamp": ("t", 0),
+                    },
+                ),
+            )
+        return jeepney.new_method_return(message)
+
+    def send_and_get_reply(
+        self, message: jeepney.Message, timeout: typing.Optional[float] = None
+    ) -> jeepney.Message:
+        """Answer a method call.
+
+        Args:
+            message: The method call.
+            timeout: The timeout of the call.
+
+        Returns:
+            The method return, or error.
+        """
+        assert timeout
+        member = message.header.fields[jeepney.HeaderFields.member]
+        self.calls.append((member, message.body))
+        if error := self.errors.get(member):
+            return jeepney.new_error(message, error, "s", ("error message",))
+        return self._reply(message)
+
+    @contextlib.contextmanager
+    def filter(
+        self, rule: jeepney.MatchRule, bufsize: int = 1
+    ) -> typing.Iterator[collections.deque]:
+        """Queue the signals received.
+
+        Args:
+            rule: The rule matching the queued signals.
+            bufsize: The maximum number of queued signals.
+
+        Yields:
+            The signal queue.
+        """
+        assert rule == systemd_bus.JOB_REMOVED_RULE
+        queue: collections.deque = collections.deque(maxlen=bufsize)
+        self._queues.append(queue)
+        yield queue
+        self._queues.remove(queue)
+
+    def recv_until_filtered(
+        self, queue: collections.deque, timeout: typing.Optional[float] = None
+    ) -> jeepney.Message:
+        """Receive the next queued signal.
+
+        Args:
+            queue: The signal queue.
+            timeout: The timeout in seconds.
+
+        Returns:
+            The signal.
+
+        Raises:
+            TimeoutError: if no signal is queued.
+        """
+        assert timeout is not None
+        if not queue:
+            raise TimeoutError("No signal received.")
+        return queue.popleft()
+
+
+@pytest.fixture(name="connection")
+def connection_fixture() -> FakeSystemdConnection:
+    """Fake system bus connection to systemd."""
+    return FakeSystemdConnection()
+
+
+@pytest.fixture(name="manager")
+def manager_fixture(connection: FakeSystemdConnection) -> systemd_bus.DBusManager:
+    """D-Bus service manager of the fake systemd."""
+    return systemd_bus.DBusManager(typing.cast(typing.Any, connection))
+
+
+def test_daemon_reload(connection: FakeSystemdConnection, manager: systemd_bus.DBusManager):
+    """
+    arrange: given a D-Bus service manager.
+    act: when daemon_reload is called.
+    assert: systemd reloads the unit files.
+    """
+    manager.daemon_reload()
+
+    assert connection.calls == [("Reload", ())]
+
+
+def test_service_enable(connection: FakeSystemdConnection, manager: systemd_bus.DBusManager):
+    """
+    arrange: given a D-Bus service manager.
+    act: when service_enable is called.
+    assert: the unit file is enabled and the unit files are reloaded.
+    """
+    manager.service_enable("tmate-ssh-server")
+
+    assert connection.calls == [
+        ("EnableUnitFiles", (["tmate-ssh-server.service"], False, True)),
+        ("Reload", ()),
+    ]
+
+
+def test_service_disable(connection: FakeSystemdConnection, manager: systemd_bus.DBusManager):
+    """
+    arrange: given a D-Bus service manager.
+    act: when service_disable is called.
+    assert: the unit file is disabled and the unit files are reloaded.
+    """
+    manager.service_disable("tmate-ssh-server@10022")
+
+    assert connection.calls == [
+        ("DisableUnitFiles", (["tmate-ssh-server@10022.service"], False)),
+        ("Reload", ()),
+    ]
+
+
+def test_service_start(connection: FakeSystemdConnection, manager: systemd_bus.DBusManager):
+    """
+    arrange: given a D-Bus service manager.
+    act: when service_start and service_stop are called.
+    assert: the job signals are subscribed to once and each job is waited for.
+    """
+    connection.job_results = ["done", "done"]
+
+    manager.service_start("tmate-ssh-server")
+    manager.service_stop("tmate-ssh-server")
+
+    assert [member for member, _ in connection.calls] == [
+        "AddMatch",
+        "Subscribe",
+        "StartUnit",
+        "StopUnit",
+    ]
+    assert connection.calls[2][1] == ("tmate-ssh-server.service", "replace")
+
+
+@pytest.mark.parametrize(
+    "job_result, errors, message",
+    [
+        pytest.param("failed", {}, "failed with result failed", id="job failed"),
+        pytest.param(None, {}, "did not complete", id="job timeout"),
+        pytest.param(
+            "done",
+            {"StartUnit": "org.freedesktop.systemd1.NoSuchUnit"},
+            "NoSuchUnit",
+            id="no unit",
+        ),
+        pytest.param(
+            "done",
+            {"AddMatch": "org.freedesktop.DBus.Error.AccessDenied"},
+            "Failed to watch systemd jobs",
+            id="signals denied",
+        ),
+    ],
+)
+def test_service_start_error(
+    connection: FakeSystemdConnection,
+    manager: systemd_bus.DBusManager,
+    job_result: typing.Optional[str],
+    errors: dict[str, str],
+    message: str,
+):
+    """
+    arrange: given a D-Bus service manager failing to start the service.
+    act: when service_start is called.
+    assert: SystemdError is raised.
+    """
+    connection.job_results = [job_result]
+    connection.errors = errors
+
+    with pytest.raises(systemd_bus.systemd.SystemdError, match=message):
+        manager.service_start("tmate-ssh-server")
+
+
+def test_service_reset_failed(connection: FakeSystemdConnection, manager: systemd_bus.DBusManager):
+    """
+    arrange: given a D-Bus service manager.
+    act: when service_reset_failed is called.
+    assert: systemd resets the failed state of the unit.
+    """
+    manager.service_reset_failed("tmate-ssh-server")
+
+    assert connection.calls == [("ResetFailedUnit", ("tmate-ssh-server.service",))]
+
+
+def test_call_connection_error(
+    monkeypatch: pytest.MonkeyPatch,
+    connection: FakeSystemdConnection,
+    manager: systemd_bus.DBusManager,
+):
+    """
+    arrange: given a D-Bus service manager with a broken bus connection.
+    act: when daemon_reload is called.
+    assert: SystemdError is raised.
+    """
+    monkeypatch.setattr(
+        connection, "send_and_get_reply", MagicMock(side_effect=ConnectionResetError)
+    )
+
+    with pytest.raises(systemd_bus.systemd.SystemdError, match="Reload"):
+        manager.daemon_reload()
+
+
+def test_properties(connection: FakeSystemdConnection, manager: systemd_bus.DBusManager):
+    """
+    arrange: given a D-Bus service manager.
+    act: when properties is called.
+    assert: the requested unit and service properties found are returned formatted like systemctl
+        shows them.
+    """
+    properties = manager.properties(
+        "tmate-ssh-server.service",
+        "ActiveState",
+        "MainPID",
+        "MemoryCurrent",
+        "ExecMainStartTimestamp",
+        "ExecMainExitTimestamp",
+        "Foo",
+    )
+
+    assert properties == {
+        "ActiveState": "active",
+        "MainPID": "1234",
+        "MemoryCurrent": "[not set]",
+        "ExecMainStartTimestamp": "@1736157600",
+        "ExecMainExitTimestamp": "",
+    }
+    assert connection.calls == [
+        ("LoadUnit", ("tmate-ssh-server.service",)),
+        ("GetAll", (systemd_bus.UNIT_INTERFACE,)),
+        ("GetAll", (systemd_bus.SERVICE_INTERFACE,)),
+    ]
+
+
+@pytest.mark.parametrize(
+    "method, function",
+    [
+        pytest.param("service_enable", "service_enable", id="enable"),
+        pytest.param("service_disable", "service_disable", id="disable"),
+        pytest.param("service_start", "service_start", id="start"),
+        pytest.param("service_stop", "service_stop", id="stop"),
+    ],
+)
+def test_systemctl_service(monkeypatch: pytest.MonkeyPatch, method: str, function: str):
+    """
+    arrange: given a systemctl service manager.
+    act: when a service control method is called.
+    assert: systemctl controls the service.
+    """
+    function_mock = MagicMock(spec=getattr(systemd_bus.systemd, function))
+    monkeypatch.setattr(systemd_bus.systemd, function, function_mock)
+
+    getattr(systemd_bus.SystemctlManager(), method)("tmate-ssh-server")
+
+    function_mock.assert_called_once_with("tmate-ssh-server")
+
+
+def test_systemctl_daemon_reload(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a systemctl service manager.
+    act: when daemon_reload is called.
+    assert: systemctl reloads the unit files.
+    """
+    daemon_reload_mock = MagicMock(spec=systemd_bus.systemd.daemon_reload)
+    monkeypatch.setattr(systemd_bus.systemd, "daemon_reload", daemon_reload_mock)
+
+    systemd_bus.SystemctlManager().daemon_reload()
+
+    daemon_reload_mock.assert_called_once_with()
+
+
+def test_systemctl_service_reset_failed(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a systemctl service manager.
+    act: when service_reset_failed is called.
+    assert: systemctl resets the failed state of the unit.
+    """
+    run_mock = MagicMock(spec=subprocess.run)
+    monkeypatch.setattr(systemd_bus.subprocess, "run", run_mock)
+
+    systemd_bus.SystemctlManager().service_reset_failed("tmate-ssh-server")
+
+    assert run_mock.call_args.args[0] == [
+        "systemctl",
+        "reset-failed",
+        "tmate-ssh-server.service",
+    ]
+
+
+def test_systemctl_service_reset_failed_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a systemctl service manager whose systemctl call fails.
+    act: when service_reset_failed is called.
+    assert: SystemdError is raised.
+    """
+    monkeypatch.setattr(
+        systemd_bus.subprocess,
+        "run",
+        MagicMock(side_effect=subprocess.CalledProcessError(1, "systemctl", stderr="not loaded")),
+    )
+
+    with pytest.raises(systemd_bus.systemd.SystemdError, match="not loaded"):
+        systemd_bus.SystemctlManager().service_reset_failed("tmate-ssh-server")
+
+
+def test_systemctl_properties(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a systemctl service manager.
+    act: when properties is called.
+    assert: the properties shown by systemctl are returned.
+    """
+    check_output_mock = MagicMock(
+        spec=subprocess.check_output, return_value="ActiveState=active\nExecMainStatus=a=b\n\n"
+    )
+    monkeypatch.setattr(systemd_bus.subprocess, "check_output", check_output_mock)
+
+    properties = systemd_bus.SystemctlManager().properties(
+        "tmate-ssh-server", "ActiveState", "ExecMainStatus"
+    )
+
+    assert properties == {"ActiveState": "active", "ExecMainStatus": "a=b"}
+    assert check_output_mock.call_args.args[0] == [
+        "systemctl",
+        "show",
+        "--timestamp=unix",
+        "--property=ActiveState,ExecMainStatus",
+        "tmate-ssh-server.service",
+    ]
+
+
+def test_systemctl_properties_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a systemctl service manager whose systemctl call fails.
+    act: when properties is called.
+    assert: SystemdError is raised.
+    """
+    monkeypatch.setattr(
+        systemd_bus.subprocess,
+        "check_output",
+        MagicMock(side_effect=subprocess.CalledProcessError(1, "systemctl")),
+    )
+
+    with pytest.raises(systemd_bus.systemd.SystemdError):
+        systemd_bus.SystemctlManager().properties("tmate-ssh-server", "ActiveState")
+
+
+@pytest.mark.parametrize(
+    "open_connection, manager_type",
+    [
+        pytest.param(MagicMock(), systemd_bus.DBusManager, id="system bus"),
+        pytest.param(
+            MagicMock(side_effect=FileNotFoundError),
+            systemd_bus.SystemctlManager,
+            id="no system bus",
+        ),
+    ],
+)
+def test_manager(monkeypatch: pytest.MonkeyPatch, open_connection: MagicMock, manager_type: type):
+    """
+    arrange: given a system bus which is available or not.
+    act: when manager is called twice.
+    assert: the same service manager of the available backend is returned.
+    """
+    monkeypatch.setattr(systemd_bus, "open_dbus_connection", open_connection)
+    get_manager.cache_clear()
+
+    manager = get_manager()
+
+    assert isinstance(manager, manager_type)
+    assert get_manager() is manager
+    open_connection.assert_called_once_with(bus="SYSTEM")
+    get_manager.cache_clear()
@@ -0,0 +1,54 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""tmate-ssh-server charm timing module unit tests."""
+
+import pytest
+
+import timing
+from charm import TmateSSHServerOperatorCharm
+
+
+def test_timeline_stages():
+    """
+    arrange: given a timeline.
+    act: when a successful and a failing stage are timed and the timeline is finished.
+    assert: both stages are recorded in order with their outcome.
+    """
+    timeline = timing.Timeline(name="test")
+
+    with timeline.stage("ok"):
+        pass
+    with pytest.raises(ValueError):
+        with timeline.stage("failing"):
+            raise ValueError
+    timeline.finish()
+
+    timeline_dict = timeline.to_dict()
+    assert timeline_dict["name"] == "test"
+    assert timeline_dict["failed"]
+    assert [(stage["name"], stage["failed"]) for stage in timeline_dict["stages"]] == [
+        ("ok", False),
+        ("failing", True),
+    ]
+    assert all(stage["start"] <= stage["end"] for stage in timeline_dict["stages"])
+    assert timeline_dict["duration"] >= timeline_dict["stages"][-1]["end"]
+
+
+def test_history_record(charm: TmateSSHServerOperatorCharm):
+    """
+    arrange: given the charm timeline history.
+    act: when more than MAX_TIMELINES timelines are recorded.
+    assert: only the most recent MAX_TIMELINES timelines are kept, oldest first.
+    """
+    for index in range(timing.MAX_TIMELINES + 2):
+        timeline = timing.Timeline(name=f"run-{index}")
+        with timeline.stage("stage"):
+            pass
+        charm.timings.record(timeline)
+
+    timelines = charm.timings.timelines()
+    assert len(timelines) == timing.MAX_TIMELINES
+    assert timelines[0]["name"] == "run-2"
+    assert timelines[-1]["name"] == f"run-{timing.MAX_TIMELINES + 1}"
+    assert not timelines[-1]["failed"]
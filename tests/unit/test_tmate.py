@@ -3,222 +3,165 @@
 
 """tmate-ssh-server charm tmate module unit tests."""
 
+import hashlib
+import socket
+
 # subprocess is used by tmate module. Security implications have been considered.
 import subprocess  # nosec
 import textwrap
+import threading
+import typing
+from functools import partial
 from pathlib import Path
-from tempfile import NamedTemporaryFile
 from unittest.mock import MagicMock
 
 import pytest
-from charms.operator_libs_linux.v0 import apt
 
+import daemon_status
+import docker_api
+import host_keys
+import prerequisites
+import state
+import systemd_bus
+import timing
 import tmate
 
-from .factories import ProxyConfigFactory
-
 # Need access to protected functions for testing
 # pylint: disable=protected-access
 
 
-def test_install_dependencies_proxy_config(monkeypatch: pytest.MonkeyPatch):
-    """
-    arrange: given proxy config, mocked DOCKER_DAEMON_CONFIG_PATH and mocked apt module functions.
-    act: when install_dependencies is called.
-    assert: docker daemon configuration is written.
-    """
-    monkeypatch.setattr(tmate.apt, "update", MagicMock(spec=apt.update))
-    monkeypatch.setattr(tmate.apt, "add_package", MagicMock(spec=apt.add_package))
-    monkeypatch.setattr(tmate.passwd, "add_group", MagicMock(spec=tmate.passwd.add_group))
-    monkeypatch.setattr(
-        tmate.passwd, "add_user_to_group", MagicMock(spec=tmate.passwd.add_user_to_group)
-    )
-    proxy_config = ProxyConfigFactory()
-
-    with NamedTemporaryFile() as temporary_docker_daemon_file:
-        monkeypatch.setattr(
-            tmate,
-            "DOCKER_DAEMON_CONFIG_PATH",
-            (tmp_file_path := Path(temporary_docker_daemon_file.name)),
-        )
-        # ProxyConfigFactory is not considered as ProxyConfig for mypy
-        tmate.install_dependencies(proxy_config=proxy_config)  # type: ignore
-
-        assert f"""{{
-  "proxies": {{
-    "http-proxy": "{proxy_config.http_proxy}",
-    "https-proxy": "{proxy_config.https_proxy}",
-    "no-proxy": "{proxy_config.no_proxy}"
-  }}
-}}""" == tmp_file_path.read_text(encoding="utf-8")
-
-
-@pytest.mark.parametrize(
-    "exception",
-    [
-        pytest.param(apt.PackageNotFoundError, id="package not found"),
-        pytest.param(apt.PackageError, id="package error"),
-    ],
-)
-def test__setup_docker_error(exception: type[Exception], monkeypatch: pytest.MonkeyPatch):
-    """
-    arrange: given a monkeypatched apt module that raises an exception.
-    act: when _setup_docker is called.
-    assert: DependencyInstallError is raised.
-    """
-    monkeypatch.setattr(tmate.apt, "update", MagicMock(spec=apt.update))
-    monkeypatch.setattr(
-        tmate.apt, "add_package", MagicMock(spec=apt.add_package, side_effect=[exception])
-    )
-
-    with pytest.raises(exception):
-        tmate._setup_docker()
-
-
-@pytest.mark.parametrize(
-    "exception",
-    [
-        pytest.param(apt.PackageNotFoundError, id="package not found"),
-        pytest.param(apt.PackageError, id="package error"),
-    ],
-)
-def test_install_dependencies_apt_error(
-    exception: type[Exception], monkeypatch: pytest.MonkeyPatch
-):
-    """
-    arrange: given a monkeypatched apt module that raises an exception.
-    act: when install_dependencies is called.
-    assert: DependencyInstallError is raised.
-    """
-    monkeypatch.setattr(tmate.apt, "update", MagicMock(spec=apt.update))
-    monkeypatch.setattr(
-        tmate.apt, "add_package", MagicMock(spec=apt.add_package, side_effect=[exception])
-    )
-
-    with pytest.raises(tmate.DependencySetupError):
-        tmate.install_dependencies()
-
+@pytest.fixture(name="legacy_service_path", autouse=True)
+def legacy_service_path_fixture(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    """Monkeypatch the path of the unit file of the single tmate-ssh-server service."""
+    legacy_service_path = tmp_path / "legacy" / "tmate-ssh-server.service"
+    monkeypatch.setattr(tmate, "LEGACY_SERVICE_PATH", legacy_service_path)
+    return legacy_service_path
 
-def test_install_keys_error(monkeypatch: pytest.MonkeyPatch):
-    """
-    arrange: given a monkeypatched subprocess call that raises CalledProcessError.
-    act: when install_keys is called.
-    assert: KeyInstallError is raised.
-    """
-    monkeypatch.setattr(tmate, "WORK_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "KEYS_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "CREATE_KEYS_SCRIPT_PATH", MagicMock(spec=Path))
-    monkeypatch.setattr(
-        tmate.subprocess,
-        "check_call",
-        MagicMock(
-            spec=tmate.subprocess.check_call,
-            side_effect=[tmate.subprocess.CalledProcessError(returncode=1, cmd="test")],
-        ),
-    )
 
-    with pytest.raises(tmate.KeyInstallError):
-        tmate.install_keys(MagicMock())
+@pytest.fixture(name="clock")
+def clock_fixture(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """Monkeypatch the monotonic clock to only advance on sleep."""
+    clock = [0.0]
 
+    def sleep(seconds: float) -> None:
+        """Advance the clock.
 
-def test_install_keys(monkeypatch: pytest.MonkeyPatch):
-    """
-    arrange: given a monkeypatched subprocess call.
-    act: when install_keys is called.
-    assert: KeyInstallError is raised.
-    """
-    monkeypatch.setattr(tmate, "WORK_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "KEYS_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "CREATE_KEYS_SCRIPT_PATH", MagicMock(spec=Path))
-    monkeypatch.setattr(
-        tmate.subprocess,
-        "check_call",
-        MagicMock(spec=tmate.subprocess.check_call),
-    )
+        Args:
+            seconds: The seconds to advance the clock by.
+        """
+        clock.append(clock[-1] + seconds)
 
-    tmate.install_keys(MagicMock())
+    monkeypatch.setattr(tmate, "sleep", MagicMock(spec=tmate.sleep, side_effect=sleep))
+    monkeypatch.setattr(tmate.time, "monotonic", lambda: clock[-1])
+    return clock
 
 
-def test__wait_for_timeout_error(monkeypatch: pytest.MonkeyPatch):
+def test__wait_for_timeout_error(clock: list[float]):
     """
-    arrange: given a mock function that returns Falsy value.
+    arrange: given a mock function that returns a not ready value.
     act: when _wait_for function is called.
-    assert: TimeoutError is raised.
+    assert: WaitTimeoutError is raised with the last observed value after backing off
+        exponentially up to the maximum interval, with a last check at the deadline.
     """
-    monkeypatch.setattr(tmate, "sleep", MagicMock(spec=tmate.sleep))  # to speed up testing
-    mock_func = MagicMock(return_value=False)
+    mock_func = MagicMock(side_effect=range(100))
+
+    with pytest.raises(tmate.WaitTimeoutError) as exc:
+        tmate._wait_for(mock_func, timeout=30, ready=lambda value: value < 0)
 
-    with pytest.raises(TimeoutError):
-        tmate._wait_for(mock_func, timeout=2, check_interval=1)
+    intervals = [end - start for start, end in zip(clock, clock[1:])]
+    assert clock[-1] == 30
+    for interval, max_interval in zip(intervals, (0.5, 1, 2, 4, 8, 10, 10)):
+        assert max_interval / 2 <= interval <= max_interval
+    assert exc.value.last_result == len(clock) - 1
+    assert len(exc.value.attempts) == len(clock)
+    assert "last observed" in str(exc.value)
 
 
 @pytest.mark.parametrize(
-    "timeout, interval",
+    "results, attempts",
     [
-        pytest.param(
-            3,
-            1,
-            id="within interval",
-        ),
-        pytest.param(0, 1, id="last check"),
+        pytest.param([True], 1, id="first check"),
+        pytest.param([False, False, True], 3, id="after backoff"),
     ],
 )
-def test__wait_for(monkeypatch: pytest.MonkeyPatch, timeout: int, interval: int):
+def test__wait_for(clock: list[float], results: list[bool], attempts: int):
     """
-    arrange: given a mock function that returns Truthy value.
+    arrange: given a mock function that returns a truthy value.
     act: when _wait_for function is called.
-    assert: the function returns without raising an error.
+    assert: the attempts up to the truthy value are returned.
     """
-    monkeypatch.setattr(tmate, "sleep", MagicMock(spec=tmate.sleep))  # to speed up testing
-    mock_func = MagicMock(return_value=True)
-
-    tmate._wait_for(mock_func, timeout=timeout, check_interval=interval)
+    mock_func = MagicMock(side_effect=results)
 
+    result = tmate._wait_for(mock_func, timeout=30)
 
-def test_status(monkeypatch: pytest.MonkeyPatch):
-    """
-    arrange: given a monkeypatched subprocess call which returns zero exit code.
-    act: when is_running is called.
-    assert: the output of the systemd call is returned.
-    """
-    subprocess_mock = MagicMock(spec=tmate.subprocess.check_output, return_value=b"active")
-    monkeypatch.setattr(tmate.subprocess, "check_output", subprocess_mock)
-
-    assert tmate.status() == tmate.DaemonStatus(running=True, status="active")
+    assert [attempt.result for attempt in result] == results
+    assert len(result) == attempts
+    assert len(clock) == attempts
 
 
-def test_status_not_running(monkeypatch: pytest.MonkeyPatch):
+def test_status(monkeypatch: pytest.MonkeyPatch, service_manager: systemd_bus.SystemctlManager):
     """
-    arrange: given a monkeypatched subprocess call which returns unit not running exit code.
-    act: when is_running is called.
-    assert: the output of the systemd call is returned.
+    arrange: given monkeypatched unit properties of the tmate-ssh-server worker services.
+    act: when status is called for two workers.
+    assert: the status of each worker is built from the unit properties of its service.
     """
-    subprocess_mock = MagicMock(
-        spec=tmate.subprocess.check_output,
-        side_effect=subprocess.CalledProcessError(
-            tmate.SYSTEMD_UNIT_NOT_RUNNING_CODE, "test", output=b"inactive"
-        ),
+    properties_mock = MagicMock(
+        spec=service_manager.properties,
+        side_effect=[{"ActiveState": "active", "SubState": "running"}, {}],
     )
-    monkeypatch.setattr(tmate.subprocess, "check_output", subprocess_mock)
+    monkeypatch.setattr(service_manager, "properties", properties_mock)
 
-    assert tmate.status() == tmate.DaemonStatus(running=False, status="inactive")
+    assert tmate.status([10022, 10023]) == {
+        10022: daemon_status.DaemonStatus(running=True, status="active (running)"),
+        10023: daemon_status.DaemonStatus(running=False, status="unknown (unknown)"),
+    }
+    assert [call.args for call in properties_mock.call_args_list] == [
+        ("tmate-ssh-server@10022", *daemon_status.STATUS_PROPERTIES),
+        ("tmate-ssh-server@10023", *daemon_status.STATUS_PROPERTIES),
+    ]
 
 
-def test_status_error(monkeypatch: pytest.MonkeyPatch):
+def test_status_error(
+    monkeypatch: pytest.MonkeyPatch, service_manager: systemd_bus.SystemctlManager
+):
     """
-    arrange: given a monkeypatched subprocess call that raises an error.
-        This error does not indicate that the service is not running.
+    arrange: given monkeypatched unit properties that fail to be read.
     act: when status is called.
-    assert: DaemonError is raised in both cases
+    assert: DaemonError is raised.
     """
-    subprocess_mock = MagicMock(
-        spec=tmate.subprocess.check_output, side_effect=subprocess.CalledProcessError(1, "test")
+    monkeypatch.setattr(
+        service_manager,
+        "properties",
+        MagicMock(side_effect=tmate.systemd.SystemdError("systemctl failed")),
     )
-    monkeypatch.setattr(tmate.subprocess, "check_output", subprocess_mock)
 
     with pytest.raises(tmate.DaemonError) as exc:
         tmate.status()
-    assert "Failed to check tmate-ssh-server status." in str(exc.value)
+    assert "Failed to check tmate-ssh-server worker 10022 status." in str(exc.value)
+
+
+def _docker_events(*events: str) -> subprocess.Popen:
+    """Simulate a docker events subscription.
+
+    Args:
+        events: The events written by the subscription before it ends.
+
+    Returns:
+        The process writing the events.
+    """
+    return subprocess.Popen(  # nosec B603
+        ["printf", "".join(f"{event}\\n" for event in events)], stdout=subprocess.PIPE
+    )
+
+
+@pytest.fixture(name="container_start_events")
+def container_start_events_fixture(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    """Monkeypatch the container start events subscription with a started container."""
+    watch_mock = MagicMock(
+        spec=tmate._watch_container_start, side_effect=lambda *_, **__: _docker_events("start")
+    )
+    monkeypatch.setattr(tmate, "_watch_container_start", watch_mock)
+    return watch_mock
 
 
 def test_start_daemon_daemon_reload_error(monkeypatch: pytest.MonkeyPatch):
@@ -228,8 +171,7 @@ def test_start_daemon_daemon_reload_error(monkeypatch: pytest.MonkeyPatch):
     assert: DaemonError is raised.
     """
     monkeypatch.setattr(tmate, "WORK_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "KEYS_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "CREATE_KEYS_SCRIPT_PATH", MagicMock(spec=Path))
+    monkeypatch.setattr(host_keys, "KEYS_DIR", MagicMock(spec=Path))
     monkeypatch.setattr(tmate, "TMATE_SSH_SERVER_SERVICE_PATH", MagicMock(spec=Path))
     monkeypatch.setattr(
         tmate.systemd,
@@ -242,11 +184,12 @@ def test_start_daemon_daemon_reload_error(monkeypatch: pytest.MonkeyPatch):
         ),
     )
     with pytest.raises(tmate.DaemonError) as exc:
-        tmate.start_daemon(address="test")
+        tmate.start_daemon(address="test", name="tmate-ssh-server-0")
 
     assert "Failed to start tmate-ssh-server daemon." in str(exc.value)
 
 
+@pytest.mark.usefixtures("container_start_events")
 def test_start_daemon_systemd_service_timeout_error(monkeypatch: pytest.MonkeyPatch):
     """
     arrange: given a monkeypatched _wait_for systemd service all that raises a timeout error.
@@ -254,8 +197,7 @@ def test_start_daemon_systemd_service_timeout_error(monkeypatch: pytest.MonkeyPa
     assert: DaemonError is raised.
     """
     monkeypatch.setattr(tmate, "WORK_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "KEYS_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "CREATE_KEYS_SCRIPT_PATH", MagicMock(spec=Path))
+    monkeypatch.setattr(host_keys, "KEYS_DIR", MagicMock(spec=Path))
     monkeypatch.setattr(tmate, "TMATE_SSH_SERVER_SERVICE_PATH", MagicMock(spec=Path))
     monkeypatch.setattr(
         tmate.systemd,
@@ -272,35 +214,19 @@ def test_start_daemon_systemd_service_timeout_error(monkeypatch: pytest.MonkeyPa
         "service_start",
         MagicMock(spec=tmate.systemd.service_start),
     )
-
-    def wait_for_side_effect(*args, **kwargs):  # pylint: disable=unused-argument
-        """Simulate waiting for a service to start.
-
-        Args:
-            args: Positional arguments.
-            kwargs: Keyword arguments.
-
-        Raises:
-            TimeoutError: On second call to simulate timeout.
-        """
-        if not hasattr(wait_for_side_effect, "called_once"):
-            # defined at runtime
-            wait_for_side_effect.called_once = True  # type: ignore[attr-defined]
-            return
-        raise TimeoutError
-
     monkeypatch.setattr(
         tmate,
         "_wait_for",
-        MagicMock(spec=tmate._wait_for, side_effect=wait_for_side_effect),
+        MagicMock(spec=tmate._wait_for, side_effect=TimeoutError),
     )
 
     with pytest.raises(tmate.DaemonError) as exc:
-        tmate.start_daemon(address="test")
+        tmate.start_daemon(address="test", name="tmate-ssh-server-0")
 
     assert "Timed out waiting for tmate service to start." in str(exc.value)
 
 
+@pytest.mark.usefixtures("container_start_events")
 def test_start_daemon_enable_error(monkeypatch: pytest.MonkeyPatch):
     """
     arrange: given a monkeypatched systemd call that raises SystemdError.
@@ -308,8 +234,7 @@ def test_start_daemon_enable_error(monkeypatch: pytest.MonkeyPatch):
     assert: DaemonError is raised.
     """
     monkeypatch.setattr(tmate, "WORK_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "KEYS_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "CREATE_KEYS_SCRIPT_PATH", MagicMock(spec=Path))
+    monkeypatch.setattr(host_keys, "KEYS_DIR", MagicMock(spec=Path))
     monkeypatch.setattr(tmate, "TMATE_SSH_SERVER_SERVICE_PATH", MagicMock(spec=Path))
     monkeypatch.setattr(
         tmate.systemd,
@@ -328,9 +253,10 @@ def test_start_daemon_enable_error(monkeypatch: pytest.MonkeyPatch):
     )
 
     with pytest.raises(tmate.DaemonError):
-        tmate.start_daemon(address="test")
+        tmate.start_daemon(address="test", name="tmate-ssh-server-0")
 
 
+@pytest.mark.usefixtures("container_start_events")
 def test_start_daemon_service_start_error(monkeypatch: pytest.MonkeyPatch):
     """
     arrange: given a monkeypatched systemd that raises SystemdError.
@@ -338,8 +264,7 @@ def test_start_daemon_service_start_error(monkeypatch: pytest.MonkeyPatch):
     assert: DaemonError is raised.
     """
     monkeypatch.setattr(tmate, "WORK_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "KEYS_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "CREATE_KEYS_SCRIPT_PATH", MagicMock(spec=Path))
+    monkeypatch.setattr(host_keys, "KEYS_DIR", MagicMock(spec=Path))
     monkeypatch.setattr(tmate, "TMATE_SSH_SERVER_SERVICE_PATH", MagicMock(spec=Path))
     monkeypatch.setattr(
         tmate.systemd, "daemon_reload", MagicMock(spec=tmate.systemd.daemon_reload)
@@ -361,33 +286,146 @@ def test_start_daemon_service_start_error(monkeypatch: pytest.MonkeyPatch):
     )
 
     with pytest.raises(tmate.DaemonError):
-        tmate.start_daemon(address="test")
+        tmate.start_daemon(address="test", name="tmate-ssh-server-0")
+
+
+@pytest.fixture(name="systemd_start")
+def systemd_start_fixture(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> MagicMock:
+    """Monkeypatch the systemd calls starting the tmate-ssh-server service."""
+    monkeypatch.setattr(
+        tmate, "TMATE_SSH_SERVER_SERVICE_PATH", tmp_path / "tmate-ssh-server@.service"
+    )
+    monkeypatch.setattr(
+        tmate.systemd, "daemon_reload", MagicMock(spec=tmate.systemd.daemon_reload)
+    )
+    monkeypatch.setattr(
+        tmate.systemd, "service_enable", MagicMock(spec=tmate.systemd.service_enable)
+    )
+    service_start_mock = MagicMock(spec=tmate.systemd.service_start)
+    monkeypatch.setattr(tmate.systemd, "service_start", service_start_mock)
+    monkeypatch.setattr(
+        tmate,
+        "status",
+        MagicMock(
+            spec=tmate.status,
+            side_effect=lambda ports: {
+                port: daemon_status.DaemonStatus(running=True, status="") for port in ports
+            },
+        ),
+    )
+    return service_start_mock
+
+
+def test_start_daemon(
+    monkeypatch: pytest.MonkeyPatch, container_start_events: MagicMock, systemd_start: MagicMock
+):
+    """
+    arrange: given a container start event and a server accepting SSH connections.
+    act: when start_daemon is called.
+    assert: an ephemeral container of the given name replacing any leftover container is started,
+        its start events are watched and the start steps are timed.
+    """
+    probe_mock = MagicMock(spec=tmate.probe_ssh_banner, return_value="SSH-2.0-tmate")
+    monkeypatch.setattr(tmate, "probe_ssh_banner", probe_mock)
+    timeline = timing.Timeline(name="start-daemon")
+
+    tmate.start_daemon(
+        address="test",
+        name="tmate-ssh-server-0",
+        restart_policy=state.RestartPolicy(
+            restart_delay=3, start_limit_burst=4, start_limit_interval=120
+        ),
+        timeline=timeline,
+    )
+
+    assert container_start_events.call_args.args[0] == ["tmate-ssh-server-0-10022"]
+    service = tmate.TMATE_SSH_SERVER_SERVICE_PATH.read_text(encoding="utf-8")
+    assert "ExecStartPre=-docker rm --force tmate-ssh-server-0-%i\n" in service
+    assert "docker run --rm --name tmate-ssh-server-0-%i " in service
+    assert " -p %i " in service
+    assert "\nRestart=always\nRestartSec=3\n" in service
+    assert "\nStartLimitIntervalSec=120\nStartLimitBurst=4\n" in service
+    assert [stage.name for stage in timeline.stages] == [
+        "daemon-reload",
+        "service-start",
+        "wait-container",
+        "wait-service",
+        "wait-ssh",
+    ]
+    probe_mock.assert_called_once_with("test", tmate.PORT)
+    systemd_start.assert_called_once_with("tmate-ssh-server@10022")
+
+
+def test_start_daemon_workers(
+    monkeypatch: pytest.MonkeyPatch,
+    container_start_events: MagicMock,
+    systemd_start: MagicMock,
+    legacy_service_path: Path,
+):
+    """
+    arrange: given the single service of a previous charm revision and two starting workers.
+    act: when start_daemon is called for two workers.
+    assert: the single service and its containers are removed and both workers are started.
+    """
+    legacy_service_path.parent.mkdir()
+    legacy_service_path.write_text("", encoding="utf-8")
+    remove_containers_mock = MagicMock(spec=tmate._remove_legacy_containers)
+    monkeypatch.setattr(tmate, "_remove_legacy_containers", remove_containers_mock)
+    service_stop_mock = MagicMock(spec=tmate.systemd.service_stop)
+    monkeypatch.setattr(tmate.systemd, "service_stop", service_stop_mock)
+    service_disable_mock = MagicMock(spec=tmate.systemd.service_disable)
+    monkeypatch.setattr(tmate.systemd, "service_disable", service_disable_mock)
+    container_start_events.side_effect = lambda *_, **__: _docker_events("start", "start")
+    probe_mock = MagicMock(spec=tmate.probe_ssh_banner, return_value="SSH-2.0-tmate")
+    monkeypatch.setattr(tmate, "probe_ssh_banner", probe_mock)
+
+    tmate.start_daemon(address="test", name="tmate-ssh-server-0", ports=[10022, 10023])
+
+    service_stop_mock.assert_called_once_with(tmate.TMATE_SERVICE_NAME)
+    service_disable_mock.assert_called_once_with(tmate.TMATE_SERVICE_NAME)
+    remove_containers_mock.assert_called_once_with()
+    assert not legacy_service_path.exists()
+    assert container_start_events.call_args.args[0] == [
+        "tmate-ssh-server-0-10022",
+        "tmate-ssh-server-0-10023",
+    ]
+    assert [call.args for call in systemd_start.call_args_list] == [
+        ("tmate-ssh-server@10022",),
+        ("tmate-ssh-server@10023",),
+    ]
+    assert [call.args for call in probe_mock.call_args_list] == [("test", 10022), ("test", 10023)]
 
 
 @pytest.mark.parametrize(
-    "stdout, result",
+    "listed, removed",
     [
-        pytest.param("Up 5 minutes", True, id="container running"),
-        pytest.param("Exited (0) 2 minutes ago", False, id="container not running"),
+        pytest.param("", None, id="no containers"),
+        pytest.param("0123\n4567\n", ["docker", "rm", "0123", "4567"], id="stopped containers"),
     ],
 )
-def test_check_docker_container(monkeypatch: pytest.MonkeyPatch, stdout, result):
+def test__remove_legacy_containers(
+    monkeypatch: pytest.MonkeyPatch, listed: str, removed: typing.Optional[list[str]]
+):
     """
-    arrange: given a monkeypatched subprocess call.
-    act: when check_docker_container is called.
-    assert: The function returns expected value without raising any errors.
+    arrange: given a monkeypatched docker call listing the stopped legacy containers.
+    act: when _remove_legacy_containers is called.
+    assert: only the stopped containers of the legacy image are removed.
     """
-    mock_result = MagicMock()
-    mock_result.stdout = stdout
-    monkeypatch.setattr(tmate.subprocess, "run", MagicMock(return_value=mock_result))
+    run_mock = MagicMock(spec=tmate.subprocess.run, return_value=MagicMock(stdout=listed))
+    monkeypatch.setattr(tmate.subprocess, "run", run_mock)
 
-    assert tmate.check_docker_container(name="test") == result
+    tmate._remove_legacy_containers()
+
+    ps_args = run_mock.call_args_list[0].args[0]
+    assert f"ancestor={tmate.LEGACY_IMAGE}" in ps_args
+    assert "status=running" not in ps_args
+    assert (run_mock.call_args.args[0] if run_mock.call_count == 2 else None) == removed
 
 
-def test_check_docker_container_subprocess_error(monkeypatch: pytest.MonkeyPatch):
+def test__remove_legacy_containers_error(monkeypatch: pytest.MonkeyPatch):
     """
-    arrange: given a monkeypatched subprocess call that raises CalledProcessError.
-    act: when check_docker_container is called.
+    arrange: given a monkeypatched docker call that fails.
+    act: when _remove_legacy_containers is called.
     assert: DaemonError is raised.
     """
     monkeypatch.setattr(
@@ -395,81 +433,203 @@ def test_check_docker_container_subprocess_error(monkeypatch: pytest.MonkeyPatch
         "run",
         MagicMock(
             spec=tmate.subprocess.run,
-            side_effect=[tmate.subprocess.CalledProcessError(returncode=1, cmd="test")],
+            side_effect=subprocess.CalledProcessError(returncode=1, cmd="test", stderr="error"),
         ),
     )
 
     with pytest.raises(tmate.DaemonError):
-        tmate.check_docker_container(name="test")
+        tmate._remove_legacy_containers()
 
 
-def test__calculate_fingerprint():
+def test_start_daemon_active_workers(
+    monkeypatch: pytest.MonkeyPatch,
+    container_start_events: MagicMock,
+    systemd_start: MagicMock,
+    docker_client: MagicMock,
+):
     """
-    arrange: given a test fingerprint data.
-    act: when _calculate_fingerprint is called.
-    assert: correct fingerprint data is returned.
+    arrange: given an active worker with a running container and a stopped worker.
+    act: when start_daemon is called for both workers.
+    assert: only the container of the stopped worker is waited for and both workers are probed.
     """
-    test_b64_pub_key_data = "AAAAB3NzaC1yc2EAAAADAQABAAABgQDt5qyv585y8lKFoirTyexOR9YwMSzihoDG/N6mi\
-    FzHv/22Fd/6NN96Xymf8HGoUdR6KhUZ3SQRwUmmPRb2eASaOBvDzDdSSzWT6N2DuW31WXw/Kw1DUXZ6AWyAH5O3Y5kvmD\
-    7prT3QGVgOKtm9Cy/EeXzNdbiK6sTbfER2k6KZpjdz/onA0iovd7N2SrxZwSfvhZ6sTpD//WDTmN/bV+W+6/d3zNYwak4\
-    mNPRNTC1hcjBryOMYJ2Q0MnjAtWf7MKU1IvNYiWUZlPKVBlPuDxML/4kSf5xbC/qG2EIyYsywHErfThX2sOZuU2gc+4+1\
-    mb1YZpEpPDGLN/l4Er2gtQaW8qes6JozuGmjU6+ZZt7sLqYrBSChJbHlDPDNee9mjMRVPXtppqzpmpZsYR7N7PoRC+KLe\
-    K/4OQKLtHSYxKVCf4dGaDvgxsoG4AyECE7is3bMlkc87GxhV0IEb1A1iZ3ycAxIrmP9G5g2Nao/OL9G4zVW9AY4Lg4M4k\
-    H26zctvb0="
-
-    assert (
-        tmate._calculate_fingerprint(test_b64_pub_key_data)
-        == "uW23WW14JnjeVLUg4kWvbhWptvjAbODK2d4jJmnQyqI"
+    docker_client.container.side_effect = lambda name: _container_state(
+        running=name == "tmate-ssh-server-0-10022"
     )
+    probe_mock = MagicMock(spec=tmate.probe_ssh_banner, return_value="SSH-2.0-tmate")
+    monkeypatch.setattr(tmate, "probe_ssh_banner", probe_mock)
+
+    tmate.start_daemon(address="test", name="tmate-ssh-server-0", ports=[10022, 10023])
+
+    assert container_start_events.call_args.args[0] == ["tmate-ssh-server-0-10023"]
+    assert systemd_start.call_count == 2
+    assert [call.args for call in probe_mock.call_args_list] == [("test", 10022), ("test", 10023)]
 
 
-def test_get_fingerprints_incomplete_init_error(monkeypatch: pytest.MonkeyPatch):
+@pytest.mark.usefixtures("systemd_start")
+def test_start_daemon_all_active(
+    monkeypatch: pytest.MonkeyPatch, container_start_events: MagicMock, docker_client: MagicMock
+):
+    """
+    arrange: given an active worker with a running container, as on a retried install.
+    act: when start_daemon is called.
+    assert: no container start event is waited for and the worker is probed.
     """
-    arrange: given a monkeypatched paths that don't exist.
-    act: when get_fingerprints is called.
-    assert: IncompleteInitError is raised.
+    docker_client.container.return_value = _container_state(running=True)
+    probe_mock = MagicMock(spec=tmate.probe_ssh_banner, return_value="SSH-2.0-tmate")
+    monkeypatch.setattr(tmate, "probe_ssh_banner", probe_mock)
+    timeline = timing.Timeline(name="start-daemon")
+
+    tmate.start_daemon(address="test", name="tmate-ssh-server-0", timeline=timeline)
+
+    container_start_events.assert_not_called()
+    assert "wait-container" not in [stage.name for stage in timeline.stages]
+    probe_mock.assert_called_once_with("test", tmate.PORT)
+
+
+@pytest.mark.usefixtures("systemd_start")
+def test_start_daemon_container_timeout(container_start_events: MagicMock):
+    """
+    arrange: given a container start events subscription that ends without a start event.
+    act: when start_daemon is called.
+    assert: DaemonError is raised.
     """
-    mock_path = MagicMock(spec=Path)
-    mock_path.exists.return_value = False
-    monkeypatch.setattr(tmate, "KEYS_DIR", mock_path)
+    container_start_events.side_effect = lambda *_, **__: _docker_events()
 
-    with pytest.raises(tmate.IncompleteInitError):
-        tmate.get_fingerprints()
+    with pytest.raises(tmate.DaemonError) as exc:
+        tmate.start_daemon(address="test", name="tmate-ssh-server-0")
 
+    assert "Timed out waiting for tmate service to start." in str(exc.value)
 
-def test_get_fingerprints(monkeypatch: pytest.MonkeyPatch):
+
+def test__watch_container_start(monkeypatch: pytest.MonkeyPatch):
     """
-    arrange: given a monkeypatched _calculate_fingerprint method.
-    act: when get_fingerprints is called.
-    assert: Correct fingerprint data is returned.
+    arrange: given a monkeypatched subprocess Popen call.
+    act: when _watch_container_start is called.
+    assert: the start events of the container are subscribed to until the timeout.
+    """
+    popen_mock = MagicMock(spec=subprocess.Popen)
+    monkeypatch.setattr(tmate.subprocess, "Popen", popen_mock)
+
+    tmate._watch_container_start(["test-10022", "test-10023"], timeout=60)
+
+    cmd = popen_mock.call_args.args[0]
+    assert cmd[:2] == ["docker", "events"]
+    assert "container=test-10022" in cmd
+    assert "container=test-10023" in cmd
+    assert "event=start" in cmd
+    since = cmd[cmd.index("--since") + 1]
+    assert float(cmd[cmd.index("--until") + 1]) - float(since) == pytest.approx(60)
+    assert len(since.split(".")[1]) == 9
+
+
+@pytest.mark.parametrize(
+    "unit_name, name",
+    [
+        pytest.param("tmate-ssh-server/0", "tmate-ssh-server-tmate-ssh-server-0", id="unit"),
+        pytest.param("tmate/12", "tmate-ssh-server-tmate-12", id="renamed application"),
+    ],
+)
+def test_container_name(unit_name: str, name: str):
+    """
+    arrange: given a unit name.
+    act: when container_name is called.
+    assert: a valid container name, unique to the unit, is returned.
+    """
+    assert tmate.container_name(unit_name) == name
+
+
+def test__watch_container_start_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a monkeypatched subprocess Popen call that fails to find docker.
+    act: when _watch_container_start is called.
+    assert: DaemonError is raised.
     """
-    monkeypatch.setattr(tmate, "KEYS_DIR", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "RSA_PUB_KEY_PATH", MagicMock(spec=Path))
-    monkeypatch.setattr(tmate, "ED25519_PUB_KEY_PATH", MagicMock(spec=Path))
-    rsa_fingerprint = "rsa"
-    ed25519_fingerprint = "ed25519"
     monkeypatch.setattr(
-        tmate,
-        "_calculate_fingerprint",
-        MagicMock(
-            spec=tmate._calculate_fingerprint,
-            side_effect=[(rsa_fingerprint), (ed25519_fingerprint)],
-        ),
+        tmate.subprocess, "Popen", MagicMock(spec=subprocess.Popen, side_effect=FileNotFoundError)
     )
 
-    assert (
-        tmate.Fingerprints(
-            rsa=f"SHA256:{rsa_fingerprint}", ed25519=f"SHA256:{ed25519_fingerprint}"
-        )
-        == tmate.get_fingerprints()
+    with pytest.raises(tmate.DaemonError):
+        tmate._watch_container_start(["test"], timeout=60)
+
+
+def test__wait_for_container_start_timeout():
+    """
+    arrange: given a container start events subscription without events.
+    act: when _wait_for_container_start is called.
+    assert: TimeoutError is raised once the timeout passed.
+    """
+    with subprocess.Popen(["sleep", "10"], stdout=subprocess.PIPE) as events:  # nosec
+        try:
+            with pytest.raises(TimeoutError):
+                tmate._wait_for_container_start(events, count=1, timeout=0.1)
+        finally:
+            events.kill()
+
+
+def test__wait_for_container_start_missing_event():
+    """
+    arrange: given a container start events subscription ending after one start event.
+    act: when _wait_for_container_start is called for two containers.
+    assert: TimeoutError is raised.
+    """
+    with _docker_events("start") as events:
+        with pytest.raises(TimeoutError):
+            tmate._wait_for_container_start(events, count=2, timeout=5)
+
+
+def _container_state(running: bool) -> docker_api.ContainerState:
+    """Build the state of a tmate-ssh-server container.
+
+    Args:
+        running: Whether the container is running.
+
+    Returns:
+        The container state.
+    """
+    return docker_api.ContainerState(
+        name="test", running=running, health=None, started_at=None, restart_count=0
     )
 
 
+@pytest.mark.parametrize(
+    "container, result",
+    [
+        pytest.param(_container_state(running=True), True, id="container running"),
+        pytest.param(_container_state(running=False), False, id="container not running"),
+        pytest.param(None, False, id="no container"),
+    ],
+)
+def test_check_docker_container(
+    docker_client: MagicMock, container: typing.Optional[docker_api.ContainerState], result
+):
+    """
+    arrange: given a monkeypatched docker client returning the container state.
+    act: when check_docker_container is called.
+    assert: whether the container of the exact name is running is returned.
+    """
+    docker_client.container.return_value = container
+
+    assert tmate.check_docker_container(name="test") == result
+    docker_client.container.assert_called_once_with("test")
+
+
+def test_check_docker_container_docker_error(docker_client: MagicMock):
+    """
+    arrange: given a monkeypatched docker client failing to query the docker daemon.
+    act: when check_docker_container is called.
+    assert: DaemonError is raised.
+    """
+    docker_client.container.side_effect = docker_api.DockerAPIError("connection refused")
+
+    with pytest.raises(tmate.DaemonError, match="connection refused"):
+        tmate.check_docker_container(name="test")
+
+
 @pytest.mark.parametrize(
     "exception",
     [
-        pytest.param(tmate.IncompleteInitError, id="incomplete init"),
-        pytest.param(tmate.KeyInstallError, id="key install error"),
+        pytest.param(host_keys.IncompleteInitError, id="incomplete init"),
+        pytest.param(host_keys.KeyInstallError, id="key install error"),
     ],
 )
 def test_generate_tmate_conf_error(monkeypatch: pytest.MonkeyPatch, exception: type[Exception]):
@@ -479,7 +639,9 @@ def test_generate_tmate_conf_error(monkeypatch: pytest.MonkeyPatch, exception: t
     assert: FingerPrintError is raised.
     """
     monkeypatch.setattr(
-        tmate, "get_fingerprints", MagicMock(spec=tmate.get_fingerprints, side_effect=[exception])
+        host_keys,
+        "get_fingerprints",
+        MagicMock(spec=host_keys.get_fingerprints, side_effect=[exception]),
     )
 
     with pytest.raises(tmate.FingerprintError):
@@ -487,7 +649,7 @@ def test_generate_tmate_conf_error(monkeypatch: pytest.MonkeyPatch, exception: t
 
 
 @pytest.mark.usefixtures("patch_get_fingerprints")
-def test_generate_tmate_conf(fingerprints: tmate.Fingerprints):
+def test_generate_tmate_conf(fingerprints: host_keys.Fingerprints):
     """
     arrange: given a monkeypatched get_fingerprints that returns mock fingerprint data.
     act: when generate_tmate_conf is called.
@@ -503,20 +665,279 @@ def test_generate_tmate_conf(fingerprints: tmate.Fingerprints):
         """) == tmate.generate_tmate_conf(host)
 
 
-def test_remove_stopped_containers_error(monkeypatch: pytest.MonkeyPatch):
+def test_template_digest():
     """
-    arrange: given a monkeypatched subprocess call that raises CalledProcessError.
-    act: when remove_stopped_containers is called.
-    assert: DockerError is raised.
+    arrange: given a charm template.
+    act: when template_digest is called.
+    assert: the SHA256 digest of the template file is returned.
     """
+    expected = hashlib.sha256(
+        Path("templates/tmate-ssh-server.service.j2").read_bytes()
+    ).hexdigest()
+
+    assert tmate.template_digest("tmate-ssh-server.service.j2") == expected
+
+
+@pytest.fixture(name="service_path")
+def service_path_fixture(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    """Monkeypatch the path of the unit file of the tmate-ssh-server service."""
+    service_path = tmp_path / "tmate-ssh-server@.service"
+    monkeypatch.setattr(tmate, "TMATE_SSH_SERVER_SERVICE_PATH", service_path)
+    return service_path
+
+
+def _apply_restart_policy(restart_delay: int) -> bool:
+    """Apply a restart policy to the tmate-ssh-server-0 container service.
+
+    Args:
+        restart_delay: The restart delay of the restart policy.
+
+    Returns:
+        Whether the unit file changed.
+    """
+    return tmate.apply_restart_policy(
+        address="test",
+        name="tmate-ssh-server-0",
+        image=prerequisites.IMAGE,
+        restart_policy=state.RestartPolicy(restart_delay=restart_delay),
+    )
+
+
+def test_apply_restart_policy(
+    monkeypatch: pytest.MonkeyPatch, service_manager: systemd_bus.SystemctlManager, service_path
+):
+    """
+    arrange: given an installed tmate-ssh-server service.
+    act: when apply_restart_policy is called with a changed and then the same restart policy.
+    assert: the unit file is updated and reloaded only once, without restarting the service.
+    """
+    write_unit = partial(
+        tmate._write_service_file, "test", "tmate-ssh-server-0", prerequisites.IMAGE
+    )
+    write_unit(state.RestartPolicy())
+    daemon_reload_mock = MagicMock(spec=service_manager.daemon_reload)
+    monkeypatch.setattr(service_manager, "daemon_reload", daemon_reload_mock)
+
+    assert _apply_restart_policy(restart_delay=10)
+    assert not _apply_restart_policy(restart_delay=10)
+
+    assert "\nRestartSec=10\n" in service_path.read_text(encoding="utf-8")
+    daemon_reload_mock.assert_called_once_with()
+
+
+def test_apply_restart_policy_not_installed(service_path: Path):
+    """
+    arrange: given a tmate-ssh-server service which is not installed yet.
+    act: when apply_restart_policy is called.
+    assert: no unit file is written.
+    """
+    assert not _apply_restart_policy(restart_delay=10)
+
+    assert not service_path.exists()
+
+
+def test_apply_restart_policy_error(
+    monkeypatch: pytest.MonkeyPatch, service_manager: systemd_bus.SystemctlManager, service_path
+):
+    """
+    arrange: given an installed tmate-ssh-server service and unit files failing to reload.
+    act: when apply_restart_policy is called with a changed restart policy.
+    assert: DaemonError is raised.
+    """
+    service_path.write_text("", encoding="utf-8")
     monkeypatch.setattr(
-        tmate.subprocess,
-        "check_call",
-        MagicMock(
-            spec=tmate.subprocess.check_call,
-            side_effect=[tmate.subprocess.CalledProcessError(returncode=1, cmd="test")],
-        ),
+        service_manager,
+        "daemon_reload",
+        MagicMock(side_effect=tmate.systemd.SystemdError("reload failed")),
+    )
+
+    with pytest.raises(tmate.DaemonError):
+        _apply_restart_policy(restart_delay=10)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        pytest.param(None, id="reset"),
+        pytest.param(tmate.systemd.SystemdError("not loaded"), id="error"),
+    ],
+)
+def test_reset_failed(
+    monkeypatch: pytest.MonkeyPatch,
+    service_manager: systemd_bus.SystemctlManager,
+    error: typing.Optional[Exception],
+):
+    """
+    arrange: given a service manager which resets the failed state or fails to.
+    act: when reset_failed is called.
+    assert: the failed state of the service is reset, or DaemonError is raised.
+    """
+    reset_failed_mock = MagicMock(spec=service_manager.service_reset_failed, side_effect=error)
+    monkeypatch.setattr(service_manager, "service_reset_failed", reset_failed_mock)
+
+    if error:
+        with pytest.raises(tmate.DaemonError):
+            tmate.reset_failed([10023])
+    else:
+        tmate.reset_failed([10023])
+
+    reset_failed_mock.assert_called_once_with("tmate-ssh-server@10023")
+
+
+def test_stop_daemon(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a monkeypatched systemd service_stop call.
+    act: when stop_daemon is called.
+    assert: the tmate-ssh-server service is stopped.
+    """
+    service_stop_mock = MagicMock(spec=tmate.systemd.service_stop)
+    monkeypatch.setattr(tmate.systemd, "service_stop", service_stop_mock)
+
+    tmate.stop_daemon([10022, 10023])
+
+    assert [call.args for call in service_stop_mock.call_args_list] == [
+        ("tmate-ssh-server@10022",),
+        ("tmate-ssh-server@10023",),
+    ]
+
+
+def test_stop_daemon_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a monkeypatched systemd service_stop call that raises SystemdError.
+    act: when stop_daemon is called.
+    assert: DaemonError is raised.
+    """
+    monkeypatch.setattr(
+        tmate.systemd,
+        "service_stop",
+        MagicMock(spec=tmate.systemd.service_stop, side_effect=tmate.systemd.SystemdError),
+    )
+
+    with pytest.raises(tmate.DaemonError):
+        tmate.stop_daemon()
+
+
+def test_remove_workers(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given monkeypatched systemd service_stop and service_disable calls.
+    act: when remove_workers is called.
+    assert: the worker services are stopped and disabled.
+    """
+    service_stop_mock = MagicMock(spec=tmate.systemd.service_stop)
+    monkeypatch.setattr(tmate.systemd, "service_stop", service_stop_mock)
+    service_disable_mock = MagicMock(spec=tmate.systemd.service_disable)
+    monkeypatch.setattr(tmate.systemd, "service_disable", service_disable_mock)
+
+    tmate.remove_workers([10023])
+
+    service_stop_mock.assert_called_once_with("tmate-ssh-server@10023")
+    service_disable_mock.assert_called_once_with("tmate-ssh-server@10023")
+
+
+def test_remove_workers_error(monkeypatch: pytest.MonkeyPatch):
+    """
+    arrange: given a monkeypatched systemd service_stop call that raises SystemdError.
+    act: when remove_workers is called.
+    assert: DaemonError is raised.
+    """
+    monkeypatch.setattr(
+        tmate.systemd,
+        "service_stop",
+        MagicMock(spec=tmate.systemd.service_stop, side_effect=tmate.systemd.SystemdError),
     )
 
-    with pytest.raises(tmate.DockerError):
-        tmate.remove_stopped_containers()
+    with pytest.raises(tmate.DaemonError, match="10023"):
+        tmate.remove_workers([10023])
+
+
+def test_worker_ports():
+    """
+    arrange: given a number of workers.
+    act: when worker_ports is called.
+    assert: consecutive ports from the tmate-ssh-server port are returned.
+    """
+    assert tmate.worker_ports(3) == [10022, 10023, 10024]
+
+
+def test_generate_tmate_conf_without_rsa():
+    """
+    arrange: given fingerprints of an ed25519 host key only.
+    act: when generate_tmate_conf is called.
+    assert: only the fingerprints of the configured host keys are in the tmate.conf.
+    """
+    fingerprints = host_keys.Fingerprints(ed25519="ed25519_fingerprint")
+
+    conf = tmate.generate_tmate_conf("test_host_value", fingerprints=fingerprints)
+
+    assert "set -g tmate-server-ed25519-fingerprint ed25519_fingerprint" in conf
+    assert "rsa" not in conf
+
+
+@pytest.fixture(name="ssh_server")
+def ssh_server_fixture() -> typing.Iterator[typing.Callable[[bytes], int]]:
+    """Serve a fixed response to the connections on a local port.
+
+    Yields:
+        A function starting to serve a response, returning the port it is served on.
+    """
+    with socket.create_server(("127.0.0.1", 0)) as server:
+
+        def serve(response: bytes) -> None:
+            """Send the response to a single connection.
+
+            Args:
+                response: The response to send.
+            """
+            connection, _ = server.accept()
+            with connection:
+                connection.sendall(response)
+
+        def start(response: bytes) -> int:
+            """Start serving a response.
+
+            Args:
+                response: The response to send.
+
+            Returns:
+                The port the response is served on.
+            """
+            threading.Thread(target=serve, args=(response,), daemon=True).start()
+            return server.getsockname()[1]
+
+        yield start
+
+
+@pytest.mark.parametrize(
+    "response, banner",
+    [
+        pytest.param(b"SSH-2.0-tmate\r\n", "SSH-2.0-tmate", id="banner"),
+        pytest.param(b"welcome\r\nSSH-2.0-tmate\r\n", "SSH-2.0-tmate", id="banner after text"),
+        pytest.param(b"SSH-1.5-old\r\n", None, id="unsupported version"),
+        pytest.param(b"HTTP/1.1 400 Bad Request\r\n", None, id="not ssh"),
+        pytest.param(b"", None, id="closed"),
+        pytest.param(b"welcome\r\n" * 16 + b"SSH-2.0-tmate\r\n", None, id="banner too late"),
+    ],
+)
+def test_probe_ssh_banner(
+    ssh_server: typing.Callable[[bytes], int], response: bytes, banner: typing.Optional[str]
+):
+    """
+    arrange: given a local server sending a response.
+    act: when probe_ssh_banner is called.
+    assert: the SSH banner is returned only if the response is a supported SSH banner.
+    """
+    port = ssh_server(response)
+
+    assert tmate.probe_ssh_banner("127.0.0.1", port=port, timeout=5) == banner
+
+
+def test_probe_ssh_banner_connection_refused():
+    """
+    arrange: given a local port without a server.
+    act: when probe_ssh_banner is called.
+    assert: None is returned.
+    """
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+
+    assert tmate.probe_ssh_banner("127.0.0.1", port=port, timeout=5) is None